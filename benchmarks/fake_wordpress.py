@@ -0,0 +1,337 @@
+"""
+A local stand-in for the WordPress REST API and RSS feed, serving
+synthetic posts, media, users, tags, categories and groups, with a
+configurable latency and post size.
+
+Run it on its own with:
+
+    python benchmarks/fake_wordpress.py --port 8765 --latency 50
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# The path of the API on the fake server
+API_PATH = "/wp-json/wp/v2"
+
+PARAGRAPH = (
+    "<p>Ubuntu is an open source operating system for the enterprise "
+    "server, desktop, cloud and IoT. "
+    '<a href="https://admin.insights.ubuntu.com/2019/01/01/a-post">'
+    "Read more</a></p>\n"
+)
+IMAGE = '<p><img class="wp-image" src="https://example.com/{}.png"></p>\n'
+
+
+def _date(index):
+    return "2019-{:02d}-{:02d}T10:00:00".format(index % 12 + 1, index % 28 + 1)
+
+
+def _content(index, payload_size):
+    paragraphs = []
+    size = 0
+
+    while size < payload_size:
+        paragraph = (
+            IMAGE.format(index) if len(paragraphs) % 5 == 4 else PARAGRAPH
+        )
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+
+    return "".join(paragraphs)
+
+
+def build_site(posts=200, tags=20, payload_size=10000):
+    """Build the synthetic content of a site
+
+    :param posts: The number of posts
+    :param tags: The number of tags
+    :param payload_size: The approximate size of each post's content in
+        bytes
+
+    :returns: A dict of lists of objects, keyed by collection
+    """
+    site = {
+        "tags": [
+            {
+                "id": id,
+                "name": "tag-{}".format(id),
+                "slug": "tag-{}".format(id),
+            }
+            for id in range(1, tags + 1)
+        ],
+        "categories": [
+            {"id": id, "name": "Category {}".format(id)} for id in range(1, 6)
+        ],
+        "group": [
+            {"id": id, "name": "Group {}".format(id)} for id in range(1, 4)
+        ],
+        "users": [
+            {"id": id, "name": "Author {}".format(id), "slug": str(id)}
+            for id in range(1, 11)
+        ],
+        "media": [],
+        "posts": [],
+    }
+
+    for index in range(posts):
+        id = index + 1
+
+        site["media"].append(
+            {
+                "id": 1000 + id,
+                "source_url": "https://example.com/{}.png".format(id),
+                "modified_gmt": _date(index),
+            }
+        )
+        site["posts"].append(
+            {
+                "id": id,
+                "date_gmt": _date(index),
+                "modified_gmt": _date(index),
+                "modified": _date(index),
+                "slug": "post-{}".format(id),
+                "link": "https://admin.insights.ubuntu.com/post-{}".format(id),
+                "title": {"rendered": "Post {}".format(id)},
+                "excerpt": {"rendered": "<p>{}</p>".format(PARAGRAPH * 3)},
+                "content": {"rendered": _content(index, payload_size)},
+                "featured_media": 1000 + id,
+                "author": index % 10 + 1,
+                "categories": [index % 5 + 1],
+                "tags": [1, index % (tags - 1) + 2],
+                "group": [index % 3 + 1],
+            }
+        )
+
+    # Newest first, like the API
+    site["posts"].sort(key=lambda post: post["date_gmt"], reverse=True)
+
+    return site
+
+
+def _id_list(value):
+    return [int(id) for id in value.split(",") if id]
+
+
+def _filter_posts(posts, query):
+    if "slug" in query:
+        posts = [post for post in posts if post["slug"] == query["slug"]]
+
+    if "tags" in query:
+        tags = set(_id_list(query["tags"]))
+        posts = [post for post in posts if tags & set(post["tags"])]
+
+    if "tags_exclude" in query:
+        tags = set(_id_list(query["tags_exclude"]))
+        posts = [post for post in posts if not tags & set(post["tags"])]
+
+    if "categories" in query:
+        categories = set(_id_list(query["categories"]))
+        posts = [
+            post for post in posts if categories & set(post["categories"])
+        ]
+
+    if "exclude" in query:
+        exclude = set(_id_list(query["exclude"]))
+        posts = [post for post in posts if post["id"] not in exclude]
+
+    return posts
+
+
+def _project(api_object, fields):
+    if not fields:
+        return api_object
+
+    return {
+        field: api_object[field] for field in fields if field in api_object
+    }
+
+
+def _feed(site):
+    items = "".join(
+        "<item><title>{}</title><link>{}</link>"
+        "<description><![CDATA[{}]]></description></item>".format(
+            post["title"]["rendered"],
+            post["link"],
+            post["excerpt"]["rendered"],
+        )
+        for post in site["posts"][:10]
+    )
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        "<title>Ubuntu Blog</title>"
+        "<link>https://admin.insights.ubuntu.com</link>{}"
+        "</channel></rss>"
+    ).format(items)
+
+
+class FakeWordPressHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type, headers=None):
+        body = body.encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = {
+            name: values[0] for name, values in parse_qs(url.query).items()
+        }
+
+        time.sleep(server.latency)
+
+        with server.lock:
+            server.requests += 1
+
+        if query.get("feed") == "rss":
+            return self._send(200, server.feed, "application/rss+xml")
+
+        if not url.path.startswith(API_PATH):
+            return self._send(404, "{}", "application/json")
+
+        path_start = len(API_PATH)
+        parts = url.path[path_start:].strip("/").split("/")
+        collection = server.site.get(parts[0])
+
+        if collection is None:
+            return self._send(404, "{}", "application/json")
+
+        fields = query["_fields"].split(",") if "_fields" in query else None
+
+        if len(parts) > 1:
+            api_object = next(
+                (item for item in collection if str(item["id"]) == parts[1]),
+                None,
+            )
+
+            if api_object is None:
+                return self._send(404, "{}", "application/json")
+
+            return self._send(
+                200,
+                json.dumps(_project(api_object, fields)),
+                "application/json",
+            )
+
+        if "include" in query:
+            include = set(_id_list(query["include"]))
+            collection = [item for item in collection if item["id"] in include]
+
+        if parts[0] == "posts":
+            try:
+                collection = _filter_posts(collection, query)
+            except ValueError:
+                return self._send(
+                    400,
+                    json.dumps({"code": "rest_invalid_param"}),
+                    "application/json",
+                )
+
+        per_page = int(query.get("per_page", 10))
+        page = int(query.get("page", 1))
+        start = (page - 1) * per_page
+        items = collection[start:][:per_page]
+
+        return self._send(
+            200,
+            json.dumps([_project(item, fields) for item in items]),
+            "application/json",
+            headers={
+                "X-WP-Total": str(len(collection)),
+                "X-WP-TotalPages": str(
+                    max(1, math.ceil(len(collection) / per_page))
+                ),
+            },
+        )
+
+
+class FakeWordPress(ThreadingHTTPServer):
+    """
+    A fake WordPress server, serving in a background thread once started
+
+    :param port: The port to listen on, or 0 for any free port
+    :param latency: Seconds to wait before answering each request
+    :param site_options: The arguments for build_site
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0, **site_options):
+        super(FakeWordPress, self).__init__(
+            ("127.0.0.1", port), FakeWordPressHandler
+        )
+        self.latency = latency
+        self.site = build_site(**site_options)
+        self.feed = _feed(self.site)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    @property
+    def api_url(self):
+        return self.url + API_PATH
+
+    @property
+    def feed_url(self):
+        return self.url + "/?tag={}&feed=rss"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Serve a fake WordPress API with synthetic content"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="Milliseconds per request"
+    )
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument(
+        "--payload-size", type=int, default=10000, help="Bytes per post"
+    )
+    arguments = parser.parse_args(args)
+
+    server = FakeWordPress(
+        port=arguments.port,
+        latency=arguments.latency / 1000,
+        posts=arguments.posts,
+        payload_size=arguments.payload_size,
+    )
+    print("Serving the API at " + server.api_url)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
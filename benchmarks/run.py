@@ -0,0 +1,329 @@
+"""
+Benchmark the blog against a local fake WordPress API: the latency and
+throughput of the homepage, article and feed views of the Flask
+blueprint and the Django app, and micro-benchmarks of the logic
+functions. The results are printed as JSON.
+
+    python benchmarks/run.py --latency 20 --requests 200 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import timeit
+
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Benchmark the checkout the script is in
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from fake_wordpress import FakeWordPress, build_site  # noqa: E402
+
+from canonicalwebteam.blog import common_view_logic  # noqa: E402
+from canonicalwebteam.blog import logic  # noqa: E402
+from canonicalwebteam.blog import wordpress_api as api  # noqa: E402
+
+TEMPLATES_DIR = os.path.join(BENCHMARKS_DIR, "templates")
+
+BLOG_TAG_ID = 1
+
+# The views benchmarked end to end, by name
+PATHS = {
+    "homepage": "/",
+    "deep_page": "/?page=10",
+    "article": "/post-1",
+    "feed": "/feed",
+}
+
+
+def reset_caches():
+    """Empty every cache, so each benchmark starts cold"""
+    # The HTTP cache is kept in files in the working directory
+    shutil.rmtree(".webcache", ignore_errors=True)
+    api.configure_session()
+    api.object_cache.clear()
+    api.response_cache.clear()
+    logic.transformed_article_cache.clear()
+    logic.optimised_content_cache.clear()
+    common_view_logic.feed_cache.clear()
+
+
+def _percentile(sorted_values, percent):
+    index = min(
+        len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values)))
+    )
+
+    return sorted_values[index]
+
+
+def measure(get, path, requests, concurrency, server):
+    """Request a path repeatedly with a number of concurrent clients
+
+    :param get: A function making a request with a new client, returning
+        its status code
+    :param path: The path to request
+    :param requests: The number of requests to make after the first one
+    :param concurrency: The number of concurrent clients
+    :param server: The FakeWordPress server
+
+    :returns: A dict of results
+    """
+    reset_caches()
+    upstream_before = server.requests
+
+    started = time.perf_counter()
+    first_status, _ = get(path)
+    first_seconds = time.perf_counter() - started
+
+    local = threading.local()
+    statuses = {}
+    lock = threading.Lock()
+
+    def timed_request(_):
+        client = getattr(local, "client", None)
+        started = time.perf_counter()
+        status, local.client = get(path, client)
+        seconds = time.perf_counter() - started
+
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+        return seconds
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed_request, range(requests)))
+
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "path": path,
+        "first_request": {"status": first_status, "seconds": first_seconds},
+        "requests": requests,
+        "concurrency": concurrency,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "requests_per_second": requests / wall_seconds,
+        "latency_seconds": {
+            "mean": statistics.mean(latencies),
+            "p50": _percentile(latencies, 50),
+            "p90": _percentile(latencies, 90),
+            "p99": _percentile(latencies, 99),
+            "max": latencies[-1],
+        },
+        "upstream_requests": server.requests - upstream_before,
+    }
+
+
+def flask_client_factory():
+    import flask
+
+    from werkzeug.routing import BaseConverter
+
+    from canonicalwebteam.blog.flask.views import build_blueprint
+
+    class RegexConverter(BaseConverter):
+        def __init__(self, url_map, *items):
+            super(RegexConverter, self).__init__(url_map)
+            self.regex = items[0]
+
+    app = flask.Flask(__name__, template_folder=TEMPLATES_DIR)
+    app.url_map.converters["regex"] = RegexConverter
+    app.register_blueprint(
+        build_blueprint("Benchmark blog", [BLOG_TAG_ID], "blog")
+    )
+
+    def get(path, client=None):
+        client = client or app.test_client()
+        response = client.get(path)
+        response.get_data()
+
+        return response.status_code, client
+
+    return get
+
+
+def django_client_factory():
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            DEBUG=False,
+            SECRET_KEY="benchmark",
+            ALLOWED_HOSTS=["*"],
+            ROOT_URLCONF="canonicalwebteam.blog.django.urls",
+            TEMPLATES=[
+                {
+                    "BACKEND": (
+                        "django.template.backends.django.DjangoTemplates"
+                    ),
+                    "DIRS": [TEMPLATES_DIR],
+                }
+            ],
+            BLOG_CONFIG={
+                "TAGS_ID": [BLOG_TAG_ID],
+                "EXCLUDED_TAGS": [],
+                "BLOG_TITLE": "Benchmark blog",
+                "TAG_NAME": "blog",
+            },
+        )
+
+    import django
+
+    from django.test import Client
+
+    django.setup()
+
+    def get(path, client=None):
+        client = client or Client()
+        response = client.get(path)
+
+        if response.streaming:
+            b"".join(response.streaming_content)
+        else:
+            response.content
+
+        return response.status_code, client
+
+    return get
+
+
+FRAMEWORKS = {"flask": flask_client_factory, "django": django_client_factory}
+
+
+def micro_benchmarks(payload_size, repeat=5):
+    """Time the logic functions on a synthetic post
+
+    :returns: A list of dicts of results
+    """
+    post = build_site(posts=1, payload_size=payload_size)["posts"][0]
+    uncached_post = dict(post)
+    del uncached_post["modified_gmt"]
+    content = post["content"]["rendered"]
+    excerpt = post["excerpt"]["rendered"]
+
+    functions = {
+        "transform_article": lambda: logic.transform_article(
+            uncached_post, optimise_images=True
+        ),
+        "transform_article_cached": lambda: logic.transform_article(
+            post, optimise_images=True
+        ),
+        "strip_excerpt": lambda: logic.strip_excerpt(excerpt),
+        "replace_images_with_cloudinary": (
+            lambda: logic.replace_images_with_cloudinary(content)
+        ),
+        "change_url": lambda: logic.change_url(
+            content, "https://ubuntu.com/blog"
+        ),
+    }
+    results = []
+
+    for name, function in functions.items():
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+        results.append(
+            {
+                "name": name,
+                "input_bytes": len(content),
+                "seconds_per_call": seconds,
+                "calls_per_second": 1 / seconds,
+            }
+        )
+
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the blog against a fake WordPress API"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=10, help="API milliseconds"
+    )
+    parser.add_argument(
+        "--payload-size", type=int, default=10000, help="Bytes per post"
+    )
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--frameworks", default="flask,django", help="e.g. flask,django"
+    )
+    parser.add_argument(
+        "--views", default=",".join(PATHS), help="e.g. homepage,deep_page"
+    )
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--output", help="Write the results to this file")
+    arguments = parser.parse_args(args)
+
+    server = FakeWordPress(
+        latency=arguments.latency / 1000,
+        posts=arguments.posts,
+        payload_size=arguments.payload_size,
+    ).start()
+    api.API_URL = server.api_url
+    api.FEED_URL = server.feed_url
+
+    if arguments.output:
+        arguments.output = os.path.abspath(arguments.output)
+
+    # Keep the HTTP cache files out of the current directory
+    working_dir = os.getcwd()
+    os.chdir(tempfile.mkdtemp())
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started_at": time.time(),
+        },
+        "options": vars(arguments),
+        "views": [],
+        "micro": [],
+    }
+
+    try:
+        for framework in arguments.frameworks.split(","):
+            get = FRAMEWORKS[framework]()
+
+            for view in arguments.views.split(","):
+                result = measure(
+                    get,
+                    PATHS[view],
+                    arguments.requests,
+                    arguments.concurrency,
+                    server,
+                )
+                result.update(framework=framework, view=view)
+                results["views"].append(result)
+    finally:
+        server.stop()
+        shutil.rmtree(os.getcwd(), ignore_errors=True)
+        os.chdir(working_dir)
+
+    if not arguments.skip_micro:
+        results["micro"] = micro_benchmarks(arguments.payload_size)
+
+    output = json.dumps(results, indent=2)
+
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,13 @@
-from canonicalwebteam.blog.flask.views import build_blueprint
+import threading
+
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.flask.views import (
+    build_blueprint,
+    build_metrics_blueprint,
+)
+from canonicalwebteam.blog.slug_index import SlugIndexer, slug_index
+from canonicalwebteam.blog.snapshot import SnapshotStore, Syncer
+from canonicalwebteam.blog.warmer import Warmer
 
 
 class BlogExtension(object):
@@ -9,11 +18,112 @@ class BlogExtension(object):
         tag_id=None,
         tag_name=None,
         url_prefix=None,
+        **options
     ):
         self.app = app
+        self.warmer = None
+        self._warmer_lock = threading.Lock()
+        self._warmer_started = False
+
         if app is not None:
-            self.init_app(app, blog_title, tag_id, tag_name, url_prefix)
+            self.init_app(
+                app, blog_title, tag_id, tag_name, url_prefix, **options
+            )
+
+    def init_app(
+        self, app, blog_title, tag_id, tag_name, url_prefix, **options
+    ):
+        """Register the blog blueprint on the app. Any extra options are
+        passed on to build_blueprint.
+
+        session_options are passed to wordpress_api.configure_session.
+
+        If snapshot_path is set, content is read from a local snapshot at
+        that path. If snapshot_interval is also set, it's synced with the
+        API every snapshot_interval seconds, and fully every
+        snapshot_full_interval seconds. Only one process should sync a
+        snapshot, so leave snapshot_interval unset in the others.
+
+        If warm_pages is set, a background thread warms the caches with
+        that many index pages and their articles every warm_interval
+        seconds, requesting them from the blueprint's views so the page
+        cache is filled too. As Flask doesn't allow setting up an app
+        once it has handled a request, the thread is started by the app's
+        first request, or by start_warmer once the app is set up.
+
+        If slug_index_interval is set, the slugs of all posts are kept in
+        an index refreshed every slug_index_interval seconds.
+
+        If metrics_url is set, the blog's metrics are exported in the
+        Prometheus text format at that URL of the app.
+        """
+        warm_pages = options.pop("warm_pages", None)
+        warm_interval = options.pop("warm_interval", 600)
+        snapshot_path = options.pop("snapshot_path", None)
+        snapshot_interval = options.pop("snapshot_interval", None)
+        snapshot_full_interval = options.pop("snapshot_full_interval", 3600)
+        session_options = options.pop("session_options", None)
+        metrics_url = options.pop("metrics_url", None)
+        slug_index_interval = options.pop("slug_index_interval", None)
+
+        if session_options:
+            api.configure_session(**session_options)
 
-    def init_app(self, app, blog_title, tag_id, tag_name, url_prefix):
-        blog = build_blueprint(blog_title, tag_id, tag_name)
+        if snapshot_path:
+            store = SnapshotStore(snapshot_path)
+            api.use_snapshot(store)
+
+            if snapshot_interval:
+                self.syncer = Syncer(
+                    store,
+                    interval=snapshot_interval,
+                    full_interval=snapshot_full_interval,
+                )
+                self.syncer.start()
+
+        if slug_index_interval:
+            self.slug_indexer = SlugIndexer(
+                slug_index, interval=slug_index_interval
+            )
+            self.slug_indexer.start()
+
+        blog = build_blueprint(blog_title, tag_id, tag_name, **options)
         app.register_blueprint(blog, url_prefix=url_prefix)
+
+        if metrics_url:
+            app.register_blueprint(build_metrics_blueprint(metrics_url))
+
+        if warm_pages:
+
+            def get_page(path):
+                response = app.test_client().get((url_prefix or "") + path)
+
+                if response.status_code != 200:
+                    raise Exception(
+                        "Error warming {}: {}".format(
+                            path, response.status_code
+                        )
+                    )
+
+            self.warmer = Warmer(
+                interval=warm_interval,
+                tags_id=tag_id,
+                pages=warm_pages,
+                max_workers=options.get("max_workers") or 4,
+                embed=options.get("embed", False),
+                image_options=options.get("image_options"),
+                get_page=get_page,
+            )
+            app.before_request(self.start_warmer)
+
+    def start_warmer(self):
+        """Start warming the caches, if warm_pages is set and it hasn't
+        started yet. Call it once the app is set up, as the warmer makes
+        requests to the app.
+        """
+        with self._warmer_lock:
+            if self.warmer is None or self._warmer_started:
+                return
+
+            self._warmer_started = True
+            self.warmer.start()
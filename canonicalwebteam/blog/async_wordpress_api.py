@@ -0,0 +1,147 @@
+"""Async versions of the wordpress_api getters.
+
+This isn't an async HTTP client: each getter runs the sync one on a pool
+of threads, MAX_CONCURRENT_REQUESTS by default or as set with configure,
+so it shares the session, caches, request coalescing and snapshot of
+wordpress_api. An event loop can await as many getters as it likes, but
+only as many as there are threads run at the same time, in each process,
+and the others wait for a free thread.
+"""
+
+import asyncio
+import contextvars
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+
+from canonicalwebteam.blog import wordpress_api as api
+
+# The most API requests made at the same time
+MAX_CONCURRENT_REQUESTS = 16
+
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+
+
+def configure(max_workers=MAX_CONCURRENT_REQUESTS):
+    """Set the number of threads the getters run on, the most API
+    requests an event loop makes at the same time. The API session's
+    pool_maxsize should be at least as big, see
+    wordpress_api.configure_session.
+
+    :param max_workers: The number of threads
+    """
+    global executor
+
+    previous_executor = executor
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    # The getters already running finish on the threads they're on
+    previous_executor.shutdown(wait=False)
+
+
+async def _run(getter, *args, **kwargs):
+    """Run a wordpress_api getter on the executor, without blocking the
+    event loop. It runs in a copy of the current context, so the API
+    calls it makes are recorded in the metrics of the current request.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, getter, *args, **kwargs)
+    )
+
+
+async def get_articles(*args, **kwargs):
+    return await _run(api.get_articles, *args, **kwargs)
+
+
+async def get_post_ids(*args, **kwargs):
+    return await _run(api.get_post_ids, *args, **kwargs)
+
+
+async def get_article(*args, **kwargs):
+    return await _run(api.get_article, *args, **kwargs)
+
+
+async def fetch_post(*args, **kwargs):
+    return await _run(api.fetch_post, *args, **kwargs)
+
+
+async def get_tag_by_name(*args, **kwargs):
+    return await _run(api.get_tag_by_name, *args, **kwargs)
+
+
+async def get_tags_by_ids(*args, **kwargs):
+    return await _run(api.get_tags_by_ids, *args, **kwargs)
+
+
+async def get_categories(*args, **kwargs):
+    return await _run(api.get_categories, *args, **kwargs)
+
+
+async def get_group_by_id(*args, **kwargs):
+    return await _run(api.get_group_by_id, *args, **kwargs)
+
+
+async def get_category_by_id(*args, **kwargs):
+    return await _run(api.get_category_by_id, *args, **kwargs)
+
+
+async def get_media(*args, **kwargs):
+    return await _run(api.get_media, *args, **kwargs)
+
+
+async def get_user(*args, **kwargs):
+    return await _run(api.get_user, *args, **kwargs)
+
+
+async def get_media_by_ids(*args, **kwargs):
+    return await _run(api.get_media_by_ids, *args, **kwargs)
+
+
+async def get_users_by_ids(*args, **kwargs):
+    return await _run(api.get_users_by_ids, *args, **kwargs)
+
+
+async def get_categories_by_ids(*args, **kwargs):
+    return await _run(api.get_categories_by_ids, *args, **kwargs)
+
+
+async def get_groups_by_ids(*args, **kwargs):
+    return await _run(api.get_groups_by_ids, *args, **kwargs)
+
+
+async def get_feed(*args, **kwargs):
+    return await _run(api.get_feed, *args, **kwargs)
+
+
+async def get_feed_stream(*args, **kwargs):
+    """Stream a feed, reading each chunk on the executor
+
+    :returns: An async iterator of strings, or None if the request failed
+    """
+    chunks = await _run(api.get_feed_stream, *args, **kwargs)
+
+    if chunks is None:
+        return None
+
+    return _iterate(chunks)
+
+
+async def _iterate(chunks):
+    done = object()
+
+    try:
+        while True:
+            chunk = await _run(next, chunks, done)
+
+            if chunk is done:
+                return
+
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+
+        if close is not None:
+            await _run(close)
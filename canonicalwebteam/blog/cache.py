@@ -0,0 +1,300 @@
+import json
+import threading
+import time
+
+from collections import OrderedDict
+from requests.structures import CaseInsensitiveDict
+
+# Returned by ObjectCache.get when nothing is cached, as None is a valid
+# value to cache
+MISSING = object()
+
+
+class ObjectCache(object):
+    """
+    An in-memory cache of API objects, keyed by entity type
+    (e.g. "users") and a key within that type (e.g. the user ID).
+
+    Each entity type can have its own time to live. When the cache
+    holds more than max_size objects, the least recently used ones
+    are evicted.
+
+    :param max_size: The maximum number of objects to hold. 0 disables
+        the cache.
+    :param ttls: A dict of time to live in seconds per entity type
+    :param default_ttl: The time to live for entity types not in ttls
+    """
+
+    def __init__(self, max_size=2000, ttls=None, default_ttl=300):
+        self.max_size = max_size
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, entity, key):
+        """Get an object from the cache
+
+        :returns: The cached object, or MISSING
+        """
+        with self._lock:
+            entry = self._entries.get((entity, key))
+
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[(entity, key)]
+
+                self.misses += 1
+
+                return MISSING
+
+            self._entries.move_to_end((entity, key))
+            self.hits += 1
+
+            return entry[1]
+
+    def set(self, entity, key, value):
+        if not self.max_size:
+            return
+
+        expires = time.monotonic() + self.ttls.get(entity, self.default_ttl)
+
+        with self._lock:
+            self._entries[(entity, key)] = (expires, value)
+            self._entries.move_to_end((entity, key))
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, entity, key):
+        with self._lock:
+            self._entries.pop((entity, key), None)
+
+    def delete_where(self, entity, predicate):
+        """Remove the objects of an entity type whose key matches
+
+        :param entity: The entity type
+        :param predicate: A function of a key, true for keys to remove
+
+        :returns: The removed keys
+        """
+        with self._lock:
+            keys = [
+                entry_key[1]
+                for entry_key in self._entries
+                if entry_key[0] == entity and predicate(entry_key[1])
+            ]
+
+            for key in keys:
+                del self._entries[(entity, key)]
+
+        return keys
+
+    def clear(self, entity=None):
+        """Remove every object, or every object of one entity type"""
+        with self._lock:
+            if entity is None:
+                self._entries.clear()
+                return
+
+            for entry_key in list(self._entries):
+                if entry_key[0] == entity:
+                    del self._entries[entry_key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _is_server_error(response):
+    return not response.ok and response.status_code >= 500
+
+
+class CachedResponse(object):
+    """
+    The parts of a requests.Response kept by ResponseCache: its status,
+    headers and body, without the connection, request and history a
+    response holds on to
+
+    :param response: The requests.Response, with its body read
+    """
+
+    __slots__ = ("url", "status_code", "headers", "content", "encoding")
+
+    def __init__(self, response):
+        self.url = response.url
+        self.status_code = response.status_code
+        self.headers = CaseInsensitiveDict(response.headers)
+        self.content = response.content
+        self.encoding = response.encoding
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class ResponseCache(object):
+    """
+    Sits in front of an HTTP getter and keeps the last good response for
+    each URL:
+
+    - Concurrent requests for the same URL are coalesced into a single
+      upstream request, whose response they all share
+    - If the upstream request fails, with a server error or an exception
+      like a connection error or timeout, the last good response is
+      returned instead, as a CachedResponse. A client error, like a 404,
+      is returned as it is, and the last good response dropped.
+    - In stale-while-revalidate mode, the responses kept younger than
+      fresh_for are returned straight away, and older ones are returned
+      while they are refreshed in the background
+
+    :param fresh_for: Seconds a response is served without revalidation
+        in stale-while-revalidate mode
+    :param keep_for: Seconds the last good response is kept as a fallback
+    :param max_size: The maximum number of responses to keep. Each one
+        holds a whole API response body in the memory of each process.
+    :param stale_while_revalidate: Whether to serve stale responses while
+        refreshing them in the background
+    """
+
+    def __init__(
+        self,
+        fresh_for=300,
+        keep_for=86400,
+        max_size=200,
+        stale_while_revalidate=False,
+    ):
+        self.fresh_for = fresh_for
+        self.stale_while_revalidate = stale_while_revalidate
+
+        self._responses = ObjectCache(max_size=max_size, default_ttl=keep_for)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, fetch):
+        """Get the response for a URL
+
+        :param url: The URL to get
+        :param fetch: The function making the upstream request for a URL
+
+        :returns: The response
+        """
+        cached = self._responses.get("responses", url)
+
+        if self.stale_while_revalidate and cached is not MISSING:
+            fetched_at, response = cached
+
+            if time.monotonic() - fetched_at > self.fresh_for:
+                self._refresh_in_background(url, fetch)
+
+            return response
+
+        try:
+            response = self._fetch(url, fetch)
+        except Exception:
+            if cached is MISSING:
+                raise
+
+            return cached[1]
+
+        if cached is not MISSING and _is_server_error(response):
+            return cached[1]
+
+        return response
+
+    def delete(self, url):
+        self._responses.delete("responses", url)
+
+    def delete_where(self, predicate):
+        """Remove the responses of the URLs a predicate is true for
+
+        :returns: The removed URLs
+        """
+        return self._responses.delete_where("responses", predicate)
+
+    def clear(self):
+        self._responses.clear()
+
+    def stats(self):
+        return self._responses.stats()
+
+    def _fetch(self, url, fetch):
+        with self._lock:
+            call = self._in_flight.get(url)
+            leader = call is None
+
+            if leader:
+                call = self._in_flight[url] = _Call()
+
+        if not leader:
+            call.done.wait()
+
+            if call.error:
+                raise call.error
+
+            return call.response
+
+        try:
+            call.response = fetch(url)
+
+            if call.response.ok:
+                self._responses.set(
+                    "responses",
+                    url,
+                    (time.monotonic(), CachedResponse(call.response)),
+                )
+            elif call.response.status_code < 500:
+                # Gone, or no longer allowed, so not to be served again
+                self._responses.delete("responses", url)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[url]
+
+            call.done.set()
+
+        return call.response
+
+    def _refresh(self, url, fetch):
+        try:
+            self._fetch(url, fetch)
+        except Exception:
+            # Keep serving the stale response until a refresh succeeds
+            pass
+
+    def _refresh_in_background(self, url, fetch):
+        with self._lock:
+            if url in self._in_flight:
+                return
+
+        thread = threading.Thread(
+            target=self._refresh, args=(url, fetch), daemon=True
+        )
+        thread.start()
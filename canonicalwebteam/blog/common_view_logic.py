@@ -1,98 +1,263 @@
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from canonicalwebteam.blog import async_wordpress_api as async_api
 from canonicalwebteam.blog import wordpress_api as api
 from canonicalwebteam.blog import logic
+from canonicalwebteam.blog import metrics
+from canonicalwebteam.blog.cache import MISSING, ObjectCache
+from canonicalwebteam.blog.models import Term
+from canonicalwebteam.blog.related import related_index
 
+# Rewritten feeds, per host
+feed_cache = ObjectCache(max_size=100, default_ttl=300)
+metrics.register_cache("feeds", feed_cache)
 
-def get_index_context(page_param, articles, total_pages):
 
-    category_cache = {}
-    group_cache = {}
+def get_page_number(page_param):
+    """The page number of a "page" query string parameter, or None if it
+    isn't a positive integer
+    """
+    try:
+        page = int(page_param)
+    except (TypeError, ValueError):
+        return None
 
-    for article in articles:
-        try:
-            featured_image = api.get_media(article["featured_media"])
-        except Exception:
-            featured_image = None
+    return page if page > 0 else None
 
-        try:
-            author = api.get_user(article["author"])
-        except Exception:
-            author = None
 
-        category_ids = article["categories"]
+def _call_or_none(lookup):
+    getter_name, args, kwargs = lookup
 
-        for category_id in category_ids:
-            if category_id not in category_cache:
-                category_cache[category_id] = {}
+    try:
+        return getattr(api, getter_name)(*args, **kwargs)
+    except Exception:
+        return None
 
-        for group_id in article["group"]:
-            if group_id not in group_cache:
-                group_cache[group_id] = {}
 
-        article = logic.transform_article(
-            article, featured_image=featured_image, author=author
+def _resolve_lookups(lookups, max_workers=None):
+    """Run a list of wordpress_api lookups, returning their results in
+    the same order. A lookup that raises resolves to None.
+
+    :param lookups: List of (getter name, args, kwargs) tuples
+    :param max_workers: Size of the thread pool to run the lookups on.
+        If not set, the lookups run one after another.
+
+    :returns: A list of results
+    """
+    with metrics.timed("resolve"):
+        if not max_workers or len(lookups) < 2:
+            return [_call_or_none(lookup) for lookup in lookups]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(metrics.in_request(_call_or_none), lookups)
+            )
+
+
+async def _call_or_none_async(lookup):
+    getter_name, args, kwargs = lookup
+
+    try:
+        return await getattr(async_api, getter_name)(*args, **kwargs)
+    except Exception:
+        return None
+
+
+async def _resolve_lookups_async(lookups):
+    """Run a list of wordpress_api lookups concurrently with the async
+    API, returning their results in the same order. A lookup that raises
+    resolves to None.
+
+    :param lookups: List of (getter name, args, kwargs) tuples
+
+    :returns: A list of results
+    """
+    with metrics.timed("resolve"):
+        return await asyncio.gather(
+            *[_call_or_none_async(lookup) for lookup in lookups]
         )
 
-    for key, category in category_cache.items():
-        try:
-            resolved_category = api.get_category_by_id(key)
-        except Exception:
-            resolved_category = None
 
-        category_cache[key] = resolved_category
+def _index_lookups(articles):
+    """Get the lookups needed to build the context of an index page: the
+    media, authors, categories and groups of its articles, in bulk. The
+    media and authors of embedded articles aren't looked up.
 
-    for key, group in group_cache.items():
-        try:
-            resolved_group = api.get_group_by_id(key)
-        except Exception:
-            resolved_group = None
+    :returns: A (lookups, embedded_objects) tuple
+    """
+    media_ids = []
+    author_ids = []
+    category_ids = []
+    group_ids = []
 
-        group_cache[key] = resolved_group
+    embedded_objects = []
+
+    for article in articles:
+        if "_embedded" in article:
+            embedded_objects.append(logic.unpack_embedded(article))
+        else:
+            embedded_objects.append(None)
+
+            if article["featured_media"]:
+                media_ids.append(article["featured_media"])
+
+            author_ids.append(article["author"])
+
+        category_ids.extend(article["categories"])
+        group_ids.extend(article["group"])
+
+    lookups = [
+        ("get_media_by_ids", (media_ids,), {}),
+        ("get_users_by_ids", (author_ids,), {}),
+        ("get_categories_by_ids", (category_ids,), {}),
+        ("get_groups_by_ids", (group_ids,), {}),
+    ]
+
+    return lookups, embedded_objects
+
+
+def _build_index_context(
+    page_param, articles, total_pages, embedded_objects, results
+):
+    media, authors, categories, groups = results
+
+    category_cache = {}
+    group_cache = {}
+
+    for article in articles:
+        for category_id in article["categories"]:
+            category_cache[category_id] = Term.from_api(
+                (categories or {}).get(category_id)
+            )
+
+        for group_id in article["group"]:
+            group_cache[group_id] = Term.from_api((groups or {}).get(group_id))
+
+    featured_images = []
+    article_authors = []
+
+    for article, embedded in zip(articles, embedded_objects):
+        if embedded:
+            featured_image, author = embedded
+        else:
+            featured_image = (media or {}).get(article["featured_media"])
+            author = (authors or {}).get(article["author"])
+
+        featured_images.append(featured_image)
+        article_authors.append(author)
 
     return {
         "current_page": page_param,
         "total_pages": int(total_pages),
-        "articles": articles,
+        "articles": logic.transform_articles(
+            articles, featured_images=featured_images, authors=article_authors
+        ),
         "used_categories": category_cache,
         "groups": group_cache,
     }
 
 
-def get_article_context(articles):
+def get_index_context(page_param, articles, total_pages, max_workers=None):
+    lookups, embedded_objects = _index_lookups(articles)
+    results = _resolve_lookups(lookups, max_workers=max_workers)
 
-    article = articles[0]
+    with metrics.timed("transform"):
+        return _build_index_context(
+            page_param, articles, total_pages, embedded_objects, results
+        )
 
-    try:
-        author = api.get_user(article["author"])
-    except Exception:
-        author = None
+
+async def get_index_context_async(page_param, articles, total_pages):
+    lookups, embedded_objects = _index_lookups(articles)
+    results = await _resolve_lookups_async(lookups)
+
+    with metrics.timed("transform"):
+        return _build_index_context(
+            page_param, articles, total_pages, embedded_objects, results
+        )
+
+
+def _article_lookups(article, use_index, embed=False):
+    """Get the lookups needed to build the context of an article page: its
+    author (unless embedded), its tags, and its related articles (unless
+    they come from the related articles index)
+
+    :returns: A list of lookups
+    """
+    lookups = [
+        ("get_tags_by_ids", (article["tags"],), {"fields": api.TAG_FIELDS})
+    ]
+
+    if "_embedded" not in article:
+        lookups.append(("get_users_by_ids", ([article["author"]],), {}))
+
+    if not use_index:
+        lookups.append(
+            (
+                "get_articles",
+                (),
+                {
+                    "tags": article["tags"],
+                    "per_page": 3,
+                    "exclude": article["id"],
+                    "embed": embed,
+                    "fields": api.RELATED_FIELDS,
+                },
+            )
+        )
+
+    return lookups
+
+
+def _build_article_context(article, results, use_index, image_options=None):
+    results = iter(results)
+    tag_names_response = next(results)
+
+    if "_embedded" in article:
+        featured_image, author = logic.unpack_embedded(article)
+    else:
+        featured_image = None
+        authors = next(results)
+        author = (authors or {}).get(article["author"])
 
     transformed_article = logic.transform_article(
-        article, author=author, optimise_images=True
+        article,
+        featured_image=featured_image,
+        author=author,
+        optimise_images=True,
+        image_options=image_options,
     )
 
-    tags = article["tags"]
     tag_names = []
-    try:
-        tag_names_response = api.get_tags_by_ids(tags)
-    except Exception:
-        tag_names_response = None
 
     if tag_names_response:
         for tag in tag_names_response:
-            tag_names.append({"id": tag["id"], "name": tag["name"]})
+            tag_names.append(Term(id=tag["id"], name=tag["name"]))
 
     is_in_series = logic.is_in_series(tag_names)
 
-    try:
-        related_articles, total_pages = api.get_articles(
-            tags=tags, per_page=3, exclude=article["id"]
+    if use_index:
+        related_articles = related_index.related(
+            article,
+            limit=3,
+            series_tag_ids=logic.get_series_tag_ids(tag_names),
         )
-    except Exception:
-        related_articles = None
+    else:
+        related_response = next(results)
+        related_articles = related_response[0] if related_response else None
 
     if related_articles:
-        for related_article in related_articles:
-            related_article = logic.transform_article(related_article)
+        embedded_objects = [
+            logic.unpack_embedded(related_article)
+            for related_article in related_articles
+        ]
+        related_articles = logic.transform_articles(
+            related_articles,
+            featured_images=[embedded[0] for embedded in embedded_objects],
+            authors=[embedded[1] for embedded in embedded_objects],
+        )
 
     return {
         "article": transformed_article,
@@ -100,3 +265,79 @@ def get_article_context(articles):
         "tags": tag_names,
         "is_in_series": is_in_series,
     }
+
+
+def _use_related_index():
+    """Whether the related articles come from the index, bringing it up
+    to date with the snapshot in use first
+    """
+    if api.snapshot is not None:
+        related_index.load(api.snapshot)
+
+    return related_index.ready
+
+
+def get_article_context(
+    articles, embed=False, image_options=None, max_workers=None
+):
+    article = articles[0]
+
+    # Decided once, as the index can become ready or be cleared while the
+    # lookups run
+    use_index = _use_related_index()
+    results = _resolve_lookups(
+        _article_lookups(article, use_index, embed=embed),
+        max_workers=max_workers,
+    )
+
+    with metrics.timed("transform"):
+        return _build_article_context(
+            article, results, use_index, image_options=image_options
+        )
+
+
+async def get_article_context_async(articles, embed=False, image_options=None):
+    article = articles[0]
+    use_index = _use_related_index()
+    results = await _resolve_lookups_async(
+        _article_lookups(article, use_index, embed=embed)
+    )
+
+    with metrics.timed("transform"):
+        return _build_article_context(
+            article, results, use_index, image_options=image_options
+        )
+
+
+def _cache_feed(chunks, host):
+    parts = []
+
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+
+    feed_cache.set("feeds", host, "".join(parts))
+
+
+def get_feed_chunks(tag_name, host, blog_title):
+    """Get the feed for a tag, with its URLs pointing to the host and its
+    title changed to the blog title, as a stream of strings. The rewritten
+    feed is cached per host once it has been streamed completely.
+
+    :param tag_name: The tag name of the feed
+    :param host: The URL of the blog
+    :param blog_title: The title of the blog
+
+    :returns: An iterable of strings, or None if the feed isn't available
+    """
+    feed = feed_cache.get("feeds", host)
+
+    if feed is not MISSING:
+        return [feed]
+
+    chunks = api.get_feed_stream(tag_name)
+
+    if chunks is None:
+        return None
+
+    return _cache_feed(logic.rewrite_feed(chunks, host, blog_title), host)
@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.urls import path, register_converter
 from canonicalwebteam.blog.django.views import (
     index,
     article_redirect,
     article,
+    blog_metrics,
     feed,
+    invalidate,
 )
 
 
@@ -47,6 +50,17 @@ urlpatterns = [
     path(r"<yyyy:year>/<mm:month>/<slug>", article_redirect),
     path(r"<yyyy:year>/<slug>", article_redirect),
     path(r"feed", feed),
+]
+
+if settings.BLOG_CONFIG.get("METRICS_PATH"):
+    urlpatterns.append(
+        path(settings.BLOG_CONFIG["METRICS_PATH"].strip("/"), blog_metrics)
+    )
+
+if settings.BLOG_CONFIG.get("INVALIDATION_SECRET"):
+    urlpatterns.append(path(r"_invalidate", invalidate))
+
+urlpatterns += [
     path(r"<slug>", article, name="article"),
     path(r"", index),
 ]
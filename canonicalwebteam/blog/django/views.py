@@ -1,62 +1,283 @@
+import functools
+
 from django.conf import settings
-from django.http import HttpResponseNotFound, HttpResponse
+from django.http import (
+    HttpResponse,
+    HttpResponseNotFound,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render, redirect
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from canonicalwebteam.blog import async_wordpress_api as async_api
+from canonicalwebteam.blog import invalidation
+from canonicalwebteam.blog import metrics
 from canonicalwebteam.blog import wordpress_api as api
-from canonicalwebteam.blog import logic
 from canonicalwebteam.blog.common_view_logic import (
     get_index_context,
     get_article_context,
+    get_feed_chunks,
+    get_page_number,
 )
+from canonicalwebteam.blog.page_cache import PageCache
+from canonicalwebteam.blog.slug_index import SlugIndexer, slug_index
+from canonicalwebteam.blog.snapshot import SnapshotStore, Syncer
 
 tags_id = settings.BLOG_CONFIG["TAGS_ID"]
 excluded_tags = settings.BLOG_CONFIG["EXCLUDED_TAGS"]
 blog_title = settings.BLOG_CONFIG["BLOG_TITLE"]
 tag_name = settings.BLOG_CONFIG["TAG_NAME"]
+max_workers = settings.BLOG_CONFIG.get("MAX_WORKERS")
+embed = settings.BLOG_CONFIG.get("EMBED", False)
+page_cache_ttl = settings.BLOG_CONFIG.get("PAGE_CACHE_TTL")
+image_options = settings.BLOG_CONFIG.get("IMAGE_OPTIONS")
+
+if settings.BLOG_CONFIG.get("SESSION_OPTIONS"):
+    api.configure_session(**settings.BLOG_CONFIG["SESSION_OPTIONS"])
+
+if settings.BLOG_CONFIG.get("ASYNC_MAX_WORKERS"):
+    async_api.configure(settings.BLOG_CONFIG["ASYNC_MAX_WORKERS"])
+
+if settings.BLOG_CONFIG.get("STALE_WHILE_REVALIDATE"):
+    api.response_cache.stale_while_revalidate = True
+
+page_cache = None
+
+if page_cache_ttl:
+    page_cache = PageCache(
+        ttl=page_cache_ttl,
+        compress=settings.BLOG_CONFIG.get("COMPRESS_PAGES", False),
+    )
+
+if page_cache:
+    metrics.register_cache("pages", page_cache)
+    invalidation.register_page_cache(page_cache)
+
+if settings.BLOG_CONFIG.get("INVALIDATION_LOG"):
+    invalidation.use_log(settings.BLOG_CONFIG["INVALIDATION_LOG"])
+
+if settings.BLOG_CONFIG.get("SNAPSHOT_PATH"):
+    snapshot_store = SnapshotStore(settings.BLOG_CONFIG["SNAPSHOT_PATH"])
+    api.use_snapshot(snapshot_store)
+
+    if settings.BLOG_CONFIG.get("SNAPSHOT_SYNC_INTERVAL"):
+        Syncer(
+            snapshot_store,
+            interval=settings.BLOG_CONFIG["SNAPSHOT_SYNC_INTERVAL"],
+            full_interval=settings.BLOG_CONFIG.get(
+                "SNAPSHOT_FULL_SYNC_INTERVAL", 3600
+            ),
+        ).start()
+
+if settings.BLOG_CONFIG.get("SLUG_INDEX_INTERVAL"):
+    SlugIndexer(
+        slug_index, interval=settings.BLOG_CONFIG["SLUG_INDEX_INTERVAL"]
+    ).start()
+
+
+def _server_timing(view):
+    """Add a Server-Timing header with the time spent in each stage of
+    building the page to the view's responses
+    """
+
+    @functools.wraps(view)
+    def timed_view(request, *args, **kwargs):
+        metrics.start_request()
+
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            server_timing = metrics.end_request()
+
+        response["Server-Timing"] = server_timing
+
+        return response
+
+    return timed_view
+
+
+def _apply_invalidations(view):
+    """Apply the invalidations other worker processes logged before
+    running the view, see invalidation.use_log
+    """
+
+    @functools.wraps(view)
+    def view_after_invalidations(request, *args, **kwargs):
+        invalidation.apply_logged()
+
+        return view(request, *args, **kwargs)
+
+    return view_after_invalidations
+
+
+def _cached_page(request, key, render, content_type=None):
+    """Respond with the page for the key from the page cache, rendering
+    and caching it if needed, in the encoding the client prefers. Only
+    successful responses are cached.
+    """
+    if not page_cache:
+        return render()
+
+    page = page_cache.get(key)
+
+    if page is None:
+        response = render()
+
+        if response.status_code != 200:
+            return response
+
+        page = page_cache.set(key, response.content, content_type=content_type)
+
+    encoding = page.negotiate(request.META.get("HTTP_ACCEPT_ENCODING"))
+
+    if page.is_not_modified(
+        request.META.get("HTTP_IF_NONE_MATCH"),
+        request.META.get("HTTP_IF_MODIFIED_SINCE"),
+        encoding=encoding,
+    ):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            page.get_body(encoding), content_type=page.content_type
+        )
+
+    for header, value in page.headers(
+        page_cache.ttl, encoding=encoding
+    ).items():
+        response[header] = value
+
+    return response
 
 
+@_apply_invalidations
+@_server_timing
 def index(request):
-    page_param = request.GET.get("page", default=1)
+    page_param = get_page_number(request.GET.get("page", default=1))
+
+    if page_param is None:
+        return HttpResponseNotFound("Page not found")
+
+    return _cached_page(
+        request,
+        ("index", page_param),
+        lambda: _render_index(request, page_param),
+    )
+
 
+def _render_index(request, page_param):
     try:
-        articles, total_pages = api.get_articles(
-            tags=tags_id, exclude=excluded_tags, page=page_param
-        )
+        with metrics.timed("fetch"):
+            articles, total_pages = api.get_articles(
+                tags=tags_id,
+                exclude=excluded_tags,
+                page=page_param,
+                embed=embed,
+                fields=api.INDEX_FIELDS,
+            )
     except Exception:
         return HttpResponse(status=502)
 
-    context = get_index_context(page_param, articles, total_pages)
+    if page_param > total_pages:
+        return HttpResponseNotFound("Page not found")
+
+    context = get_index_context(
+        page_param, articles, total_pages, max_workers=max_workers
+    )
     context["title"] = blog_title
 
-    return render(request, "blog/index.html", context)
+    with metrics.timed("render"):
+        return render(request, "blog/index.html", context)
 
 
+@_apply_invalidations
+@_server_timing
 def feed(request):
+    host = request.build_absolute_uri().replace("/feed", "")
+
+    return _cached_page(
+        request,
+        ("feed", host),
+        lambda: _render_feed(host),
+        content_type="text/xml",
+    )
+
+
+def _render_feed(host):
     try:
-        feed = api.get_feed(tag_name)
+        feed = get_feed_chunks(tag_name, host, blog_title)
     except Exception:
         return HttpResponse(status=502)
 
-    right_urls = logic.change_url(
-        feed, request.build_absolute_uri().replace("/feed", "")
-    )
+    if feed is None:
+        return HttpResponse(status=502)
 
-    right_title = right_urls.replace("Ubuntu Blog", blog_title)
+    if page_cache:
+        return HttpResponse("".join(feed), content_type="text/xml")
 
-    return HttpResponse(right_title, status=200, content_type="txt/xml")
+    return StreamingHttpResponse(feed, status=200, content_type="text/xml")
 
 
+@_apply_invalidations
 def article_redirect(request, slug, year=None, month=None, day=None):
+    if slug_index.exists(slug, tags_id) is False:
+        return HttpResponseNotFound("Article not found")
+
     return redirect("article", slug=slug)
 
 
+@_apply_invalidations
+@_server_timing
 def article(request, slug):
+    if slug_index.exists(slug, tags_id) is False:
+        return HttpResponseNotFound("Article not found")
+
+    return _cached_page(
+        request, ("article", slug), lambda: _render_article(request, slug)
+    )
+
+
+def _render_article(request, slug):
     try:
-        articles = api.get_article(tags_id, slug)
+        with metrics.timed("fetch"):
+            articles = api.get_article(
+                slug, tags=tags_id, embed=embed, fields=api.ARTICLE_FIELDS
+            )
     except Exception:
         return HttpResponse(status=502)
 
     if not articles:
+        slug_index.mark_missing(slug)
         return HttpResponseNotFound("Article not found")
-    context = get_article_context(articles)
 
-    return render(request, "blog/article.html", context)
+    slug_index.update(articles)
+    context = get_article_context(
+        articles,
+        embed=embed,
+        image_options=image_options,
+        max_workers=max_workers,
+    )
+
+    with metrics.timed("render"):
+        return render(request, "blog/article.html", context)
+
+
+def blog_metrics(request):
+    """The blog's metrics in the Prometheus text format"""
+    return HttpResponse(metrics.export(), content_type=metrics.CONTENT_TYPE)
+
+
+@csrf_exempt
+@require_POST
+def invalidate(request):
+    """Purge a post from the caches when WordPress signals it changed"""
+    status, result = invalidation.handle_webhook(
+        settings.BLOG_CONFIG.get("INVALIDATION_SECRET"),
+        request.body,
+        request.META.get("HTTP_X_BLOG_SIGNATURE"),
+        request.META.get("HTTP_X_BLOG_TIMESTAMP"),
+        feed_tags=[tag_name],
+    )
+
+    return JsonResponse(result, status=status)
@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html import escape
+
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.common_view_logic import (
+    get_article_context,
+    get_feed_chunks,
+    get_index_context,
+)
+
+# The record of what was exported, kept in the output directory for
+# incremental rebuilds
+MANIFEST_NAME = ".blog-export.json"
+
+# The number of articles per index page, as in the views
+PER_PAGE = 12
+
+REDIRECT_PAGE = (
+    "<!DOCTYPE html>\n"
+    '<html><head><meta charset="utf-8">'
+    '<link rel="canonical" href="{url}">'
+    '<meta http-equiv="refresh" content="0; url={url}">'
+    "</head></html>\n"
+)
+
+
+def _write(path, content):
+    """Write a file atomically, creating its directory"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(path)
+    )
+
+    with os.fdopen(file_descriptor, "wb") as temporary_file:
+        temporary_file.write(content)
+
+    os.chmod(temporary_path, 0o644)
+    os.replace(temporary_path, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def index_path(output_dir, page):
+    """The file of an index page: index.html, then page/<n>/index.html"""
+    if page == 1:
+        return os.path.join(output_dir, "index.html")
+
+    return os.path.join(output_dir, "page", str(page), "index.html")
+
+
+def article_path(output_dir, slug):
+    return os.path.join(output_dir, slug, "index.html")
+
+
+def redirect_paths(output_dir, article):
+    """The files of the date based URLs of an article, which the views
+    redirect to the article
+    """
+    date = datetime.strptime(article["date_gmt"], "%Y-%m-%dT%H:%M:%S")
+    year, month, day = date.strftime("%Y %m %d").split()
+
+    return [
+        os.path.join(output_dir, *parts, article["slug"], "index.html")
+        for parts in [(year, month, day), (year, month), (year,)]
+    ]
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _fetch_index_pages(tags_id, excluded_tags, embed):
+    """Fetch every index page of the blog
+
+    :returns: A list of (page, articles, total_pages) tuples
+    """
+    pages = []
+    page = 1
+    total_pages = 1
+
+    while page <= total_pages:
+        articles, total_pages = api.get_articles(
+            tags=tags_id,
+            exclude=excluded_tags,
+            per_page=PER_PAGE,
+            page=page,
+            embed=embed,
+            fields=api.INDEX_FIELDS,
+        )
+        total_pages = int(total_pages or 1)
+        pages.append((page, articles, total_pages))
+        page += 1
+
+    return pages
+
+
+def export(
+    output_dir,
+    tags_id,
+    render,
+    base_url="",
+    blog_title="",
+    tag_name=None,
+    excluded_tags=None,
+    max_workers=8,
+    embed=False,
+    image_options=None,
+    full=False,
+):
+    """Render every index page, article, date based redirect and the feed
+    of the blog to static files, on a pool of worker threads.
+
+    Unless full is set, articles whose modified_gmt hasn't changed since
+    the last export to the same directory aren't rendered again, and the
+    files of articles no longer on the blog are removed.
+
+    :param output_dir: The directory to write the files to
+    :param tags_id: The tag IDs of the blog
+    :param render: A function rendering a template name with a context
+        dict to a string
+    :param base_url: The URL the files will be served from
+    :param blog_title: The title of the blog
+    :param tag_name: The tag name of the feed, or None for no feed
+    :param excluded_tags: The tag IDs excluded from the index
+    :param max_workers: The number of pages rendered concurrently
+    :param embed: Whether to fetch articles with "_embed"
+    :param image_options: Options for replace_images_with_cloudinary
+    :param full: Render every article, even if it hasn't changed
+
+    :returns: A dict of metrics about the export
+    """
+    started = time.monotonic()
+    base_url = base_url.rstrip("/")
+    manifest = load_manifest(output_dir)
+    exported_articles = manifest.get("articles", {})
+
+    index_pages = _fetch_index_pages(tags_id, excluded_tags, embed)
+    articles = {
+        str(article["id"]): article
+        for _, page_articles, _ in index_pages
+        for article in page_articles
+    }
+
+    changed = [
+        article
+        for id, article in articles.items()
+        if full
+        or exported_articles.get(id, {}).get("modified_gmt")
+        != article.get("modified_gmt")
+        or not os.path.exists(article_path(output_dir, article["slug"]))
+    ]
+    slugs = {article["slug"] for article in articles.values()}
+    removed = [
+        exported
+        for exported in exported_articles.values()
+        if exported["slug"] not in slugs
+    ]
+
+    def render_index(index_page):
+        page, page_articles, total_pages = index_page
+        context = get_index_context(page, page_articles, total_pages)
+        context["title"] = blog_title
+        _write(
+            index_path(output_dir, page), render("blog/index.html", context)
+        )
+
+    def render_article(article):
+        article_url = "{}/{}".format(base_url, article["slug"])
+        full_articles = api.get_article(
+            article["slug"],
+            tags=tags_id,
+            excluded_tags=excluded_tags,
+            embed=embed,
+            fields=api.ARTICLE_FIELDS,
+        )
+        context = get_article_context(
+            full_articles, embed=embed, image_options=image_options
+        )
+        _write(
+            article_path(output_dir, article["slug"]),
+            render("blog/article.html", context),
+        )
+
+        for path in redirect_paths(output_dir, article):
+            _write(path, REDIRECT_PAGE.format(url=escape(article_url)))
+
+    def succeeded(function):
+        def run(item):
+            try:
+                function(item)
+            except Exception:
+                return False
+
+            return True
+
+        return run
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        article_results = list(
+            executor.map(succeeded(render_article), changed)
+        )
+
+        # The index only needs rendering again if any article changed
+        if full or changed or removed or not manifest:
+            index_results = list(
+                executor.map(succeeded(render_index), index_pages)
+            )
+        else:
+            index_results = []
+
+    for exported in removed:
+        _remove(article_path(output_dir, exported["slug"]))
+
+        for path in redirect_paths(output_dir, exported):
+            _remove(path)
+
+    old_page_count = manifest.get("pages", 0)
+
+    for page in range(len(index_pages) + 1, old_page_count + 1):
+        _remove(index_path(output_dir, page))
+
+    feed_written = False
+
+    if tag_name:
+        chunks = get_feed_chunks(tag_name, base_url, blog_title)
+
+        if chunks is not None:
+            _write(os.path.join(output_dir, "feed.xml"), "".join(chunks))
+            feed_written = True
+
+    failed_ids = {
+        str(article["id"])
+        for article, ok in zip(changed, article_results)
+        if not ok
+    }
+
+    _write(
+        os.path.join(output_dir, MANIFEST_NAME),
+        json.dumps(
+            {
+                "pages": len(index_pages),
+                "articles": {
+                    id: {
+                        "slug": article["slug"],
+                        "date_gmt": article["date_gmt"],
+                        "modified_gmt": article.get("modified_gmt"),
+                    }
+                    for id, article in articles.items()
+                    if id not in failed_ids
+                },
+                "exported_at": time.time(),
+            }
+        ),
+    )
+
+    return {
+        "pages": index_results.count(True),
+        "articles": article_results.count(True),
+        "unchanged": len(articles) - len(changed),
+        "removed": len(removed),
+        "feed": feed_written,
+        "errors": article_results.count(False) + index_results.count(False),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def jinja_renderer(templates_dir):
+    """A render function for export, using Jinja templates from a
+    directory, like the Flask blueprint's
+    """
+    import jinja2
+
+    environment = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(templates_dir),
+        autoescape=jinja2.select_autoescape(["html", "xml"]),
+    )
+
+    def render(template_name, context):
+        return environment.get_template(template_name).render(**context)
+
+    return render
+
+
+def _id_list(value):
+    return [int(id) for id in value.split(",") if id]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Export the blog to static files"
+    )
+    parser.add_argument("output", help="The directory to write to")
+    parser.add_argument(
+        "--tags", type=_id_list, required=True, help="e.g. 1,2,3"
+    )
+    parser.add_argument("--exclude-tags", type=_id_list, default=None)
+    parser.add_argument(
+        "--templates", required=True, help="The directory of the templates"
+    )
+    parser.add_argument("--base-url", default="", help="e.g. /blog")
+    parser.add_argument("--blog-title", default="")
+    parser.add_argument("--tag-name", help="The tag name of the feed")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--embed", action="store_true")
+    parser.add_argument(
+        "--full", action="store_true", help="Render unchanged articles too"
+    )
+    arguments = parser.parse_args(args)
+
+    metrics = export(
+        arguments.output,
+        arguments.tags,
+        jinja_renderer(arguments.templates),
+        base_url=arguments.base_url,
+        blog_title=arguments.blog_title,
+        tag_name=arguments.tag_name,
+        excluded_tags=arguments.exclude_tags,
+        max_workers=arguments.workers,
+        embed=arguments.embed,
+        full=arguments.full,
+    )
+
+    print(json.dumps(metrics))
+
+    return 1 if metrics["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
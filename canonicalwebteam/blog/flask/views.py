@@ -1,48 +1,165 @@
 import flask
 
+from canonicalwebteam.blog import invalidation
+from canonicalwebteam.blog import metrics
 from canonicalwebteam.blog import wordpress_api as api
-from canonicalwebteam.blog import logic
 from canonicalwebteam.blog.common_view_logic import (
     get_index_context,
     get_article_context,
+    get_feed_chunks,
+    get_page_number,
 )
+from canonicalwebteam.blog.page_cache import PageCache
+from canonicalwebteam.blog.slug_index import slug_index
+
+
+def build_blueprint(
+    blog_title,
+    tags_id,
+    tag_name,
+    max_workers=None,
+    embed=False,
+    stale_while_revalidate=False,
+    page_cache_ttl=None,
+    image_options=None,
+    invalidation_secret=None,
+    compress_pages=False,
+    invalidation_log=None,
+):
+    if stale_while_revalidate:
+        api.response_cache.stale_while_revalidate = True
 
-
-def build_blueprint(blog_title, tags_id, tag_name):
     blog = flask.Blueprint(
         "blog", __name__, template_folder="/templates", static_folder="/static"
     )
 
+    blog.page_cache = None
+
+    if page_cache_ttl:
+        blog.page_cache = PageCache(
+            ttl=page_cache_ttl, compress=compress_pages
+        )
+
+    if blog.page_cache:
+        metrics.register_cache("pages", blog.page_cache)
+        invalidation.register_page_cache(blog.page_cache)
+
+    if invalidation_log:
+        invalidation.use_log(invalidation_log)
+
+    @blog.before_request
+    def start_timing():
+        metrics.start_request()
+        invalidation.apply_logged()
+
+    @blog.after_request
+    def add_server_timing(response):
+        server_timing = metrics.end_request()
+
+        if server_timing:
+            response.headers["Server-Timing"] = server_timing
+
+        return response
+
+    def cached_page(key, render, content_type=None):
+        """Respond with the page for the key from the page cache, rendering
+        and caching it if needed, in the encoding the client prefers
+        """
+        if not blog.page_cache:
+            return render()
+
+        page = blog.page_cache.get(key)
+
+        if page is None:
+            page = blog.page_cache.set(
+                key, render(), content_type=content_type
+            )
+
+        encoding = page.negotiate(flask.request.headers.get("Accept-Encoding"))
+        headers = page.headers(blog.page_cache.ttl, encoding=encoding)
+
+        if page.is_not_modified(
+            flask.request.headers.get("If-None-Match"),
+            flask.request.headers.get("If-Modified-Since"),
+            encoding=encoding,
+        ):
+            return flask.Response(status=304, headers=headers)
+
+        return flask.Response(
+            page.get_body(encoding),
+            headers=headers,
+            content_type=page.content_type,
+        )
+
     @blog.route("/")
     def homepage():
-        page_param = flask.request.args.get("page", default=1, type=int)
+        page_param = get_page_number(flask.request.args.get("page", default=1))
 
+        if page_param is None:
+            flask.abort(404, "Page not found")
+
+        return cached_page(
+            ("index", page_param), lambda: render_homepage(page_param)
+        )
+
+    def render_homepage(page_param):
         try:
-            articles, total_pages = api.get_articles(
-                tags=tags_id, page=page_param
-            )
+            with metrics.timed("fetch"):
+                articles, total_pages = api.get_articles(
+                    tags=tags_id,
+                    page=page_param,
+                    embed=embed,
+                    fields=api.INDEX_FIELDS,
+                )
         except Exception:
             return flask.abort(502)
 
-        context = get_index_context(page_param, articles, total_pages)
+        if page_param > total_pages:
+            flask.abort(404, "Page not found")
 
-        return flask.render_template("blog/index.html", **context)
+        context = get_index_context(
+            page_param, articles, total_pages, max_workers=max_workers
+        )
+
+        with metrics.timed("render"):
+            return flask.render_template("blog/index.html", **context)
 
     @blog.route("/feed")
     def feed():
+        host = flask.request.base_url.replace("/feed", "")
+
+        return cached_page(
+            ("feed", host), lambda: render_feed(host), content_type="text/xml"
+        )
+
+    def render_feed(host):
         try:
-            feed = api.get_feed(tag_name)
+            feed = get_feed_chunks(tag_name, host, blog_title)
         except Exception as e:
             print(e)
             return flask.abort(502)
 
-        right_urls = logic.change_url(
-            feed, flask.request.base_url.replace("/feed", "")
-        )
+        if feed is None:
+            return flask.abort(502)
 
-        right_title = right_urls.replace("Ubuntu Blog", blog_title)
+        if blog.page_cache:
+            return "".join(feed)
 
-        return flask.Response(right_title, mimetype="text/xml")
+        return flask.Response(feed, mimetype="text/xml")
+
+    if invalidation_secret:
+
+        @blog.route("/_invalidate", methods=["POST"])
+        def invalidate():
+            status, result = invalidation.handle_webhook(
+                invalidation_secret,
+                flask.request.get_data(),
+                flask.request.headers.get(invalidation.SIGNATURE_HEADER),
+                flask.request.headers.get(invalidation.TIMESTAMP_HEADER),
+                feed_tags=[tag_name],
+            )
+
+            return flask.jsonify(result), status
 
     @blog.route(
         '/<regex("[0-9]{4}"):year>/<regex("[0-9]{2}"):month>/'
@@ -51,20 +168,57 @@ def build_blueprint(blog_title, tags_id, tag_name):
     @blog.route('/<regex("[0-9]{4}"):year>/<regex("[0-9]{2}"):month>/<slug>')
     @blog.route('/<regex("[0-9]{4}"):year>/<slug>')
     def article_redirect(slug, year, month=None, day=None):
+        if slug_index.exists(slug, tags_id) is False:
+            flask.abort(404, "Article not found")
+
         return flask.redirect(flask.url_for(".article", slug=slug))
 
     @blog.route("/<slug>")
     def article(slug):
+        if slug_index.exists(slug, tags_id) is False:
+            flask.abort(404, "Article not found")
+
+        return cached_page(("article", slug), lambda: render_article(slug))
+
+    def render_article(slug):
         try:
-            articles = api.get_article(tags_id, slug)
+            with metrics.timed("fetch"):
+                articles = api.get_article(
+                    slug, tags=tags_id, embed=embed, fields=api.ARTICLE_FIELDS
+                )
         except Exception:
             return flask.abort(502)
 
         if not articles:
+            slug_index.mark_missing(slug)
             flask.abort(404, "Article not found")
 
-        context = get_article_context(articles)
+        slug_index.update(articles)
+
+        context = get_article_context(
+            articles,
+            embed=embed,
+            image_options=image_options,
+            max_workers=max_workers,
+        )
 
-        return flask.render_template("blog/article.html", **context)
+        with metrics.timed("render"):
+            return flask.render_template("blog/article.html", **context)
 
     return blog
+
+
+def build_metrics_blueprint(url="/metrics"):
+    """A blueprint exporting the blog's metrics in the Prometheus text
+    format at a URL. It's separate from the blog blueprint so the metrics
+    can be kept off the blog's URL space.
+    """
+    blueprint = flask.Blueprint("blog_metrics", __name__)
+
+    @blueprint.route(url)
+    def blog_metrics():
+        return flask.Response(
+            metrics.export(), content_type=metrics.CONTENT_TYPE
+        )
+
+    return blueprint
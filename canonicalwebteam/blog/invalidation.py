@@ -0,0 +1,389 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+from urllib.parse import quote
+
+from canonicalwebteam.blog import logic
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.cache import MISSING, ObjectCache
+from canonicalwebteam.blog.common_view_logic import feed_cache
+from canonicalwebteam.blog.related import related_index
+from canonicalwebteam.blog.slug_index import SLUG_FIELDS, slug_index
+
+# The request headers holding the signature of a webhook, and the time it
+# was signed at
+SIGNATURE_HEADER = "X-Blog-Signature"
+TIMESTAMP_HEADER = "X-Blog-Timestamp"
+
+# Seconds a signed webhook is accepted for
+MAX_AGE = 300
+
+# The page caches of the views, see register_page_cache
+page_caches = []
+
+# The signatures of the webhooks accepted lately, so they can't be
+# replayed, with the process that accepted each. With a log, see use_log,
+# they include the signatures the other worker processes accepted.
+_signatures = ObjectCache(max_size=10000, default_ttl=2 * MAX_AGE)
+_signatures_lock = threading.Lock()
+
+# A file the invalidations are logged to, shared by the worker processes,
+# see use_log
+log_path = None
+_log_position = 0
+_log_lock = threading.Lock()
+
+
+def register_page_cache(page_cache):
+    """Purge pages from a PageCache when posts are invalidated"""
+    page_caches.append(page_cache)
+
+
+def use_log(path):
+    """Share invalidations with the other worker processes of the blog on
+    the host. Each invalidation is appended to the file at path, and each
+    worker applies the ones the others logged with apply_logged, before
+    serving a request. The signatures of the webhooks accepted are logged
+    too, so a webhook is accepted by only one worker.
+
+    :param path: The log file, or None to stop sharing invalidations
+    """
+    global log_path, _log_position
+
+    with _log_lock:
+        log_path = path
+
+        try:
+            _log_position = os.path.getsize(path) if path else 0
+        except OSError:
+            _log_position = 0
+
+
+def _log(entry):
+    """Append an invalidation to the log, with only the fields of the post
+    the other workers' indexes keep, as the snapshot is shared
+    """
+    if log_path is None:
+        return
+
+    post = entry["post"]
+
+    if post is not None:
+        post = {
+            field: post[field]
+            for field in set(SLUG_FIELDS) | set(api.RELATED_FIELDS)
+            if field in post
+        }
+
+    _append(dict(entry, post=post))
+
+
+def _append(entry):
+    """Append an entry to the log, with the ID of this process"""
+    line = json.dumps(dict(entry, pid=os.getpid())) + "\n"
+
+    # A single write with O_APPEND is atomic, so the workers' lines don't
+    # mix
+    log_file = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    try:
+        os.write(log_file, line.encode("utf-8"))
+    finally:
+        os.close(log_file)
+
+
+def apply_logged():
+    """Apply the invalidations the other worker processes logged since the
+    last call, see use_log
+
+    :returns: The number of invalidations applied
+    """
+    global _log_position
+
+    if log_path is None:
+        return 0
+
+    try:
+        size = os.path.getsize(log_path)
+    except OSError:
+        return 0
+
+    if size == _log_position:
+        return 0
+
+    with _log_lock:
+        if size < _log_position:
+            # The log was rotated
+            _log_position = 0
+
+        with open(log_path, "rb") as log_file:
+            log_file.seek(_log_position)
+            logged = log_file.read()
+
+        # Leave a line still being written for the next call
+        end = logged.rfind(b"\n") + 1
+        _log_position += end
+
+        entries = []
+
+        for line in logged[:end].splitlines():
+            try:
+                entry = json.loads(line.decode("utf-8"))
+            except ValueError:
+                continue
+
+            if "signature" in entry:
+                # Recorded in the order they were logged, while holding
+                # the lock, so the first worker to log one accepts it
+                _record_signature(entry["signature"], entry.get("pid"))
+            elif entry.pop("pid", None) != os.getpid():
+                entries.append(entry)
+
+    for entry in entries:
+        _purge(update_snapshot=False, **entry)
+
+    return len(entries)
+
+
+def sign(secret, body, timestamp):
+    """The signature of a webhook: the HMAC-SHA256 with the secret of the
+    timestamp, a ".", and the body
+
+    :param secret: The secret shared with WordPress
+    :param body: The request body, as bytes
+    :param timestamp: The TIMESTAMP_HEADER of the request, the Unix time
+        the request was signed at
+
+    :returns: "sha256=" followed by the hex digest
+    """
+    message = str(timestamp).encode("utf-8") + b"." + body
+    digest = hmac.new(secret.encode("utf-8"), message, hashlib.sha256)
+
+    return "sha256=" + digest.hexdigest()
+
+
+def verify_signature(secret, body, signature, timestamp):
+    """Whether a webhook was signed with the secret in the last MAX_AGE
+    seconds, and wasn't accepted before
+    """
+    if not secret or not signature or not timestamp:
+        return False
+
+    try:
+        signed_at = int(timestamp)
+    except ValueError:
+        return False
+
+    if abs(time.time() - signed_at) > MAX_AGE:
+        return False
+
+    if not hmac.compare_digest(sign(secret, body, signed_at), signature):
+        return False
+
+    return _accept_signature(signature)
+
+
+def _record_signature(signature, pid):
+    if _signatures.get("signatures", signature) is MISSING:
+        _signatures.set("signatures", signature, pid)
+
+
+def _accept_signature(signature):
+    """Whether this process is the first to accept a signature, of the
+    worker processes sharing the log if there is one, see use_log
+    """
+    with _signatures_lock:
+        apply_logged()
+
+        if _signatures.get("signatures", signature) is not MISSING:
+            return False
+
+        if log_path is None:
+            _record_signature(signature, os.getpid())
+
+            return True
+
+        # Each worker receiving it logs it, and the first line wins
+        _append({"signature": signature})
+        apply_logged()
+
+        return _signatures.get("signatures", signature) == os.getpid()
+
+
+def _is_posts_url(url):
+    path = url.split("?")[0]
+    posts_url = api.API_URL + "/posts"
+
+    return path == posts_url or path.startswith(posts_url + "/")
+
+
+def _fetch_state(post_id, deleted):
+    """Find out what happened to a post
+
+    :returns: A (state, post) tuple, where state is "published",
+        "deleted", or "unknown" if the API couldn't tell
+    """
+    if deleted:
+        return "deleted", None
+
+    if post_id is None:
+        return "unknown", None
+
+    try:
+        post = api.fetch_post(post_id)
+    except Exception:
+        # The API failed, so whether the post is still published isn't
+        # known
+        return "unknown", None
+
+    if post is None:
+        return "deleted", None
+
+    return "published", post
+
+
+def _update_indexes(post_id, slug, state, post, update_snapshot=True):
+    """Bring the slug index, related articles index and snapshot up to
+    date with a post. They're left for the next refresh if its state is
+    unknown.
+    """
+    if state == "published":
+        slug_index.update([post])
+
+        if related_index.ready:
+            related_index.update([post])
+
+        if update_snapshot and api.snapshot is not None:
+            api.snapshot.put("posts", [post])
+
+        return
+
+    if state != "deleted":
+        return
+
+    if post_id is not None:
+        slug_index.remove(post_id)
+        related_index.remove(post_id)
+
+        if update_snapshot and api.snapshot is not None:
+            api.snapshot.delete("posts", post_id)
+
+    if slug:
+        slug_index.mark_missing(slug)
+
+
+def _purge(post_id, slug, state, post, feed_tags, update_snapshot=True):
+    slugs = {slug, slug_index.slug_for(post_id)} - {None}
+
+    responses = api.purge_responses(
+        _is_posts_url,
+        urls=[api.FEED_URL.format(quote(tag)) for tag in feed_tags],
+    )
+
+    api.object_cache.clear("post_ids")
+
+    def is_post_revision(key):
+        return key[0] == post_id
+
+    articles = logic.transformed_article_cache.delete_where(
+        "articles", is_post_revision
+    ) + logic.optimised_content_cache.delete_where("content", is_post_revision)
+
+    def is_affected_page(key):
+        return key[0] in ("index", "feed") or (
+            key[0] == "article" and key[1] in slugs
+        )
+
+    pages = [
+        page_key
+        for page_cache in page_caches
+        for page_key in page_cache.delete_where(is_affected_page)
+    ]
+
+    feeds = feed_cache.delete_where("feeds", lambda host: True)
+
+    _update_indexes(
+        post_id, slug, state, post, update_snapshot=update_snapshot
+    )
+
+    return {
+        "responses": len(responses),
+        "articles": len(articles),
+        "pages": len(pages),
+        "feeds": len(feeds),
+    }
+
+
+def invalidate_post(post_id=None, slug=None, deleted=False, feed_tags=()):
+    """Purge a post from every cache, after it was published, updated or
+    deleted in WordPress:
+
+    - The API responses of all posts queries, which include the index
+      pages and related articles, from response_cache and the HTTP cache
+    - The cached post IDs and totals of the index pages
+    - The transformed article and optimised content of the post
+    - The cached index pages, feeds and the post's article page
+    - The rewritten feeds, and the feeds of feed_tags from the HTTP cache
+
+    The slug index, related articles index and snapshot are then updated
+    with the post as it is now. With a log, see use_log, the other worker
+    processes do the same.
+
+    :param post_id: The ID of the post
+    :param slug: The slug of the post
+    :param deleted: Whether the post was deleted or unpublished
+    :param feed_tags: The tag names of the blog's feeds
+
+    :returns: A dict of the number of entries purged per cache
+    """
+    state, post = _fetch_state(post_id, deleted)
+    entry = {
+        "post_id": post_id,
+        "slug": slug,
+        "state": state,
+        "post": post,
+        "feed_tags": list(feed_tags),
+    }
+
+    _log(entry)
+
+    return _purge(**entry)
+
+
+def handle_webhook(secret, body, signature, timestamp, feed_tags=()):
+    """Handle a request from WordPress to invalidate a post. The body is
+    a JSON object with the "id" and "slug" of the post, and "action" set
+    to "delete" if it was deleted or unpublished. It must be signed with
+    the secret in the last MAX_AGE seconds, see sign.
+
+    :param secret: The secret shared with WordPress
+    :param body: The request body, as bytes
+    :param signature: The SIGNATURE_HEADER of the request
+    :param timestamp: The TIMESTAMP_HEADER of the request
+    :param feed_tags: The tag names of the blog's feeds
+
+    :returns: A (status code, response dict) tuple
+    """
+    if not verify_signature(secret, body, signature, timestamp):
+        return 403, {"error": "Invalid signature"}
+
+    try:
+        payload = json.loads(body.decode("utf-8"))
+        post_id = int(payload["id"]) if payload.get("id") else None
+        slug = payload.get("slug") or None
+    except (AttributeError, TypeError, ValueError):
+        return 400, {"error": "Invalid payload"}
+
+    if post_id is None and slug is None:
+        return 400, {"error": "Missing post id or slug"}
+
+    return 200, invalidate_post(
+        post_id=post_id,
+        slug=slug,
+        deleted=payload.get("action") == "delete",
+        feed_tags=feed_tags,
+    )
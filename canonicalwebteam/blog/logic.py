@@ -1,7 +1,20 @@
 import re
 import html
 
-from datetime import datetime
+from functools import partial
+
+from canonicalwebteam.blog import metrics
+from canonicalwebteam.blog import models
+from canonicalwebteam.blog.cache import MISSING, ObjectCache
+
+TAG_REGEX = re.compile("<.*?>")
+
+# Removes any part of a "[…]" from the end of an excerpt
+ELLIPSIS_TABLE = str.maketrans("", "", "[…]")
+
+# Transformed articles, per article revision
+transformed_article_cache = ObjectCache(max_size=1000, default_ttl=86400)
+metrics.register_cache("transformed_articles", transformed_article_cache)
 
 
 def strip_excerpt(raw_html):
@@ -11,95 +24,320 @@ def strip_excerpt(raw_html):
 
     :returns: The stripped string
     """
-    clean_regex = re.compile("<.*?>")
-    clean_text = re.sub(clean_regex, "", raw_html)
+    clean_text = TAG_REGEX.sub("", raw_html)
     return html.unescape(clean_text).replace("\n", "")
 
 
-def replace_images_with_cloudinary(content):
+CLOUDINARY_URL = (
+    "https://res.cloudinary.com/canonical/image/fetch/"
+    "q_auto,f_auto,w_{width}/{url}"
+)
+
+# The widths of the image variants in srcset, and the default width
+IMAGE_BREAKPOINTS = (350, 650, 1300, 1950)
+IMAGE_DEFAULT_WIDTH = 650
+
+IMAGE_REGEX = re.compile(
+    r'<img(?P<prefix>[^>]*) src="(?P<url>[^"]+)"(?P<suffix>[^>]*)>'
+)
+
+# Optimised article content, per article revision
+optimised_content_cache = ObjectCache(max_size=500, default_ttl=86400)
+metrics.register_cache("optimised_content", optimised_content_cache)
+
+
+def _cloudinary_image(match, breakpoints, default_width, lazy_load, picture):
+    prefix = match.group("prefix")
+    url = match.group("url")
+    suffix = match.group("suffix")
+
+    srcset = ", ".join(
+        "{} {}w".format(CLOUDINARY_URL.format(width=width, url=url), width)
+        for width in breakpoints
+    )
+    sizes = "(max-width: 400px) {}w, {}px".format(
+        breakpoints[0], default_width
+    )
+
+    attributes = [' decoding="async"']
+
+    if lazy_load and "loading=" not in prefix + suffix:
+        attributes.append(' loading="lazy"')
+
+    attributes.append(
+        ' src="{}"'.format(CLOUDINARY_URL.format(width=default_width, url=url))
+    )
+    attributes.append(' srcset="{}"'.format(srcset))
+    attributes.append(' sizes="{}"'.format(sizes))
+
+    image = "".join(["<img", prefix] + attributes + [suffix, ">"])
+
+    if not picture:
+        return image
+
+    sources = [
+        '<source media="(max-width: {}px)" srcset="{}">'.format(
+            width, CLOUDINARY_URL.format(width=width, url=url)
+        )
+        for width in breakpoints[:-1]
+    ]
+
+    return "".join(["<picture>"] + sources + [image, "</picture>"])
+
+
+def replace_images_with_cloudinary(
+    content,
+    breakpoints=IMAGE_BREAKPOINTS,
+    default_width=IMAGE_DEFAULT_WIDTH,
+    lazy_load=False,
+    picture=False,
+):
     """Prefixes images with cloudinary optimised URLs and adds srcset for
-    image scaling
+    image scaling, in a single pass over the content
 
     :param content: The HTML string to convert
+    :param breakpoints: The image widths to offer in srcset
+    :param default_width: The width of the image in src
+    :param lazy_load: Add loading="lazy" to images
+    :param picture: Wrap images in a <picture> element with a <source>
+        for each breakpoint
 
     :returns: Update HTML string with converted images
     """
-    cloudinary = "https://res.cloudinary.com/"
+    return IMAGE_REGEX.sub(
+        lambda match: _cloudinary_image(
+            match, breakpoints, default_width, lazy_load, picture
+        ),
+        content,
+    )
 
-    urls = [
-        cloudinary + r"canonical/image/fetch/q_auto,f_auto,w_350/\g<url>",
-        cloudinary + r"canonical/image/fetch/q_auto,f_auto,w_650/\g<url>",
-        cloudinary + r"canonical/image/fetch/q_auto,f_auto,w_1300/\g<url>",
-        cloudinary + r"canonical/image/fetch/q_auto,f_auto,w_1950/\g<url>",
-    ]
 
-    image_match = (
-        r'<img(?P<prefix>[^>]*) src="(?P<url>[^"]+)"(?P<suffix>[^>]*)>'
-    )
-    replacement = (
-        r"<img\g<prefix>"
-        f' decoding="async"'
-        f' src="{urls[1]}"'
-        f' srcset="{urls[0]} 350w, {urls[1]} 650w, {urls[2]} 1300w,'
-        f' {urls[3]} 1950w"'
-        f' sizes="(max-width: 400px) 350w, 650px"'
-        r"\g<suffix>>"
+def _optimised_content(content, revision, options):
+    if revision is None:
+        return replace_images_with_cloudinary(content, **options)
+
+    revision = revision + (repr(sorted(options.items())),)
+    optimised_content = optimised_content_cache.get("content", revision)
+
+    if optimised_content is MISSING:
+        optimised_content = replace_images_with_cloudinary(content, **options)
+        optimised_content_cache.set("content", revision, optimised_content)
+
+    return optimised_content
+
+
+def shorten_excerpt(raw_html):
+    """The text of an excerpt for index pages: stripped of tags, at most
+    340 characters, and ending with an ellipsis
+
+    :param raw_html: The HTML of the excerpt
+
+    :returns: The shortened text
+    """
+    raw_article = strip_excerpt(raw_html)[:340]
+
+    # If the excerpt doesn't end before 340 characters, add ellipsis
+    # by replacing any part of […] in the last 3 characters
+    return "".join(
+        [
+            raw_article[:-3],
+            raw_article[-3:].translate(ELLIPSIS_TABLE),
+            " […]",
+        ]
     )
 
-    return re.sub(image_match, replacement, content)
+
+def _first_embedded(embedded, relation):
+    objects = embedded.get(relation) or [None]
+    linked_object = objects[0]
+
+    # Linked objects the API couldn't embed come back as error objects
+    if not linked_object or "code" in linked_object:
+        return None
+
+    return linked_object
+
+
+def unpack_embedded(article):
+    """Get the author and featured image of an article fetched with
+    "_embed"
+
+    :param article: The raw article object, including "_embedded"
+
+    :returns: A (featured_image, author) tuple
+    """
+    embedded = article.get("_embedded", {})
+
+    featured_image = _first_embedded(embedded, "wp:featuredmedia")
+    author = _first_embedded(embedded, "author")
+
+    return featured_image, author
+
+
+# The fields of a post a models.Article has its own versions of, rather
+# than keeping them as they are
+TRANSFORMED_ARTICLE_FIELDS = [
+    "date",
+    "title",
+    "excerpt",
+    "content",
+    "group",
+    "_embedded",
+    "_links",
+]
+
+
+def _transform_article(article, optimise_images, image_options):
+    values = {}
+    extra = {}
+
+    for name, value in article.items():
+        if name in TRANSFORMED_ARTICLE_FIELDS:
+            continue
+
+        if name in models.Article.__slots__:
+            values[name] = value
+        else:
+            extra[name] = value
+
+    if extra:
+        values["_extra"] = extra
+
+    if "title" in article:
+        values["title"] = models.Text.from_api(article["title"])
+
+    if "excerpt" in article and "rendered" in article["excerpt"]:
+        values["excerpt"] = models.Excerpt(
+            article["excerpt"]["rendered"], shorten=shorten_excerpt
+        )
+
+    if "content" in article and "rendered" in article["content"]:
+        optimise = None
+
+        if optimise_images:
+            revision = None
+
+            if "id" in article and "modified_gmt" in article:
+                revision = (article["id"], article["modified_gmt"])
+
+            optimise = partial(
+                _optimised_content,
+                revision=revision,
+                options=image_options or {},
+            )
+
+        values["content"] = models.Content(
+            article["content"]["rendered"], optimise=optimise
+        )
+
+    if "group" in article:
+        values["group"] = article["group"]
+
+        if len(article["group"]) > 0:
+            values["group"] = article["group"][0]
+
+    return models.Article(**values)
 
 
 def transform_article(
-    article, featured_image=None, author=None, optimise_images=False
+    article,
+    featured_image=None,
+    author=None,
+    optimise_images=False,
+    image_options=None,
 ):
     """Transform article to include featured image, a group, human readable
     date and a stipped version of the excerpt
 
+    The article is returned as an immutable models.Article, keeping only
+    the fields the templates use. Its date, shortened excerpt and
+    optimised content are worked out when first read. The transformation
+    is cached per article revision (id and modified_gmt) and fields, and
+    the parts of the transformed article are shared between calls.
+
     :param article: The raw article object
     :param featured_image: The featured image string
+    :param optimise_images: Convert the images in the content to
+        cloudinary optimised images
+    :param image_options: Options for replace_images_with_cloudinary
 
-    :returns: The transformed article
+    :returns: A models.Article
     """
-    article["image"] = featured_image
+    if "id" in article and "modified_gmt" in article:
+        revision = (
+            article["id"],
+            article["modified_gmt"],
+            optimise_images,
+            repr(sorted((image_options or {}).items())),
+            # The same revision, fetched with other fields, is transformed
+            # to another article
+            tuple(sorted(article.keys())),
+        )
+        transformed_article = transformed_article_cache.get(
+            "articles", revision
+        )
 
-    article["author"] = author
+        if transformed_article is MISSING:
+            transformed_article = _transform_article(
+                article, optimise_images, image_options
+            )
+            transformed_article_cache.set(
+                "articles", revision, transformed_article
+            )
+    else:
+        transformed_article = _transform_article(
+            article, optimise_images, image_options
+        )
+
+    return transformed_article.replace(
+        image=models.Media.from_api(featured_image),
+        author=models.Author.from_api(author),
+    )
 
-    if "date_gmt" in article:
-        article_gmt = article["date_gmt"]
-        article_date = datetime.strptime(article_gmt, "%Y-%m-%dT%H:%M:%S")
-        article["date"] = article_date.strftime("%-d %B %Y")
 
-    if "excerpt" in article and "rendered" in article["excerpt"]:
-        article["excerpt"]["raw"] = strip_excerpt(
-            article["excerpt"]["rendered"]
-        )[:340]
-
-        # If the excerpt doesn't end before 340 characters, add ellipsis
-        raw_article = article["excerpt"]["raw"]
-        # split at the last 3 characters
-        raw_article_start = raw_article[:-3]
-        raw_article_end = raw_article[-3:]
-        # for the last 3 characters replace any part of […]
-        raw_article_end = raw_article_end.replace("[", "")
-        raw_article_end = raw_article_end.replace("…", "")
-        raw_article_end = raw_article_end.replace("]", "")
-        # join it back up
-        article["excerpt"]["raw"] = "".join(
-            [raw_article_start, raw_article_end, " […]"]
+def transform_articles(
+    articles,
+    featured_images=None,
+    authors=None,
+    optimise_images=False,
+    image_options=None,
+):
+    """Transform a list of articles with transform_article
+
+    :param articles: The raw article objects
+    :param featured_images: The featured image for each article
+    :param authors: The author for each article
+    :param optimise_images: Convert the images in the content to
+        cloudinary optimised images
+    :param image_options: Options for replace_images_with_cloudinary
+
+    :returns: A list of models.Article
+    """
+    featured_images = featured_images or [None] * len(articles)
+    authors = authors or [None] * len(articles)
+
+    return [
+        transform_article(
+            article,
+            featured_image=featured_image,
+            author=author,
+            optimise_images=optimise_images,
+            image_options=image_options,
         )
-    if "group" in article and len(article["group"]) > 0:
-        article["group"] = article["group"][0]
-
-    if (
-        optimise_images
-        and "content" in article
-        and "rendered" in article["content"]
-    ):
-        article["content"]["rendered"] = replace_images_with_cloudinary(
-            article["content"]["rendered"]
+        for article, featured_image, author in zip(
+            articles, featured_images, authors
         )
+    ]
+
+
+FEED_URL_REGEX = re.compile(
+    r"https://admin.insights.ubuntu.com(\/\d{4}\/\d{2}\/\d{2})?"
+)
 
-    return article
+# The longest string FEED_URL_REGEX matches
+FEED_URL_MAX_LENGTH = len("https://admin.insights.ubuntu.com/0000/00/00")
+
+FEED_TITLE = "Ubuntu Blog"
 
 
 def change_url(feed, host):
@@ -109,14 +347,76 @@ def change_url(feed, host):
 
     :returns: A string with converted urls
     """
-    url_regex = re.compile(
-        r"https://admin.insights.ubuntu.com(\/\d{4}\/\d{2}\/\d{2})?"
-    )
-    updated_feed = re.sub(url_regex, host, feed)
+    updated_feed = FEED_URL_REGEX.sub(host, feed)
 
     return updated_feed
 
 
+def _stream_sub(chunks, regex, replacement, max_length):
+    """Replace the matches of a regex in a stream of strings. The end of
+    each chunk that could be the start of a match straddling the next
+    chunk is held back until the next chunk arrives.
+
+    :param chunks: An iterable of strings
+    :param regex: The compiled regex
+    :param replacement: The replacement string, as for re.sub
+    :param max_length: The longest string the regex can match
+
+    :returns: A generator of converted strings
+    """
+    pending = ""
+
+    for chunk in chunks:
+        pending += chunk
+
+        # Any match starting before this position is complete already
+        safe_end = len(pending) - max_length + 1
+        position = 0
+        parts = []
+
+        for match in regex.finditer(pending):
+            start = match.start()
+
+            if start >= safe_end:
+                break
+
+            parts.append(pending[position:start])
+            parts.append(match.expand(replacement))
+            position = match.end()
+
+        if safe_end > position:
+            parts.append(pending[position:safe_end])
+            position = safe_end
+
+        pending = pending[position:]
+
+        if parts:
+            yield "".join(parts)
+
+    if pending:
+        yield regex.sub(replacement, pending)
+
+
+def rewrite_feed(chunks, host, blog_title):
+    """Change insights urls to <host>/blog and the "Ubuntu Blog" title to
+    the blog title, as the chunks of a feed stream through
+
+    :param chunks: An iterable of feed strings
+    :param host: The URL of the blog
+    :param blog_title: The title of the blog
+
+    :returns: A generator of converted strings
+    """
+    chunks = _stream_sub(chunks, FEED_URL_REGEX, host, FEED_URL_MAX_LENGTH)
+
+    return _stream_sub(
+        chunks,
+        re.compile(re.escape(FEED_TITLE)),
+        blog_title.replace("\\", "\\\\"),
+        len(FEED_TITLE),
+    )
+
+
 def get_tag_id_list(tags):
     """Get a list of tag ids from a list of tag dicts
 
@@ -131,6 +431,16 @@ def get_tag_id_list(tags):
     return [get_id(tag) for tag in tags]
 
 
+def get_series_tag_ids(tags):
+    """Get the ids of the tags that start 'sc:series'
+
+    :param tags: Tag dict
+
+    :returns: A list of ids
+    """
+    return [tag["id"] for tag in tags if tag["name"].startswith("sc:series")]
+
+
 def is_in_series(tags):
     """Does the list of tags include a tag that starts 'sc:series'
 
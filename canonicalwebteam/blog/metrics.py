@@ -0,0 +1,347 @@
+import contextvars
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+# The upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(
+                name,
+                str(value)
+                .replace("\\", "\\\\")
+                .replace('"', '\\"')
+                .replace("\n", "\\n"),
+            )
+            for name, value in labels
+        )
+    )
+
+
+class Counter(object):
+    def __init__(self, name, description, kind="counter"):
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] += amount
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def get(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def export(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.description),
+            "# TYPE {} {}".format(self.name, self.kind),
+        ]
+
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(
+                    "{}{} {}".format(self.name, _labels_text(labels), value)
+                )
+
+        return lines
+
+
+class Histogram(object):
+    def __init__(self, name, description, buckets=BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            series = self._series.setdefault(
+                key, {"buckets": [0] * len(self.buckets), "sum": 0, "count": 0}
+            )
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, **labels):
+        series = self._series.get(tuple(sorted(labels.items())))
+
+        return series["count"] if series else 0
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def export(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.description),
+            "# TYPE {} histogram".format(self.name),
+        ]
+
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(
+                        "{}_bucket{} {}".format(
+                            self.name,
+                            _labels_text(labels + (("le", bound),)),
+                            count,
+                        )
+                    )
+
+                lines.append(
+                    "{}_bucket{} {}".format(
+                        self.name,
+                        _labels_text(labels + (("le", "+Inf"),)),
+                        series["count"],
+                    )
+                )
+                lines.append(
+                    "{}_sum{} {}".format(
+                        self.name, _labels_text(labels), series["sum"]
+                    )
+                )
+                lines.append(
+                    "{}_count{} {}".format(
+                        self.name, _labels_text(labels), series["count"]
+                    )
+                )
+
+        return lines
+
+
+API_CALLS = Counter(
+    "blog_api_calls_total", "Requests made to the WordPress API"
+)
+API_SECONDS = Histogram(
+    "blog_api_call_seconds", "Latency of requests to the WordPress API"
+)
+API_BYTES = Counter(
+    "blog_api_bytes_total", "Bytes received from the WordPress API"
+)
+HTTP_CACHE = Counter(
+    "blog_http_cache_requests_total",
+    "WordPress API requests answered by the HTTP cache, or not",
+)
+STAGE_SECONDS = Histogram(
+    "blog_stage_seconds", "Time spent in each stage of building a page"
+)
+CACHE_LOOKUPS = Counter(
+    "blog_cache_lookups_total", "Lookups in the in-memory caches"
+)
+CACHE_SIZE = Counter(
+    "blog_cache_size", "Entries in the in-memory caches", kind="gauge"
+)
+
+METRICS = [
+    API_CALLS,
+    API_SECONDS,
+    API_BYTES,
+    HTTP_CACHE,
+    STAGE_SECONDS,
+    CACHE_LOOKUPS,
+    CACHE_SIZE,
+]
+
+# The in-memory caches to report on, by name
+caches = {}
+
+
+def register_cache(name, cache):
+    """Report the hits, misses and size of a cache with the metrics
+
+    :param name: The name of the cache in the metrics
+    :param cache: An object with a stats method, like an ObjectCache
+    """
+    caches[name] = cache
+
+
+class RequestTimings(object):
+    """
+    The time spent in each stage of one request, and the number of API
+    calls it made, for the Server-Timing header
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = defaultdict(float)
+        self.api_calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] += seconds
+
+            if stage == "api":
+                self.api_calls += 1
+
+    def header(self):
+        """The Server-Timing header value"""
+        with self._lock:
+            entries = []
+
+            for stage, seconds in sorted(self.stages.items()):
+                if stage == "api":
+                    entries.append(
+                        '{};desc="{} calls";dur={:.1f}'.format(
+                            stage, self.api_calls, seconds * 1000
+                        )
+                    )
+                else:
+                    entries.append(
+                        "{};dur={:.1f}".format(stage, seconds * 1000)
+                    )
+
+        entries.append(
+            "total;dur={:.1f}".format(
+                (time.perf_counter() - self.started) * 1000
+            )
+        )
+
+        return ", ".join(entries)
+
+
+# The RequestTimings of the request being handled. A context variable
+# rather than a thread local, so concurrent requests on an event loop each
+# have their own, and the async API can carry them to its threads.
+_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request():
+    """Start recording the timings of a request in the current context,
+    the thread or asyncio task handling it
+
+    :returns: The RequestTimings
+    """
+    timings = RequestTimings()
+    _timings.set(timings)
+
+    return timings
+
+
+def current_request():
+    """The RequestTimings of the current context, or None"""
+    return _timings.get()
+
+
+def end_request():
+    """Stop recording timings in the current context
+
+    :returns: The Server-Timing header value, or None
+    """
+    timings = current_request()
+    _timings.set(None)
+
+    return timings.header() if timings else None
+
+
+def in_request(function):
+    """Wrap a function to run on another thread, so the timings it records
+    are added to the current request
+    """
+    timings = current_request()
+
+    def wrapper(*args, **kwargs):
+        token = _timings.set(timings)
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _timings.reset(token)
+
+    return wrapper
+
+
+def _record(stage, seconds):
+    timings = current_request()
+
+    if timings is not None:
+        timings.record(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    """Time a stage of building a page, e.g. "fetch" or "render" """
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        _record(stage, seconds)
+
+
+def record_api_call(endpoint, seconds, response=None, streamed=False):
+    """Record a request to the WordPress API
+
+    :param endpoint: The API path requested, e.g. "/posts"
+    :param seconds: How long the request took
+    :param response: The response, or None if the request failed
+    :param streamed: Whether the body hasn't been read yet
+    """
+    status = response.status_code if response is not None else "error"
+    from_cache = getattr(response, "from_cache", False) is True
+
+    API_CALLS.inc(endpoint=endpoint, status=status)
+    API_SECONDS.observe(seconds, endpoint=endpoint)
+    HTTP_CACHE.inc(result="hit" if from_cache else "miss")
+
+    if response is not None and not from_cache:
+        length = str(response.headers.get("Content-Length") or "")
+
+        if length.isdigit():
+            API_BYTES.inc(int(length), endpoint=endpoint)
+        elif not streamed and isinstance(response.content, bytes):
+            API_BYTES.inc(len(response.content), endpoint=endpoint)
+
+    _record("api", seconds)
+
+
+def _collect_caches():
+    for name, cache in caches.items():
+        stats = cache.stats()
+        CACHE_LOOKUPS.set(stats["hits"], cache=name, result="hit")
+        CACHE_LOOKUPS.set(stats["misses"], cache=name, result="miss")
+        CACHE_SIZE.set(stats["size"], cache=name)
+
+
+def export():
+    """All the metrics in the Prometheus text format"""
+    _collect_caches()
+
+    lines = []
+
+    for metric in METRICS:
+        lines.extend(metric.export())
+
+    return "\n".join(lines) + "\n"
+
+
+# The content type of the Prometheus text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
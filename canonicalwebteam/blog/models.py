@@ -0,0 +1,314 @@
+from collections.abc import Mapping
+from datetime import datetime
+
+
+class lazy_field(object):
+    """
+    A field of a model worked out from its other fields the first time it
+    is read, then kept in the slot of the same name with a leading
+    underscore
+
+    :param source: The field it is worked out from, without which it is
+        missing, or None if it is always there
+    """
+
+    def __init__(self, source=None):
+        self.source = source
+
+    def __call__(self, function):
+        self.function = function
+        self.name = function.__name__
+        self.slot = "_" + function.__name__
+
+        return self
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        try:
+            return getattr(instance, self.slot)
+        except AttributeError:
+            pass
+
+        if self.source is not None and not hasattr(instance, self.source):
+            raise AttributeError(self.name)
+
+        value = self.function(instance)
+        object.__setattr__(instance, self.slot, value)
+
+        return value
+
+
+class Model(Mapping):
+    """
+    An immutable object built once from an API object, keeping only the
+    fields in its __slots__.
+
+    Models can be read like the dicts they replace, article["title"] as
+    well as article.title, so templates written for the API's objects
+    keep working. Like a dict, a field the API didn't return is missing.
+
+    A model with an "_extra" slot also keeps the fields it has no slot
+    for there, as a dict, apart from the API's links and embedded
+    objects, like "_links".
+    """
+
+    __slots__ = ()
+
+    # The fields read by templates, in order
+    fields = ()
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_api(cls, api_object):
+        """Build a model from an API object, or return anything else,
+        like None, as it is
+        """
+        if not isinstance(api_object, dict):
+            return api_object
+
+        values = {
+            name: api_object[name] for name in cls.fields if name in api_object
+        }
+
+        if "_extra" in cls.__slots__:
+            extra = {
+                name: value
+                for name, value in api_object.items()
+                if name not in values and not name.startswith("_")
+            }
+
+            if extra:
+                values["_extra"] = extra
+
+        return cls(**values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def __getattr__(self, name):
+        # Only called for the fields without a value in a slot
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        try:
+            return self._extra_fields()[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def _extra_fields(self):
+        try:
+            return object.__getattribute__(self, "_extra")
+        except AttributeError:
+            return {}
+
+    def _has(self, name):
+        field = getattr(type(self), name, None)
+
+        if isinstance(field, lazy_field):
+            return field.source is None or self._has(field.source)
+
+        return hasattr(self, name)
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            return self._extra_fields()[key]
+
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for name in self.fields:
+            if self._has(name):
+                yield name
+
+        yield from self._extra_fields()
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def replace(self, **values):
+        """A copy of the model with some fields changed, sharing the values
+        of the others, including the lazy fields already worked out
+        """
+        return _restore(type(self), dict(self._slot_values(), **values))
+
+    def _slot_values(self):
+        values = {}
+
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                try:
+                    values[slot] = object.__getattribute__(self, slot)
+                except AttributeError:
+                    pass
+
+        return values
+
+    def __copy__(self):
+        return self.replace()
+
+    def __reduce__(self):
+        # Pickled, and deep copied, by its slots, as it can't be restored
+        # by setting attributes
+        return _restore, (type(self), self._slot_values())
+
+    def __repr__(self):
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join("{}={!r}".format(name, self[name]) for name in self),
+        )
+
+
+def _restore(cls, values):
+    """Build a model from the values of its slots, see Model.__reduce__"""
+    model = object.__new__(cls)
+
+    for slot, value in values.items():
+        object.__setattr__(model, slot, value)
+
+    return model
+
+
+class Text(Model):
+    """HTML rendered by the API, like the title of a post"""
+
+    __slots__ = ("rendered",)
+    fields = ("rendered",)
+
+
+class Excerpt(Text):
+    """
+    The excerpt of a post, with its text shortened for index pages as
+    "raw"
+
+    :param rendered: The HTML of the excerpt
+    :param shorten: A function of the HTML returning the shortened text
+    """
+
+    __slots__ = ("_shorten", "_raw")
+    fields = ("rendered", "raw")
+
+    def __init__(self, rendered, shorten):
+        super(Excerpt, self).__init__(rendered=rendered, _shorten=shorten)
+
+    @lazy_field()
+    def raw(self):
+        return self._shorten(self.rendered)
+
+
+class Content(Model):
+    """
+    The content of a post, optimised the first time it is read
+
+    :param source: The HTML of the content
+    :param optimise: A function of the HTML returning the HTML to show,
+        or None to show it as it is
+    """
+
+    __slots__ = ("_source", "_optimise", "_rendered")
+    fields = ("rendered",)
+
+    def __init__(self, source, optimise=None):
+        super(Content, self).__init__(_source=source, _optimise=optimise)
+
+    @lazy_field()
+    def rendered(self):
+        if self._optimise is None:
+            return self._source
+
+        return self._optimise(self._source)
+
+
+class Term(Model):
+    """A tag, category or group, keeping its other fields, like "count"
+    or "taxonomy", in "_extra"
+    """
+
+    fields = ("id", "name", "slug", "link", "description")
+    __slots__ = fields + ("_extra",)
+
+
+class Author(Model):
+    """The author of a post, a WordPress user, keeping its other fields,
+    like "url", in "_extra"
+    """
+
+    fields = ("id", "name", "slug", "link", "description", "avatar_urls")
+    __slots__ = fields + ("_extra",)
+
+
+class Media(Model):
+    """An image, like the featured image of a post, keeping its other
+    fields, like "title" or "media_type", in "_extra"
+    """
+
+    fields = (
+        "id",
+        "source_url",
+        "alt_text",
+        "caption",
+        "media_details",
+        "mime_type",
+    )
+    __slots__ = fields + ("_extra",)
+
+
+class Article(Model):
+    """
+    A post, with its author and featured image, and its human readable
+    "date" worked out from "date_gmt" when first read. The fields of the
+    post without a slot, like "sticky" or custom taxonomies, are kept as
+    they are in "_extra".
+    """
+
+    __slots__ = (
+        "id",
+        "slug",
+        "link",
+        "date_gmt",
+        "modified_gmt",
+        "title",
+        "excerpt",
+        "content",
+        "featured_media",
+        "categories",
+        "tags",
+        "group",
+        "image",
+        "author",
+        "_date",
+        "_extra",
+    )
+    fields = (
+        "id",
+        "slug",
+        "link",
+        "date",
+        "date_gmt",
+        "modified_gmt",
+        "title",
+        "excerpt",
+        "content",
+        "featured_media",
+        "categories",
+        "tags",
+        "group",
+        "image",
+        "author",
+    )
+
+    @lazy_field("date_gmt")
+    def date(self):
+        article_date = datetime.strptime(self.date_gmt, "%Y-%m-%dT%H:%M:%S")
+
+        return article_date.strftime("%-d %B %Y")
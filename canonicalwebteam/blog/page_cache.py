@@ -0,0 +1,218 @@
+import functools
+import gzip
+import hashlib
+import time
+
+from email.utils import formatdate, parsedate_to_datetime
+
+from canonicalwebteam.blog.cache import MISSING, ObjectCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# How pages are compressed, by content coding, in order of preference.
+# Brotli is only used if the brotli package is installed.
+COMPRESSORS = {}
+
+# Brotli's default quality, 11, is far slower to compress for little gain
+BROTLI_QUALITY = 5
+
+if brotli is not None:
+    COMPRESSORS["br"] = functools.partial(
+        brotli.compress, quality=BROTLI_QUALITY
+    )
+
+COMPRESSORS["gzip"] = lambda body: gzip.compress(body, mtime=0)
+
+# Pages smaller than this aren't worth compressing
+COMPRESS_MIN_SIZE = 1024
+
+
+def _accepted_encodings(accept_encoding):
+    """Parse an Accept-Encoding header
+
+    :returns: A dict of the quality of each content coding
+    """
+    qualities = {}
+
+    for coding in (accept_encoding or "").split(","):
+        name, _, parameters = coding.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+
+        if parameters.strip().startswith("q="):
+            try:
+                quality = float(parameters.strip()[2:])
+            except ValueError:
+                quality = 0.0
+
+        if name:
+            qualities[name] = quality
+
+    return qualities
+
+
+class CachedPage(object):
+    """
+    A rendered page, with the validators for conditional requests, and
+    compressed variants of it for each of the encodings
+
+    :param body: The page, as a string or bytes
+    :param last_modified: When the page changed, as a timestamp
+    :param content_type: The Content-Type of the page, or None for HTML
+    :param encodings: The content codings in COMPRESSORS to compress the
+        page with
+    """
+
+    __slots__ = ("body", "etag", "last_modified", "content_type", "variants")
+
+    def __init__(
+        self, body, last_modified=None, content_type=None, encodings=()
+    ):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        self.body = body
+        self.etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        self.last_modified = int(last_modified or time.time())
+        self.content_type = content_type
+        self.variants = {}
+
+        if len(body) >= COMPRESS_MIN_SIZE:
+            for encoding in encodings:
+                compressed_body = COMPRESSORS[encoding](body)
+
+                if len(compressed_body) < len(body):
+                    self.variants[encoding] = compressed_body
+
+    def negotiate(self, accept_encoding=None):
+        """Choose the variant of the page to send
+
+        :param accept_encoding: The Accept-Encoding request header
+
+        :returns: A content coding in variants, or None for the page as it
+            is
+        """
+        qualities = _accepted_encodings(accept_encoding)
+        best_encoding = None
+        best_quality = 0
+
+        for encoding in self.variants:
+            quality = qualities.get(encoding, qualities.get("*", 0))
+
+            if quality > best_quality:
+                best_encoding = encoding
+                best_quality = quality
+
+        return best_encoding
+
+    def get_body(self, encoding=None):
+        """The page, compressed with the encoding unless it's None"""
+        if encoding is None:
+            return self.body
+
+        return self.variants[encoding]
+
+    def get_etag(self, encoding=None):
+        """The strong ETag of the page, compressed with the encoding unless
+        it's None, as each variant needs its own
+        """
+        if encoding is None:
+            return self.etag
+
+        return '{}-{}"'.format(self.etag[:-1], encoding)
+
+    def is_not_modified(
+        self, if_none_match=None, if_modified_since=None, encoding=None
+    ):
+        """Whether a conditional request can be answered with a 304
+
+        :param if_none_match: The If-None-Match request header
+        :param if_modified_since: The If-Modified-Since request header
+        :param encoding: The content coding the page would be sent with
+
+        :returns: Boolean
+        """
+        if if_none_match:
+            etags = [
+                etag.strip().replace("W/", "", 1)
+                for etag in if_none_match.split(",")
+            ]
+
+            return "*" in etags or self.get_etag(encoding) in etags
+
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+
+            return self.last_modified <= since
+
+        return False
+
+    def headers(self, max_age, encoding=None):
+        headers = {
+            "ETag": self.get_etag(encoding),
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "public, max-age={}".format(max_age),
+        }
+
+        if self.variants:
+            headers["Vary"] = "Accept-Encoding"
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+
+        return headers
+
+
+class PageCache(object):
+    """
+    An in-memory cache of rendered pages, keyed by route and its
+    parameters, e.g. ("article", slug)
+
+    :param ttl: Seconds a rendered page is served for
+    :param max_size: The maximum number of pages to keep
+    :param compress: Keep a compressed variant of each page for every
+        encoding in COMPRESSORS, made once when the page is cached
+    """
+
+    def __init__(self, ttl=300, max_size=500, compress=False):
+        self.ttl = ttl
+        self.encodings = tuple(COMPRESSORS) if compress else ()
+        self._pages = ObjectCache(max_size=max_size, default_ttl=ttl)
+
+    def get(self, key):
+        page = self._pages.get("pages", key)
+
+        if page is MISSING:
+            return None
+
+        return page
+
+    def set(self, key, body, content_type=None):
+        page = CachedPage(
+            body, content_type=content_type, encodings=self.encodings
+        )
+        self._pages.set("pages", key, page)
+
+        return page
+
+    def delete(self, key):
+        self._pages.delete("pages", key)
+
+    def delete_where(self, predicate):
+        """Remove the pages whose key a predicate is true for
+
+        :returns: The removed keys
+        """
+        return self._pages.delete_where("pages", predicate)
+
+    def clear(self):
+        self._pages.clear()
+
+    def stats(self):
+        return self._pages.stats()
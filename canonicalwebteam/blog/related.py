@@ -0,0 +1,213 @@
+import threading
+import time
+
+from collections import defaultdict
+from datetime import datetime
+
+from canonicalwebteam.blog import wordpress_api as api
+
+# The weight of sharing a term of each kind with an article
+TAG_WEIGHT = 1.0
+SERIES_TAG_WEIGHT = 3.0
+CATEGORY_WEIGHT = 0.5
+
+# How many days it takes a post's score to halve with age
+HALF_LIFE_DAYS = 365
+
+# Terms on more than this share of all posts, like the blog's own tag,
+# are ignored when an article has more specific ones
+MAX_TERM_SHARE = 0.5
+
+
+def _timestamp(post):
+    try:
+        date = datetime.strptime(post["date_gmt"], "%Y-%m-%dT%H:%M:%S")
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+    return (date - datetime(1970, 1, 1)).total_seconds()
+
+
+def _terms(post):
+    return [("tags", tag_id) for tag_id in post.get("tags") or []] + [
+        ("categories", category_id)
+        for category_id in post.get("categories") or []
+    ]
+
+
+class RelatedIndex(object):
+    """
+    An inverted index from tag and category IDs to posts, to find the
+    related articles of an article locally, ranked by how many terms they
+    share with it, weighted by the kind of term and by how recent they are.
+    Only posts sharing a tag with the article are related.
+    """
+
+    def __init__(self):
+        self._posts = {}
+        self._timestamps = {}
+        self._postings = defaultdict(set)
+        self._lock = threading.Lock()
+
+        # Whether the index holds all the posts, so can be used instead
+        # of the API
+        self.ready = False
+
+        # When the snapshot the index was last filled from had synced its
+        # posts, see load
+        self.loaded_at = None
+        self._load_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._posts)
+
+    def _remove(self, post_id):
+        post = self._posts.pop(post_id, None)
+
+        if post is None:
+            return
+
+        del self._timestamps[post_id]
+
+        for term in _terms(post):
+            self._postings[term].discard(post_id)
+
+            if not self._postings[term]:
+                del self._postings[term]
+
+    def _add(self, post):
+        self._remove(post["id"])
+        self._posts[post["id"]] = {
+            field: post[field] for field in api.RELATED_FIELDS if field in post
+        }
+        self._timestamps[post["id"]] = _timestamp(post)
+
+        for term in _terms(post):
+            self._postings[term].add(post["id"])
+
+    def update(self, posts):
+        """Add posts to the index, replacing older versions of them. Only
+        the RELATED_FIELDS of each post are kept.
+        """
+        with self._lock:
+            for post in posts:
+                self._add(post)
+
+    def replace(self, posts):
+        """Replace all the posts of the index, and mark it ready. The new
+        index is built aside, so lookups meanwhile use the old one.
+        """
+        index = RelatedIndex()
+
+        for post in posts:
+            index._add(post)
+
+        with self._lock:
+            self._posts = index._posts
+            self._timestamps = index._timestamps
+            self._postings = index._postings
+            self.ready = True
+
+    def remove(self, post_id):
+        with self._lock:
+            self._remove(post_id)
+
+    def clear(self):
+        with self._lock:
+            self._posts.clear()
+            self._timestamps.clear()
+            self._postings.clear()
+            self.ready = False
+            self.loaded_at = None
+
+    def load(self, store):
+        """Fill the index with the posts of a snapshot, if it synced them
+        since the index was last filled from it. This way processes
+        reading a snapshot another process syncs have an index too.
+
+        :param store: A snapshot.SnapshotStore
+
+        :returns: Whether the index was filled
+        """
+        state = store.get_state("posts")
+
+        if state is None or state[0] == self.loaded_at:
+            return False
+
+        # Another thread is already filling it
+        if not self._load_lock.acquire(blocking=False):
+            return False
+
+        try:
+            self.replace(store.all("posts"))
+            self.loaded_at = state[0]
+        finally:
+            self._load_lock.release()
+
+        return True
+
+    def related(self, article, limit=3, series_tag_ids=()):
+        """Find the posts most related to an article
+
+        :param article: The article, with its "tags" and "categories"
+        :param limit: The maximum number of posts to return
+        :param series_tag_ids: The IDs of the article's series tags
+
+        :returns: A list of posts, most related first
+        """
+        with self._lock:
+            terms = [
+                term for term in _terms(article) if term in self._postings
+            ]
+            max_postings = max(1, len(self._posts) * MAX_TERM_SHARE)
+            specific_terms = [
+                term
+                for term in terms
+                if len(self._postings[term]) <= max_postings
+            ]
+
+            if not any(kind == "tags" for kind, term_id in specific_terms):
+                specific_terms = terms
+
+            scores = defaultdict(float)
+            tagged = set()
+
+            for kind, term_id in specific_terms:
+                if kind == "categories":
+                    weight = CATEGORY_WEIGHT
+                elif term_id in series_tag_ids:
+                    weight = SERIES_TAG_WEIGHT
+                else:
+                    weight = TAG_WEIGHT
+
+                for post_id in self._postings[(kind, term_id)]:
+                    scores[post_id] += weight
+
+                    if kind == "tags":
+                        tagged.add(post_id)
+
+            # Like the API's related articles, posts share a tag with the
+            # article, and categories only add to their score
+            scores = {
+                post_id: score
+                for post_id, score in scores.items()
+                if post_id in tagged and post_id != article.get("id")
+            }
+
+            now = time.time()
+            half_life = HALF_LIFE_DAYS * 86400
+
+            def rank(post_id):
+                age = max(0, now - self._timestamps[post_id])
+                score = scores[post_id] * 0.5 ** (age / half_life)
+
+                return score, self._timestamps[post_id]
+
+            ranked = sorted(scores, key=rank, reverse=True)
+
+            return [self._posts[post_id] for post_id in ranked[:limit]]
+
+
+# The index of all posts, kept up to date by snapshot.sync, or filled from
+# the snapshot in use, see wordpress_api.use_snapshot
+related_index = RelatedIndex()
@@ -0,0 +1,172 @@
+import random
+import threading
+import time
+
+import requests
+
+# Response status codes worth retrying
+RETRY_STATUSES = (502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a request while the circuit breaker is open
+    """
+
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Fails fast once a backend looks unhealthy.
+
+    After failure_threshold consecutive failures the circuit opens, and
+    requests fail straight away with CircuitOpenError. After reset_timeout
+    seconds, one trial request is let through: if it succeeds the circuit
+    closes again, otherwise it stays open for another reset_timeout.
+
+    :param failure_threshold: Consecutive failures that open the circuit.
+        0 disables the circuit breaker.
+    :param reset_timeout: Seconds before a trial request is let through
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may be made"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("The API looks unhealthy")
+
+            # Let one trial request through, and hold the rest back
+            # for another reset_timeout
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+            if (
+                self.failure_threshold
+                and self.failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+
+
+class CircuitBreakerAdapter(requests.adapters.HTTPAdapter):
+    """
+    An HTTP adapter sending requests through its circuit_breaker.
+
+    Mixed in after a caching adapter, like CacheControl's, only the
+    requests missing the cache reach it, so cached responses are still
+    served while the circuit is open.
+    """
+
+    circuit_breaker = None
+
+    def send(self, request, *args, **kwargs):
+        circuit_breaker = self.circuit_breaker
+
+        if circuit_breaker is None:
+            return super(CircuitBreakerAdapter, self).send(
+                request, *args, **kwargs
+            )
+
+        circuit_breaker.before_request()
+
+        try:
+            response = super(CircuitBreakerAdapter, self).send(
+                request, *args, **kwargs
+            )
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ):
+            circuit_breaker.record_failure()
+            raise
+
+        if response.status_code in RETRY_STATUSES:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+
+        return response
+
+
+def backoff_delay(attempt, backoff_factor):
+    """The delay before a retry: exponential backoff with full jitter
+
+    :param attempt: The number of the retry, from 0
+    :param backoff_factor: The base delay in seconds
+
+    :returns: The delay in seconds
+    """
+    return random.uniform(0, backoff_factor * 2**attempt)
+
+
+def request_with_retries(
+    request, url, circuit_breaker=None, retries=2, backoff_factor=0.2, **kwargs
+):
+    """Make a request, retrying connection errors, timeouts and gateway
+    errors with backoff, through a circuit breaker
+
+    :param request: The function making the request, e.g. session.get
+    :param url: The URL to request
+    :param circuit_breaker: A CircuitBreaker, or None
+    :param retries: The most retries to make
+    :param backoff_factor: The base delay between retries in seconds
+    :param kwargs: Extra arguments for the request function
+
+    :returns: The response
+    """
+    attempt = 0
+
+    while True:
+        if circuit_breaker:
+            circuit_breaker.before_request()
+
+        try:
+            response = request(url, **kwargs)
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ):
+            if circuit_breaker:
+                circuit_breaker.record_failure()
+
+            if attempt >= retries:
+                raise
+        else:
+            failed = not response.ok and response.status_code in RETRY_STATUSES
+
+            if circuit_breaker:
+                if failed:
+                    circuit_breaker.record_failure()
+                else:
+                    circuit_breaker.record_success()
+
+            if not failed or attempt >= retries:
+                return response
+
+            response.close()
+
+        time.sleep(backoff_delay(attempt, backoff_factor))
+        attempt += 1
@@ -0,0 +1,225 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+from datetime import datetime
+
+# Each entry's file starts with a magic number, flags and the expiry time
+HEADER = struct.Struct("<4sBd")
+MAGIC = b"BLC1"
+COMPRESSED = 1
+
+# Values at least this big are compressed
+COMPRESS_MIN_SIZE = 1024
+
+# Seconds between the updates of an entry's modification time when it's
+# read, which orders the entries for eviction
+TOUCH_INTERVAL = 60
+
+
+class SharedCache(object):
+    """
+    A cache of bytes in a directory, one file per entry, shared by every
+    process on a host, like the workers of a gunicorn server. It has the
+    interface of a CacheControl cache, so it can back the HTTP cache of
+    wordpress_api, see configure_session.
+
+    - Entries are written to a temporary file and renamed into place, so
+      readers never see a partial entry
+    - Entries are read through a memory map, so the operating system's page
+      cache holds a single copy for all the processes
+    - Values of COMPRESS_MIN_SIZE or more are compressed with zlib
+    - When the entries take more than max_size bytes, the least recently
+      used are removed, by any process. Reads record their use in the
+      modification time of the entry, at most every TOUCH_INTERVAL
+      seconds.
+
+    :param directory: The directory to keep the entries in
+    :param max_size: The most bytes the entries can take
+    :param check_every: The number of writes between size checks
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024, check_every=64):
+        self.directory = directory
+        self.max_size = max_size
+        self.check_every = check_every
+
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key):
+        """Get a value
+
+        :returns: The bytes, or None if missing or expired
+        """
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as entry_file:
+                modified = os.fstat(entry_file.fileno()).st_mtime
+
+                with mmap.mmap(
+                    entry_file.fileno(), 0, access=mmap.ACCESS_READ
+                ) as entry:
+                    magic, flags, expires = HEADER.unpack_from(entry)
+
+                    if magic != MAGIC:
+                        return None
+
+                    if expires and expires < time.time():
+                        self.delete(key)
+                        return None
+
+                    with memoryview(entry) as view:
+                        start = HEADER.size
+                        data = view[start:]
+
+                        try:
+                            if flags & COMPRESSED:
+                                value = zlib.decompress(data)
+                            else:
+                                value = bytes(data)
+                        finally:
+                            data.release()
+        except (FileNotFoundError, ValueError, struct.error, zlib.error):
+            return None
+
+        # Record the use, for eviction
+        if time.time() - modified > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+        return value
+
+    def set(self, key, value, expires=None):
+        """Set a value
+
+        :param key: The key
+        :param value: The bytes
+        :param expires: Seconds until it expires, or a datetime, or None
+        """
+        if isinstance(expires, datetime):
+            expires = expires.timestamp()
+        elif expires:
+            expires = time.time() + expires
+
+        flags = 0
+
+        if len(value) >= COMPRESS_MIN_SIZE:
+            value = zlib.compress(value)
+            flags |= COMPRESSED
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=".tmp"
+        )
+
+        try:
+            with os.fdopen(file_descriptor, "wb") as temporary_file:
+                temporary_file.write(
+                    HEADER.pack(MAGIC, flags, expires or 0) + value
+                )
+
+            os.replace(temporary_path, path)
+        except OSError:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+
+            raise
+
+        with self._lock:
+            self._writes += 1
+            check = self._writes % self.check_every == 0
+
+        if check:
+            self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        pass
+
+    def _entries(self):
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+
+            for entry in os.scandir(subdirectory.path):
+                if entry.name.startswith(".tmp"):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def size(self):
+        """The bytes taken by the entries"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Remove the least recently used entries until they take at most
+        90% of max_size
+
+        :returns: The number of entries removed
+        """
+        entries = list(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+
+        if total_size <= self.max_size:
+            return 0
+
+        target_size = self.max_size * 0.9
+        removed = 0
+
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total_size <= target_size:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            total_size -= size
+            removed += 1
+
+        return removed
+
+    def clear(self):
+        for path, _, _ in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        entries = list(self._entries())
+
+        return {
+            "size": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
@@ -0,0 +1,204 @@
+import threading
+import time
+
+from canonicalwebteam.blog import metrics
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.cache import MISSING, ObjectCache
+from canonicalwebteam.blog.snapshot import fetch_all
+from canonicalwebteam.http import UncachedSession
+
+# The fields of each post kept in the index
+SLUG_FIELDS = ["id", "slug", "date_gmt", "modified", "tags"]
+
+
+class SlugIndex(object):
+    """
+    The slugs of the blog's posts, so whether an article exists can be
+    answered without a request to the API.
+
+    Slugs the API didn't find are remembered for negative_ttl seconds.
+    Only those are taken not to exist: a slug that isn't in the index may
+    be a post published since the last refresh, as scheduled posts go live
+    without their "modified" date changing.
+
+    :param negative_ttl: Seconds to remember a slug wasn't found
+    :param max_missing: The most unknown slugs to remember
+    """
+
+    def __init__(self, negative_ttl=300, max_missing=10000):
+        self._posts = {}
+        self._slugs = {}
+        self._missing = ObjectCache(
+            max_size=max_missing, default_ttl=negative_ttl
+        )
+        self._lock = threading.Lock()
+
+        # Whether the index holds all the posts
+        self.ready = False
+
+        # The latest "modified" date of the posts, to refresh from
+        self.modified_after = None
+
+    def __len__(self):
+        return len(self._posts)
+
+    def _remove(self, post_id):
+        slug = self._slugs.pop(post_id, None)
+
+        if slug is not None:
+            del self._posts[slug]
+
+    def _add(self, posts, slugs, post):
+        posts[post["slug"]] = {
+            field: post[field] for field in SLUG_FIELDS if field in post
+        }
+        slugs[post["id"]] = post["slug"]
+        self._missing.delete("slugs", post["slug"])
+
+        if post.get("modified") and (
+            self.modified_after is None
+            or post["modified"] > self.modified_after
+        ):
+            self.modified_after = post["modified"]
+
+    def update(self, posts):
+        """Add posts to the index, replacing older versions of them"""
+        with self._lock:
+            for post in posts:
+                self._remove(post["id"])
+                self._add(self._posts, self._slugs, post)
+
+    def remove(self, post_id):
+        with self._lock:
+            self._remove(post_id)
+
+    def mark_missing(self, slug):
+        """Remember that the API has no post with this slug"""
+        with self._lock:
+            post = self._posts.get(slug)
+
+            if post is not None and "id" in post:
+                self._remove(post["id"])
+
+        self._missing.set("slugs", slug, True)
+
+    def clear(self):
+        with self._lock:
+            self._posts.clear()
+            self._slugs.clear()
+            self._missing.clear()
+            self.ready = False
+            self.modified_after = None
+
+    def get(self, slug):
+        """Get the indexed fields of a post, or None"""
+        return self._posts.get(slug)
+
+    def slug_for(self, post_id):
+        """The indexed slug of a post, or None"""
+        return self._slugs.get(post_id)
+
+    def exists(self, slug, tags=None):
+        """Whether a post with this slug exists on the blog
+
+        :param slug: The slug of the post
+        :param tags: The tag IDs of the blog, one of which the post needs
+
+        :returns: True, False if the post isn't on the blog or the API
+            didn't find it lately, or None if it isn't known
+        """
+        post = self._posts.get(slug)
+
+        if post is not None:
+            if not tags or "tags" not in post:
+                return True
+
+            return bool(set(tags) & set(post["tags"]))
+
+        if self._missing.get("slugs", slug) is not MISSING:
+            return False
+
+        return None
+
+    def refresh(self, full=False, api_url=None, session=None):
+        """Bring the index up to date with the API. After the first
+        refresh, only posts modified since the last one are fetched,
+        unless full is set. Only a full refresh removes deleted posts.
+
+        :returns: The number of posts fetched
+        """
+        posts = fetch_all(
+            session or UncachedSession(),
+            api_url or api.API_URL,
+            "posts",
+            modified_after=None if full else self.modified_after,
+            fields=SLUG_FIELDS,
+        )
+
+        if full:
+            # Build the new index off to the side, so readers never see
+            # it half filled
+            new_posts = {}
+            new_slugs = {}
+
+            for post in posts:
+                self._add(new_posts, new_slugs, post)
+
+            with self._lock:
+                self._posts = new_posts
+                self._slugs = new_slugs
+        else:
+            self.update(posts)
+
+        self.ready = True
+
+        return len(posts)
+
+
+class SlugIndexer(threading.Thread):
+    """
+    A background thread refreshing a SlugIndex on a schedule
+
+    :param index: The SlugIndex
+    :param interval: Seconds between the start of each refresh
+    :param full_interval: Seconds between full refreshes, which remove
+        deleted posts
+    """
+
+    def __init__(self, index, interval=60, full_interval=3600):
+        super(SlugIndexer, self).__init__(daemon=True)
+        self.index = index
+        self.interval = interval
+        self.full_interval = full_interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        last_full_refresh = None
+
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            full = (
+                last_full_refresh is None
+                or started - last_full_refresh >= self.full_interval
+            )
+
+            try:
+                self.index.refresh(full=full)
+
+                if full:
+                    last_full_refresh = started
+            except Exception:
+                pass
+
+            self._stopped.wait(
+                max(0, self.interval - (time.monotonic() - started))
+            )
+
+    def stop(self):
+        self._stopped.set()
+
+
+# The slugs of the blog's posts, filled by the article views, and kept
+# complete by a SlugIndexer when one is running
+slug_index = SlugIndex()
+metrics.register_cache("missing_slugs", slug_index._missing)
@@ -0,0 +1,464 @@
+import argparse
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.related import related_index
+from canonicalwebteam.http import UncachedSession
+
+# The entity types kept in a snapshot, by their API collection path
+ENTITIES = ["posts", "tags", "categories", "group", "users", "media"]
+
+# Entity types that support "modified_after", so only their changes need
+# to be fetched after the first sync
+MODIFIED_ENTITIES = ["posts", "media"]
+
+# The taxonomies of a post that articles can be filtered by
+POST_TAXONOMIES = ["tags", "categories", "group"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    entity TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    slug TEXT,
+    date TEXT,
+    modified TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (entity, id)
+);
+CREATE INDEX IF NOT EXISTS objects_slug ON objects (entity, slug);
+CREATE INDEX IF NOT EXISTS objects_date ON objects (entity, date);
+CREATE TABLE IF NOT EXISTS post_terms (
+    post_id INTEGER NOT NULL,
+    taxonomy TEXT NOT NULL,
+    term_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS post_terms_term ON post_terms (taxonomy, term_id);
+CREATE INDEX IF NOT EXISTS post_terms_post ON post_terms (post_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    entity TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL,
+    modified_after TEXT
+);
+CREATE TABLE IF NOT EXISTS full_sync_state (
+    entity TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def _id_list(value):
+    """Normalise an ID, a comma separated string of IDs or a list of IDs
+    to a list of ints
+    """
+    if not value:
+        return []
+
+    if isinstance(value, (list, tuple, set)):
+        return [int(id) for id in value]
+
+    return [int(id) for id in str(value).split(",") if id]
+
+
+def _project(api_object, fields):
+    if not fields:
+        return api_object
+
+    return {
+        field: api_object[field] for field in fields if field in api_object
+    }
+
+
+class SnapshotStore(object):
+    """
+    A local SQLite copy of the blog's posts, tags, categories, groups,
+    users and media, kept up to date with sync
+
+    :param path: The path of the SQLite database, or ":memory:"
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _put(self, entity, api_objects):
+        for api_object in api_objects:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    entity,
+                    api_object["id"],
+                    api_object.get("slug"),
+                    api_object.get("date_gmt"),
+                    api_object.get("modified_gmt"),
+                    json.dumps(api_object),
+                ),
+            )
+
+            if entity != "posts":
+                continue
+
+            self._connection.execute(
+                "DELETE FROM post_terms WHERE post_id = ?",
+                (api_object["id"],),
+            )
+            self._connection.executemany(
+                "INSERT INTO post_terms VALUES (?, ?, ?)",
+                [
+                    (api_object["id"], taxonomy, term_id)
+                    for taxonomy in POST_TAXONOMIES
+                    for term_id in api_object.get(taxonomy) or []
+                ],
+            )
+
+    def put(self, entity, api_objects):
+        """Add or replace objects of an entity type"""
+        with self._lock, self._connection:
+            self._put(entity, api_objects)
+
+    def replace(self, entity, api_objects):
+        """Replace all the objects of an entity type, in one transaction,
+        so objects no longer in api_objects are removed
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM objects WHERE entity = ?", (entity,)
+            )
+
+            if entity == "posts":
+                self._connection.execute("DELETE FROM post_terms")
+
+            self._put(entity, api_objects)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO full_sync_state VALUES (?, ?)",
+                (entity, time.time()),
+            )
+
+    def delete(self, entity, id):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM objects WHERE entity = ? AND id = ?", (entity, id)
+            )
+
+            if entity == "posts":
+                self._connection.execute(
+                    "DELETE FROM post_terms WHERE post_id = ?", (id,)
+                )
+
+    def get_many(self, entity, ids, fields=None):
+        """Get the objects of an entity type with the given IDs
+
+        :returns: A dict of objects keyed by ID
+        """
+        ids = _id_list(ids)
+
+        if not ids:
+            return {}
+
+        rows = self._query(
+            "SELECT id, data FROM objects"
+            " WHERE entity = ? AND id IN ({})".format(
+                ",".join("?" * len(ids))
+            ),
+            [entity] + ids,
+        )
+
+        return {id: _project(json.loads(data), fields) for id, data in rows}
+
+    def get(self, entity, id, fields=None):
+        return self.get_many(entity, [id], fields=fields).get(int(id))
+
+    def all(self, entity):
+        rows = self._query(
+            "SELECT data FROM objects WHERE entity = ?", (entity,)
+        )
+
+        return [json.loads(data) for (data,) in rows]
+
+    def get_posts(
+        self,
+        tags=None,
+        per_page=12,
+        page=1,
+        exclude=None,
+        category=None,
+        slug=None,
+        tags_exclude=None,
+        fields=None,
+    ):
+        """Query posts the way the API's posts collection does, newest
+        first
+
+        :returns: A (posts, total_pages) tuple
+        """
+        conditions = ["entity = 'posts'"]
+        parameters = []
+
+        for taxonomy, term_ids in [("tags", tags), ("categories", category)]:
+            term_ids = _id_list(term_ids)
+
+            if term_ids:
+                conditions.append(
+                    "id IN (SELECT post_id FROM post_terms"
+                    " WHERE taxonomy = ? AND term_id IN ({}))".format(
+                        ",".join("?" * len(term_ids))
+                    )
+                )
+                parameters += [taxonomy] + term_ids
+
+        tags_exclude = _id_list(tags_exclude)
+
+        if tags_exclude:
+            conditions.append(
+                "id NOT IN (SELECT post_id FROM post_terms"
+                " WHERE taxonomy = 'tags' AND term_id IN ({}))".format(
+                    ",".join("?" * len(tags_exclude))
+                )
+            )
+            parameters += tags_exclude
+
+        exclude = _id_list(exclude)
+
+        if exclude:
+            conditions.append(
+                "id NOT IN ({})".format(",".join("?" * len(exclude)))
+            )
+            parameters += exclude
+
+        if slug is not None:
+            conditions.append("slug = ?")
+            parameters.append(slug)
+
+        where = " AND ".join(conditions)
+        total = self._query(
+            "SELECT COUNT(*) FROM objects WHERE " + where, parameters
+        )[0][0]
+        rows = self._query(
+            "SELECT data FROM objects WHERE "
+            + where
+            + " ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+            parameters + [int(per_page), (int(page) - 1) * int(per_page)],
+        )
+
+        posts = [_project(json.loads(data), fields) for (data,) in rows]
+
+        return posts, max(1, math.ceil(total / int(per_page)))
+
+    def get_state(self, entity):
+        """Get when an entity type was last synced
+
+        :returns: A (synced_at, modified_after) tuple, or None
+        """
+        rows = self._query(
+            "SELECT synced_at, modified_after FROM sync_state"
+            " WHERE entity = ?",
+            (entity,),
+        )
+
+        return rows[0] if rows else None
+
+    def get_full_sync_time(self, entity):
+        """Get when all the objects of an entity type were last replaced
+
+        :returns: A Unix time, or None
+        """
+        rows = self._query(
+            "SELECT synced_at FROM full_sync_state WHERE entity = ?",
+            (entity,),
+        )
+
+        return rows[0][0] if rows else None
+
+    def is_synced(self, entity):
+        return self.get_state(entity) is not None
+
+    def set_state(self, entity, modified_after=None):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (entity, time.time(), modified_after),
+            )
+
+
+def fetch_all(session, api_url, entity, modified_after=None, fields=None):
+    """Fetch every object of a collection, page by page, using the
+    X-WP-Total header to know how many pages there are
+
+    :param session: The HTTP session
+    :param api_url: The API URL
+    :param entity: The collection, e.g. "posts"
+    :param modified_after: Only fetch objects modified after this date
+    :param fields: The fields to fetch, or None for all
+
+    :returns: A list of objects
+    """
+    url = "{}/{}?per_page=100&orderby=id&order=asc".format(api_url, entity)
+
+    if modified_after:
+        url = url + "&modified_after=" + modified_after
+
+    if fields:
+        url = url + "&_fields=" + ",".join(fields)
+
+    api_objects = []
+    page = 1
+    pages = 1
+
+    while page <= pages:
+        response = session.get(url + "&page=" + str(page))
+
+        if not response.ok:
+            raise Exception("Error from api: " + str(response.status_code))
+
+        api_objects.extend(response.json())
+        total = int(response.headers.get("X-WP-Total", 0))
+        pages = math.ceil(total / 100)
+        page += 1
+
+    return api_objects
+
+
+def sync(store, api_url=None, session=None, entities=ENTITIES, full=False):
+    """Bring a snapshot up to date with the API. Posts and media are
+    fetched incrementally with "modified_after" once they have been
+    synced, and other entity types are fetched completely.
+
+    An incremental sync doesn't see posts deleted or unpublished in
+    WordPress, nor scheduled posts once they're published, as their
+    modified date doesn't change. A full sync fetches everything and
+    replaces the entity types' objects, so it should be run now and then,
+    see Syncer.
+
+    The related articles index is brought up to date with the posts.
+
+    :param store: The SnapshotStore
+    :param api_url: The API URL, by default wordpress_api.API_URL
+    :param session: The HTTP session, by default an uncached one
+    :param entities: The entity types to sync
+    :param full: Whether to fetch everything, rather than only changes
+
+    :returns: A dict of the number of objects fetched per entity type
+    """
+    api_url = api_url or api.API_URL
+    session = session or UncachedSession()
+    fetched = {}
+
+    for entity in entities:
+        state = store.get_state(entity)
+        modified_after = state[1] if state else None
+
+        if full or entity not in MODIFIED_ENTITIES:
+            modified_after = None
+
+        api_objects = fetch_all(session, api_url, entity, modified_after)
+        replaced = modified_after is None
+
+        if replaced:
+            store.replace(entity, api_objects)
+        else:
+            store.put(entity, api_objects)
+
+        # "modified_after" is compared with the site's local time
+        modified_dates = [
+            api_object["modified"]
+            for api_object in api_objects
+            if api_object.get("modified")
+        ]
+
+        if modified_dates:
+            modified_after = max(modified_dates)
+
+        store.set_state(entity, modified_after=modified_after)
+        fetched[entity] = len(api_objects)
+
+        if entity != "posts":
+            continue
+
+        if related_index.ready and not replaced:
+            related_index.update(api_objects)
+        else:
+            related_index.replace(store.all("posts"))
+
+        related_index.loaded_at = store.get_state("posts")[0]
+
+    return fetched
+
+
+class Syncer(threading.Thread):
+    """
+    A background thread running sync on a schedule. The snapshot is shared
+    by the processes using it, so only one of them should run a Syncer.
+
+    :param store: The SnapshotStore
+    :param interval: Seconds between the start of each sync
+    :param full_interval: Seconds between full syncs, which remove the
+        posts deleted in WordPress and add published scheduled posts
+    """
+
+    def __init__(self, store, interval=300, full_interval=3600):
+        super(Syncer, self).__init__(daemon=True)
+        self.store = store
+        self.interval = interval
+        self.full_interval = full_interval
+        self._stopped = threading.Event()
+
+    def _full_sync_due(self):
+        synced_at = [
+            self.store.get_full_sync_time(entity)
+            for entity in MODIFIED_ENTITIES
+        ]
+
+        if None in synced_at:
+            return True
+
+        return time.time() - min(synced_at) >= self.full_interval
+
+    def run(self):
+        while not self._stopped.is_set():
+            started = time.monotonic()
+
+            try:
+                sync(self.store, full=self._full_sync_due())
+            except Exception:
+                pass
+
+            self._stopped.wait(
+                max(0, self.interval - (time.monotonic() - started))
+            )
+
+    def stop(self):
+        self._stopped.set()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Sync a local snapshot of the blog's content"
+    )
+    parser.add_argument("database", help="Path of the SQLite snapshot")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Fetch everything, removing deleted posts, rather than changes",
+    )
+    arguments = parser.parse_args(args)
+
+    print(
+        json.dumps(
+            sync(SnapshotStore(arguments.database), full=arguments.full)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import argparse
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.common_view_logic import (
+    get_index_context,
+    get_article_context,
+)
+
+# The metrics of the last warm-up
+last_metrics = {}
+
+
+def _warm_article(slug, tags_id, embed, image_options, max_workers, get_page):
+    if get_page is not None:
+        get_page("/" + slug)
+        return
+
+    articles = api.get_article(
+        slug, tags=tags_id, embed=embed, fields=api.ARTICLE_FIELDS
+    )
+
+    if articles:
+        get_article_context(
+            articles,
+            embed=embed,
+            image_options=image_options,
+            max_workers=max_workers,
+        )
+
+
+def warm(
+    tags_id,
+    pages=3,
+    excluded_tags=None,
+    max_workers=4,
+    embed=False,
+    image_options=None,
+    get_page=None,
+):
+    """Fetch and transform the first index pages of the blog, and their
+    articles with their related articles, so they are in the caches
+    before visitors ask for them.
+
+    With get_page, the pages are requested from the views instead, so
+    they're rendered the way visitors get them, and the page cache is
+    filled too.
+
+    :param tags_id: The tag IDs of the blog
+    :param pages: The number of index pages to warm
+    :param excluded_tags: The tag IDs excluded from the index
+    :param max_workers: The number of concurrent API lookups
+    :param embed: Whether the views fetch articles with "_embed"
+    :param image_options: The image options of the article views
+    :param get_page: A function requesting a path of the blog, like
+        "/?page=2" or "/a-slug", from its views, raising if it fails
+
+    :returns: A dict of metrics about the warm-up
+    """
+    started = time.monotonic()
+    slugs = []
+    errors = 0
+    warmed_pages = 0
+
+    for page in range(1, pages + 1):
+        try:
+            if get_page is not None:
+                get_page("/?page={}".format(page))
+
+            # Already cached when the view requested it
+            articles, total_pages = api.get_articles(
+                tags=tags_id,
+                exclude=excluded_tags,
+                page=page,
+                embed=embed,
+                fields=api.INDEX_FIELDS,
+            )
+
+            if get_page is None:
+                get_index_context(
+                    page, articles, total_pages, max_workers=max_workers
+                )
+        except Exception:
+            errors += 1
+            break
+
+        warmed_pages += 1
+        slugs.extend(article["slug"] for article in articles)
+
+        if page >= int(total_pages or 0):
+            break
+
+    index_duration = time.monotonic() - started
+
+    def warm_article(slug):
+        try:
+            _warm_article(
+                slug, tags_id, embed, image_options, max_workers, get_page
+            )
+        except Exception:
+            return False
+
+        return True
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(warm_article, slugs))
+
+    errors += results.count(False)
+
+    metrics = {
+        "pages": warmed_pages,
+        "articles": results.count(True),
+        "errors": errors,
+        "index_seconds": round(index_duration, 3),
+        "seconds": round(time.monotonic() - started, 3),
+        "finished_at": time.time(),
+    }
+
+    last_metrics.clear()
+    last_metrics.update(metrics)
+
+    return metrics
+
+
+class Warmer(threading.Thread):
+    """
+    A background thread running warm on a schedule
+
+    :param interval: Seconds between the start of each warm-up
+    :param options: The arguments for warm
+    """
+
+    def __init__(self, interval=600, **options):
+        super(Warmer, self).__init__(daemon=True)
+        self.interval = interval
+        self.options = options
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            started = time.monotonic()
+
+            try:
+                warm(**self.options)
+            except Exception:
+                pass
+
+            self._stopped.wait(
+                max(0, self.interval - (time.monotonic() - started))
+            )
+
+    def stop(self):
+        self._stopped.set()
+
+
+def _id_list(value):
+    return [int(id) for id in value.split(",") if id]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description="Warm the blog caches with the first index pages"
+    )
+    parser.add_argument(
+        "--tags", type=_id_list, required=True, help="e.g. 1,2,3"
+    )
+    parser.add_argument("--exclude-tags", type=_id_list, default=None)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--embed", action="store_true")
+    arguments = parser.parse_args(args)
+
+    metrics = warm(
+        arguments.tags,
+        pages=arguments.pages,
+        excluded_tags=arguments.exclude_tags,
+        max_workers=arguments.workers,
+        embed=arguments.embed,
+    )
+
+    print(json.dumps(metrics))
+
+    return 1 if metrics["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,132 +1,793 @@
+import math
 import os
-
-from canonicalwebteam.http import CachedSession
-
+import re
+import time
+
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlencode
+
+from canonicalwebteam.blog import metrics
+from canonicalwebteam.blog.cache import MISSING, ObjectCache, ResponseCache
+from canonicalwebteam.blog.resilience import (
+    CircuitBreaker,
+    CircuitBreakerAdapter,
+    request_with_retries,
+)
+from canonicalwebteam.blog.shared_cache import SharedCache
+from canonicalwebteam.http import (
+    CacheAdapterWithTimeout,
+    CachedSession,
+    UncachedSession,
+)
 
 API_URL = os.getenv(
     "BLOG_API", "https://admin.insights.ubuntu.com/wp-json/wp/v2"
 )
 
 
-api_session = CachedSession(fallback_cache_duration=3600)
+# The largest page size the WordPress API allows
+MAX_PER_PAGE = 100
+
+# The linked objects to include in a post response when embedding
+EMBEDDED_LINKS = "author,wp:featuredmedia"
+
+# Default field projections ("_fields") for each view, so only the
+# parts of each object that are displayed get downloaded
+INDEX_FIELDS = [
+    "id",
+    "date_gmt",
+    "modified_gmt",
+    "slug",
+    "link",
+    "title",
+    "excerpt",
+    "featured_media",
+    "author",
+    "categories",
+    "tags",
+    "group",
+]
+ARTICLE_FIELDS = INDEX_FIELDS + ["content"]
+RELATED_FIELDS = INDEX_FIELDS
+TAG_FIELDS = ["id", "name"]
+
+# How long, in seconds, parsed objects of each entity type are kept
+# in memory by object_cache
+OBJECT_CACHE_TTLS = {
+    "users": 3600,
+    "media": 3600,
+    "categories": 3600,
+    "group": 3600,
+    "tags": 3600,
+    "post_ids": 300,
+}
+
+# Connection pooling, timeouts, retries and circuit breaking of API
+# requests, see configure_session
+SESSION_OPTIONS = {
+    "pool_connections": 10,
+    "pool_maxsize": 10,
+    "timeout": (0.5, 3),
+    "retries": 2,
+    "backoff_factor": 0.2,
+    "failure_threshold": 5,
+    "reset_timeout": 30,
+    "cache_directory": None,
+    "cache_max_size": 256 * 1024 * 1024,
+}
+
+circuit_breaker = CircuitBreaker()
+
+
+class _CachedAdapter(CacheAdapterWithTimeout, CircuitBreakerAdapter):
+    """The adapter of api_session: responses are served from the HTTP
+    cache when possible, and other requests go through circuit_breaker
+    """
+
+    pass
+
+
+def _build_session():
+    """Build the CachedSession of the API with SESSION_OPTIONS"""
+    session = CachedSession(
+        fallback_cache_duration=3600, timeout=SESSION_OPTIONS["timeout"]
+    )
+    cached_adapter = session.get_adapter("https://")
+    cache = cached_adapter.cache
+
+    if SESSION_OPTIONS["cache_directory"]:
+        cache = SharedCache(
+            SESSION_OPTIONS["cache_directory"],
+            max_size=SESSION_OPTIONS["cache_max_size"],
+        )
+
+    adapter = _CachedAdapter(
+        heuristic=cached_adapter.heuristic,
+        cache=cache,
+        timeout=SESSION_OPTIONS["timeout"],
+        pool_connections=SESSION_OPTIONS["pool_connections"],
+        pool_maxsize=SESSION_OPTIONS["pool_maxsize"],
+    )
+    adapter.circuit_breaker = circuit_breaker
+
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+api_session = _build_session()
+
+object_cache = ObjectCache(max_size=2000, ttls=OBJECT_CACHE_TTLS)
+
+# Coalesces concurrent requests for the same URL, and falls back to the last
+# good response when the API fails
+response_cache = ResponseCache(fresh_for=300)
+
+metrics.register_cache("api_objects", object_cache)
+metrics.register_cache("api_responses", response_cache)
+
+# When responses were last purged, by the predicate or URL they were purged
+# with, see purge_responses
+_purged_at = {}
+
+# A local snapshot.SnapshotStore to read from instead of the API, see
+# use_snapshot
+snapshot = None
+
+
+def use_snapshot(store):
+    """Serve posts, terms, users and media from a local snapshot once
+    it has synced them, instead of requesting them from the API. The
+    related articles index is filled with its posts, and filled again
+    when they're synced, see related.RelatedIndex.load.
+
+    :param store: A snapshot.SnapshotStore, or None to stop using one
+    """
+    global snapshot
+    snapshot = store
+
+    if store is not None:
+        # Imported here, as the related module imports this one
+        from canonicalwebteam.blog.related import related_index
+
+        related_index.load(store)
+
+
+def _snapshot_has(entity):
+    return snapshot is not None and snapshot.is_synced(entity)
+
+
+def configure_session(**options):
+    """Set up the API session and circuit breaker. Options not given keep
+    their value from SESSION_OPTIONS.
+
+    :param pool_connections: The number of hosts to keep connections to
+    :param pool_maxsize: The most connections to keep alive per host, which
+        should be at least the number of threads making requests
+    :param timeout: The (connect, read) timeouts in seconds
+    :param retries: The most retries of connection errors, timeouts and
+        gateway errors
+    :param backoff_factor: The base delay between retries in seconds
+    :param failure_threshold: Consecutive failures after which requests
+        fail fast, or 0 to always make requests
+    :param reset_timeout: Seconds to fail fast for before trying again
+    :param cache_directory: A directory to keep the HTTP cache in, shared
+        by every worker process on the host, see SharedCache
+    :param cache_max_size: The most bytes the shared HTTP cache can take
+    """
+    global api_session, circuit_breaker
+
+    unknown_options = set(options) - set(SESSION_OPTIONS)
+
+    if unknown_options:
+        raise TypeError(
+            "Unknown session options: " + ", ".join(sorted(unknown_options))
+        )
+
+    SESSION_OPTIONS.update(options)
+
+    circuit_breaker = CircuitBreaker(
+        failure_threshold=SESSION_OPTIONS["failure_threshold"],
+        reset_timeout=SESSION_OPTIONS["reset_timeout"],
+    )
+    api_session = _build_session()
+
+
+def _endpoint(url):
+    """The endpoint of a URL to label metrics with, e.g. "/media/{id}" """
+    if not url.startswith(API_URL):
+        return "feed"
+
+    start = len(API_URL)
+    path = url[start:].split("?")[0]
+
+    return re.sub(r"/[0-9]+$", "/{id}", path)
+
+
+def _is_purged(url, response):
+    """Whether a response comes from the HTTP cache, and was kept there
+    from before its URL was purged
+    """
+    if getattr(response, "from_cache", False) is not True or not _purged_at:
+        return False
+
+    try:
+        date = parsedate_to_datetime(response.headers["Date"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return False
+
+    return any(
+        purged_at > date and (key == url or (callable(key) and key(url)))
+        for key, purged_at in list(_purged_at.items())
+    )
+
+
+def _request(url, session=None, **kwargs):
+    started = time.perf_counter()
+    response = None
+
+    def get(**options):
+        # api_session's adapter checks circuit_breaker itself, for the
+        # requests missing its cache only
+        return request_with_retries(
+            (session or api_session).get,
+            url,
+            circuit_breaker=None if session is None else circuit_breaker,
+            retries=SESSION_OPTIONS["retries"],
+            backoff_factor=SESSION_OPTIONS["backoff_factor"],
+            **options
+        )
+
+    try:
+        response = get(**kwargs)
+
+        if _is_purged(url, response):
+            # Fetch it again, replacing it in the HTTP cache
+            headers = dict(kwargs.pop("headers", None) or {})
+            headers["Cache-Control"] = "no-cache"
+            response = get(headers=headers, **kwargs)
+    finally:
+        metrics.record_api_call(
+            _endpoint(url),
+            time.perf_counter() - started,
+            response,
+            streamed=kwargs.get("stream", False),
+        )
+
+    return response
+
+
+def _get(url):
+    return response_cache.get(url, _request)
+
+
+def purge_responses(predicate, urls=()):
+    """Remove the responses of some URLs from response_cache and from the
+    HTTP cache of api_session.
+
+    Responses in the HTTP cache that can't be deleted by URL, as they
+    aren't in response_cache, are fetched again the next time they're
+    requested, see _is_purged.
+
+    :param predicate: A function of a URL, true for the URLs to remove
+    :param urls: Other URLs to remove
+
+    :returns: The URLs removed from response_cache
+    """
+    purged_at = time.time()
+    _purged_at[predicate] = purged_at
+
+    for url in urls:
+        _purged_at[url] = purged_at
+
+    removed_urls = response_cache.delete_where(predicate)
+
+    for adapter in set(api_session.adapters.values()):
+        cache = getattr(adapter, "cache", None)
+
+        if cache is None:
+            continue
+
+        for url in removed_urls + list(urls):
+            try:
+                cache.delete(adapter.controller.cache_url(url))
+            except (KeyError, OSError):
+                pass
+
+    return removed_urls
 
 
 def process_response(response):
     if not response.ok:
-        raise Exception("Error from api: " + response.status_code)
+        raise Exception("Error from api: " + str(response.status_code))
 
     return response.json()
 
 
-def get_articles(tags, per_page=12, page=1, exclude=None, category=None):
-    url_parts = [
-        API_URL,
-        "/posts?",
-        "&per_page=",
-        str(per_page),
-        "&page=",
-        str(page),
+# Query parameters holding lists of IDs
+ID_LIST_PARAMS = ("categories", "exclude", "include", "tags", "tags_exclude")
+
+
+def _param_value(name, value):
+    """Normalise a query parameter value to a string. Lists of IDs, which
+    can also be given as a single ID or a comma separated string, are
+    deduplicated and sorted, as are other lists, like "_fields".
+    """
+    if name in ID_LIST_PARAMS:
+        if not isinstance(value, (list, tuple, set)):
+            value = str(value).split(",")
+
+        ids = {int(id) for id in value if str(id).strip()}
+
+        return ",".join(str(id) for id in sorted(ids))
+
+    if isinstance(value, (list, tuple, set)):
+        return ",".join(sorted(set(str(item) for item in value)))
+
+    return str(value)
+
+
+def build_url(endpoint, **params):
+    """Build the canonical URL of an API query, so the same query always
+    has the same URL, and so the same entries in the caches.
+
+    Parameters without a value are left out, the rest are normalised by
+    _param_value and sorted by name.
+
+    :param endpoint: The API path, e.g. "/posts" or "/media/1"
+    :param params: The query parameters
+
+    :returns: The URL
+    """
+    query = [
+        (name, _param_value(name, value))
+        for name, value in sorted(params.items())
+        if value is not None
+        and value is not False
+        and value != ""
+        and not (isinstance(value, (list, tuple, set)) and not value)
     ]
 
-    if tags:
-        url_parts = url_parts + ["&tags=", str(tags)]
+    url = API_URL + endpoint
+
+    if not query:
+        return url
+
+    return url + "?" + urlencode(query, safe=",:")
+
+
+def _fields_value(fields, embed=False):
+    """The "_fields" parameter limiting the fields returned
+
+    :param fields: A list of field names, or None for all fields
+    :param embed: Whether the linked objects are being embedded, which
+        needs the "_links" and "_embedded" fields
+
+    :returns: A list of fields, or None for all fields
+    """
+    if not fields:
+        return None
+
+    if embed:
+        return list(fields) + ["_links", "_embedded"]
+
+    return list(fields)
+
 
-    if exclude:
-        url_parts = url_parts + ["&exclude=", str(exclude)]
+def _fields_key(fields):
+    """A cache key for a list of fields, whatever their order"""
+    return tuple(sorted(set(fields or ())))
 
-    if category:
-        url_parts = url_parts + ["&categories=", str(category)]
 
-    url = "".join(url_parts)
+def _post_ids_key(tags=None, exclude=None, category=None):
+    return build_url("/posts", tags=tags, exclude=exclude, categories=category)
 
-    response = api_session.get(url)
-    total_pages = response.headers.get("X-WP-TotalPages")
 
-    return process_response(response), total_pages
+def get_post_ids(tags=None, exclude=None, category=None, count=None):
+    """The IDs of the posts of a query, newest first, and the number of
+    posts it matches.
 
+    The IDs are cached in object_cache for each query, as "post_ids", and
+    fetched MAX_PER_PAGE at a time, only as far as count needs, so any
+    page of the query can be served by slicing them. The cached IDs are
+    dropped when a post changes, see invalidation.
 
-def get_article(slug, tags=None, excluded_tags=None):
-    url = "".join([API_URL, "/posts?slug=", slug])
-    if tags:
-        url = url + "&tags=" + ",".join(str(tag) for tag in tags)
-    if excluded_tags:
-        url = (
-            url
-            + "&tags_exclude="
-            + ",".join((str(tag) for tag in excluded_tags))
+    If the total of a later block differs from the cached one, posts were
+    added or removed since the cached blocks were fetched, so the IDs
+    would shift at the boundary. They're all fetched again, bypassing the
+    caches.
+
+    :param tags: The tag IDs, one of which the posts need
+    :param exclude: The IDs of posts to leave out
+    :param category: The category IDs, one of which the posts need
+    :param count: The number of IDs needed, or None for all
+
+    :returns: A (post IDs, total) tuple
+    """
+    query_url = _post_ids_key(tags=tags, exclude=exclude, category=category)
+    post_ids = object_cache.get("post_ids", query_url)
+
+    if post_ids is MISSING:
+        post_ids = ((), None)
+
+    ids, total = post_ids
+    refetching = False
+
+    while total is None or len(ids) < min(total, count or total):
+        url = build_url(
+            "/posts",
+            per_page=MAX_PER_PAGE,
+            page=len(ids) // MAX_PER_PAGE + 1,
+            tags=tags,
+            exclude=exclude,
+            categories=category,
+            _fields=["id"],
         )
 
-    response = api_session.get(url)
+        if refetching:
+            response = _request(url, headers={"Cache-Control": "no-cache"})
+        else:
+            response = _get(url)
+
+        new_ids = tuple(post["id"] for post in process_response(response))
+        new_total = int(response.headers.get("X-WP-Total", len(ids)))
+
+        if ids and new_total != total and not refetching:
+            ids, total = (), None
+            refetching = True
+            continue
+
+        ids += new_ids
+        total = new_total
+
+        if len(new_ids) < MAX_PER_PAGE:
+            # The last page, however many posts the API counted
+            total = len(ids)
+
+        object_cache.set("post_ids", query_url, (ids, total))
+
+    return list(ids), total
+
+
+def get_articles(
+    tags,
+    per_page=12,
+    page=1,
+    exclude=None,
+    category=None,
+    embed=False,
+    fields=None,
+):
+    """Get a page of posts, newest first. The page's post IDs are sliced
+    from get_post_ids, and the posts fetched by ID, so deep pages cost the
+    same as the first one. The first page is fetched directly until the
+    query's IDs are cached, to take a single request.
+
+    :returns: A (posts, total_pages) tuple
+    """
+    if _snapshot_has("posts"):
+        return snapshot.get_posts(
+            tags=tags,
+            per_page=per_page,
+            page=page,
+            exclude=exclude,
+            category=category,
+            fields=fields,
+        )
 
-    return process_response(response)
+    page = int(page)
+    per_page = int(per_page)
+    query_url = _post_ids_key(tags=tags, exclude=exclude, category=category)
+
+    if page == 1 and object_cache.get("post_ids", query_url) is MISSING:
+        url = build_url(
+            "/posts",
+            per_page=per_page,
+            page=1,
+            tags=tags,
+            exclude=exclude,
+            categories=category,
+            _embed=EMBEDDED_LINKS if embed else None,
+            _fields=_fields_value(fields, embed=embed),
+        )
+        response = _get(url)
+        posts = process_response(response)
+        total = int(response.headers.get("X-WP-Total", len(posts)))
 
+        return posts, max(1, math.ceil(total / per_page))
 
-def get_tag_by_name(name):
-    url = "".join([API_URL, "/tags?search=", name])
+    post_ids, total = get_post_ids(
+        tags=tags, exclude=exclude, category=category, count=page * per_page
+    )
+    total_pages = max(1, math.ceil(total / per_page))
+    start = max(0, page - 1) * per_page
+    page_ids = post_ids[start:][:per_page]
+
+    if page < 1 or not page_ids:
+        return [], total_pages
+
+    if fields and "id" not in fields:
+        fields = ["id"] + list(fields)
+
+    url = build_url(
+        "/posts",
+        per_page=len(page_ids),
+        include=page_ids,
+        _embed=EMBEDDED_LINKS if embed else None,
+        _fields=_fields_value(fields, embed=embed),
+    )
 
-    response = api_session.get(url)
+    response = _get(url)
+    posts = {post["id"]: post for post in process_response(response)}
 
-    return process_response(response)
+    return [posts[id] for id in page_ids if id in posts], total_pages
 
 
-def get_tags_by_ids(ids):
-    url = "".join([API_URL, "/tags?include=", ",".join(str(id) for id in ids)])
+def get_article(slug, tags=None, excluded_tags=None, embed=False, fields=None):
+    if _snapshot_has("posts"):
+        return snapshot.get_posts(
+            slug=slug, tags=tags, tags_exclude=excluded_tags, fields=fields
+        )[0]
 
-    response = api_session.get(url)
+    url = build_url(
+        "/posts",
+        slug=slug,
+        tags=tags,
+        tags_exclude=excluded_tags,
+        _embed=EMBEDDED_LINKS if embed else None,
+        _fields=_fields_value(fields, embed=embed),
+    )
+
+    response = _get(url)
 
     return process_response(response)
 
 
-def get_categories():
-    url = "".join([API_URL, "/categories?", "per_page=100"])
+# The statuses the API answers with for a post that was deleted or
+# unpublished
+GONE_STATUSES = (401, 404, 410)
+
+
+def fetch_post(post_id, fields=None):
+    """Fetch a post straight from the API, bypassing the caches
+
+    :returns: The post, or None if it was deleted or unpublished
+    :raises: An exception for any other error from the API
+    """
+    response = _request(
+        build_url(
+            "/posts/{}".format(int(post_id)), _fields=_fields_value(fields)
+        ),
+        session=UncachedSession(timeout=SESSION_OPTIONS["timeout"]),
+    )
 
-    response = api_session.get(url)
+    if response.status_code in GONE_STATUSES:
+        return None
 
     return process_response(response)
 
 
-def get_group_by_id(id):
-    url = "".join([API_URL, "/group/", str(id)])
+def get_tag_by_name(name, fields=None):
+    url = build_url("/tags", search=name, _fields=_fields_value(fields))
 
-    response = api_session.get(url)
+    response = _get(url)
 
     return process_response(response)
 
 
-def get_category_by_id(id):
-    url = "".join([API_URL, "/categories/", str(id)])
+def get_tags_by_ids(ids, fields=None):
+    return list(_get_by_ids("/tags", ids, fields=fields).values())
+
+
+def get_categories(fields=None):
+    url = build_url(
+        "/categories", per_page=MAX_PER_PAGE, _fields=_fields_value(fields)
+    )
 
-    response = api_session.get(url)
+    response = _get(url)
 
     return process_response(response)
 
 
-def get_media(media_id):
-    url = "".join([API_URL, "/media/", str(media_id)])
-    response = api_session.get(url)
+def _get_object(endpoint, id, fields=None, none_if_missing=False):
+    """Fetch a single object, serving it from object_cache when possible
 
-    if not response.ok:
-        return None
+    :param endpoint: The collection path, e.g. "/media"
+    :param id: The ID of the object
+    :param fields: The fields to fetch, or None for all
+    :param none_if_missing: Return None instead of raising an exception
+        when the API doesn't return the object
 
-    return process_response(response)
+    :returns: The object
+    """
+    entity = endpoint.lstrip("/")
+    cache_key = (int(id), _fields_key(fields))
 
+    cached_object = object_cache.get(entity, cache_key)
 
-def get_user(user_id):
-    url = "".join([API_URL, "/users/", str(user_id)])
-    response = api_session.get(url)
+    if cached_object is not MISSING:
+        return cached_object
 
-    if not response.ok:
+    if _snapshot_has(entity):
+        api_object = snapshot.get(entity, id, fields=fields)
+
+        if api_object is not None:
+            return api_object
+
+    url = build_url(
+        "{}/{}".format(endpoint, int(id)), _fields=_fields_value(fields)
+    )
+    response = _get(url)
+
+    if none_if_missing and not response.ok:
         return None
 
-    return process_response(response)
+    api_object = process_response(response)
+    object_cache.set(entity, cache_key, api_object)
+
+    return api_object
+
+
+def get_group_by_id(id, fields=None):
+    return _get_object("/group", id, fields=fields)
+
+
+def get_category_by_id(id, fields=None):
+    return _get_object("/categories", id, fields=fields)
+
+
+def get_media(media_id, fields=None):
+    return _get_object("/media", media_id, fields=fields, none_if_missing=True)
+
+
+def get_user(user_id, fields=None):
+    return _get_object("/users", user_id, fields=fields, none_if_missing=True)
+
+
+def _get_by_ids(endpoint, ids, fields=None):
+    """Fetch all the objects of a collection with the given IDs, using the
+    "include" parameter. Objects already in object_cache aren't requested
+    again. IDs are requested 100 at a time, the maximum number of objects
+    the API returns per page. If a request fails, its IDs are requested
+    one by one, so only the objects that can't be fetched are missing.
+
+    :param endpoint: The collection path, e.g. "/media"
+    :param ids: The IDs to fetch
+    :param fields: The fields to fetch for each object, or None for all
+
+    :returns: A dict of objects keyed by ID
+    """
+    entity = endpoint.lstrip("/")
+    objects = {}
+
+    if fields and "id" not in fields:
+        fields = ["id"] + list(fields)
+
+    fields_key = _fields_key(fields)
+    missing_ids = []
+
+    for id in sorted({int(id) for id in ids}):
+        cached_object = object_cache.get(entity, (id, fields_key))
+
+        if cached_object is MISSING:
+            missing_ids.append(id)
+        else:
+            objects[id] = cached_object
+
+    if missing_ids and _snapshot_has(entity):
+        objects.update(snapshot.get_many(entity, missing_ids, fields=fields))
+        missing_ids = [id for id in missing_ids if id not in objects]
+
+    for start in range(0, len(missing_ids), MAX_PER_PAGE):
+        url = build_url(
+            endpoint,
+            per_page=MAX_PER_PAGE,
+            include=missing_ids[start:][:MAX_PER_PAGE],
+            _fields=_fields_value(fields),
+        )
+
+        try:
+            items = process_response(_get(url))
+        except Exception:
+            # Don't lose the whole chunk to one failed request
+            objects.update(
+                _get_each(endpoint, missing_ids[start:][:MAX_PER_PAGE], fields)
+            )
+            continue
+
+        for item in items:
+            objects[item["id"]] = item
+            object_cache.set(entity, (item["id"], fields_key), item)
+
+    return objects
+
+
+def _get_each(endpoint, ids, fields=None):
+    """Fetch objects one by one, leaving out the ones that fail
+
+    :returns: A dict of objects keyed by ID
+    """
+    objects = {}
+
+    for id in ids:
+        try:
+            api_object = _get_object(
+                endpoint, id, fields=fields, none_if_missing=True
+            )
+        except Exception:
+            continue
+
+        if api_object is not None:
+            objects[id] = api_object
+
+    return objects
+
+
+def get_media_by_ids(ids, fields=None):
+    return _get_by_ids("/media", ids, fields=fields)
+
+
+def get_users_by_ids(ids, fields=None):
+    return _get_by_ids("/users", ids, fields=fields)
+
+
+def get_categories_by_ids(ids, fields=None):
+    return _get_by_ids("/categories", ids, fields=fields)
+
+
+def get_groups_by_ids(ids, fields=None):
+    return _get_by_ids("/group", ids, fields=fields)
+
+
+FEED_URL = "https://admin.insights.ubuntu.com/?tag={}&feed=rss"
+
+# The size of the chunks a feed is streamed in
+FEED_CHUNK_SIZE = 16384
 
 
 def get_feed(tag):
-    response = api_session.get(
-        "https://admin.insights.ubuntu.com/?tag={}&feed=rss".format(tag)
-    )
+    response = _get(FEED_URL.format(quote(tag)))
 
     if not response.ok:
         return None
 
     return response.text
+
+
+def get_feed_stream(tag, chunk_size=FEED_CHUNK_SIZE):
+    """Request a feed without reading its body. If the request fails, the
+    feed is got with get_feed, which serves the last good response.
+
+    :param tag: The tag name of the feed
+    :param chunk_size: The size of the chunks to read
+
+    :returns: An iterator of strings, or None if the feed isn't available
+    """
+    try:
+        response = _request(FEED_URL.format(quote(tag)), stream=True)
+    except Exception:
+        response = None
+
+    if response is None or not response.ok:
+        if response is not None:
+            response.close()
+
+        feed = get_feed(tag)
+
+        return None if feed is None else iter([feed])
+
+    if not response.encoding:
+        response.encoding = "utf-8"
+
+    return _stream(response, chunk_size)
+
+
+def _stream(response, chunk_size):
+    """Iterate over the body of a response, closing it when done, or when
+    the iteration is abandoned
+    """
+    try:
+        yield from response.iter_content(chunk_size, decode_unicode=True)
+    finally:
+        response.close()
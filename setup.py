@@ -14,6 +14,17 @@ setup(
     packages=find_packages(),
     long_description=open("README.md").read(),
     install_requires=["canonicalwebteam.http==1.0.1"],
-    extra_require={"flask": ["Flask>=1.0.2"], "django": ["django>=2.0.11"]},
+    extras_require={
+        "flask": ["Flask>=1.0.2"],
+        "django": ["django>=2.0.11"],
+        "brotli": ["brotli"],
+    },
     test_suite="tests",
+    entry_points={
+        "console_scripts": [
+            "canonicalwebteam-blog-warm = canonicalwebteam.blog.warmer:main",
+            "canonicalwebteam-blog-sync = canonicalwebteam.blog.snapshot:main",
+            "canonicalwebteam-blog-export = canonicalwebteam.blog.export:main",
+        ]
+    },
 )
@@ -0,0 +1,42 @@
+import unittest
+
+import flask
+
+from unittest.mock import patch
+from werkzeug.routing import BaseConverter
+from canonicalwebteam.blog.app import BlogExtension
+
+
+class RegexConverter(BaseConverter):
+    def __init__(self, url_map, *items):
+        super(RegexConverter, self).__init__(url_map)
+        self.regex = items[0]
+
+
+class TestBlogExtension(unittest.TestCase):
+    @patch("canonicalwebteam.blog.app.Warmer")
+    def test_warmer_starts_once_the_app_is_set_up(self, warmer):
+        app = flask.Flask(__name__)
+        app.url_map.converters["regex"] = RegexConverter
+        blog = BlogExtension(app, "Blog", [1], "blog", "/blog", warm_pages=1)
+
+        warmer.return_value.start.assert_not_called()
+
+        # The app can still be set up after the extension
+        @app.route("/other")
+        def other():
+            return "other"
+
+        client = app.test_client()
+        client.get("/other")
+        client.get("/other")
+
+        warmer.return_value.start.assert_called_once_with()
+
+        blog.start_warmer()
+
+        warmer.return_value.start.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import asyncio
+import unittest
+
+from unittest.mock import MagicMock, patch
+from canonicalwebteam.blog import async_wordpress_api as async_api
+
+
+class TestAsyncWordpressApi(unittest.TestCase):
+    @patch("canonicalwebteam.blog.wordpress_api.get_post_ids")
+    def test_runs_getters_on_executor(self, get_post_ids):
+        get_post_ids.return_value = ((1, 2), 2)
+
+        ids = asyncio.run(async_api.get_post_ids(tags=[1]))
+
+        self.assertEqual(ids, ((1, 2), 2))
+        get_post_ids.assert_called_once_with(tags=[1])
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_post_ids")
+    def test_configure_pool_size(self, get_post_ids):
+        get_post_ids.return_value = ((1,), 1)
+        previous_executor = async_api.executor
+        self.addCleanup(async_api.configure)
+
+        async_api.configure(max_workers=2)
+
+        self.assertIsNot(async_api.executor, previous_executor)
+        self.assertEqual(async_api.executor._max_workers, 2)
+        self.assertEqual(asyncio.run(async_api.get_post_ids()), ((1,), 1))
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_feed_stream")
+    def test_get_feed_stream(self, get_feed_stream):
+        chunks = MagicMock()
+        chunks.__next__.side_effect = ["<rss>", "</rss>", StopIteration]
+        get_feed_stream.return_value = chunks
+
+        async def read():
+            stream = await async_api.get_feed_stream("blog")
+
+            return [chunk async for chunk in stream]
+
+        self.assertEqual(asyncio.run(read()), ["<rss>", "</rss>"])
+        chunks.close.assert_called_once_with()
+
+        get_feed_stream.return_value = None
+
+        self.assertIsNone(asyncio.run(async_api.get_feed_stream("blog")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import threading
+import time
+import unittest
+
+from unittest.mock import MagicMock, patch
+from canonicalwebteam.blog.cache import (
+    MISSING,
+    CachedResponse,
+    ObjectCache,
+    ResponseCache,
+)
+
+
+class TestObjectCache(unittest.TestCase):
+    def test_get_and_set(self):
+        cache = ObjectCache()
+        cache.set("users", 1, None)
+
+        self.assertIsNone(cache.get("users", 1))
+        self.assertIs(cache.get("users", 2), MISSING)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = ObjectCache(max_size=2)
+        cache.set("users", 1, "one")
+        cache.set("users", 2, "two")
+        cache.get("users", 1)
+        cache.set("users", 3, "three")
+
+        self.assertEqual(cache.get("users", 1), "one")
+        self.assertIs(cache.get("users", 2), MISSING)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    @patch("canonicalwebteam.blog.cache.time")
+    def test_expires_per_entity(self, time):
+        time.monotonic.return_value = 0
+        cache = ObjectCache(ttls={"users": 10}, default_ttl=1)
+        cache.set("users", 1, "user")
+        cache.set("media", 1, "media")
+
+        time.monotonic.return_value = 5
+
+        self.assertEqual(cache.get("users", 1), "user")
+        self.assertIs(cache.get("media", 1), MISSING)
+
+    def test_clear_entity(self):
+        cache = ObjectCache()
+        cache.set("users", 1, "user")
+        cache.set("media", 1, "media")
+        cache.clear("users")
+
+        self.assertIs(cache.get("users", 1), MISSING)
+        self.assertEqual(cache.get("media", 1), "media")
+
+
+def mock_response(ok=True, status_code=None):
+    response = MagicMock()
+    response.ok = ok
+    response.status_code = status_code or (200 if ok else 500)
+    response.headers = {"Content-Type": "application/json"}
+    response.content = b'{"id": 1}'
+    response.encoding = None
+    return response
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_coalesces_concurrent_requests(self):
+        cache = ResponseCache()
+        started = threading.Barrier(6)
+        release = threading.Event()
+        response = mock_response()
+
+        def fetch(url):
+            release.wait()
+            return response
+
+        fetch = MagicMock(side_effect=fetch)
+        results = []
+
+        def get():
+            started.wait()
+            results.append(cache.get("url", fetch))
+
+        threads = [threading.Thread(target=get) for _ in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        # Let every thread reach the cache before the first fetch returns
+        started.wait()
+        time.sleep(0.1)
+        release.set()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [response] * 5)
+        fetch.assert_called_once_with("url")
+
+    def test_falls_back_to_last_good_response(self):
+        cache = ResponseCache()
+        good_response = mock_response()
+        self.assertIs(
+            cache.get("url", lambda url: good_response), good_response
+        )
+
+        for fetch in [
+            lambda url: mock_response(ok=False),
+            MagicMock(side_effect=Exception("timeout")),
+        ]:
+            last_good_response = cache.get("url", fetch)
+
+            # Only the status, headers and body are kept
+            self.assertIsInstance(last_good_response, CachedResponse)
+            self.assertTrue(last_good_response.ok)
+            self.assertEqual(
+                last_good_response.headers["content-type"],
+                "application/json",
+            )
+            self.assertEqual(last_good_response.json(), {"id": 1})
+            self.assertEqual(last_good_response.text, '{"id": 1}')
+
+        with self.assertRaises(Exception):
+            cache.get("other", MagicMock(side_effect=Exception("timeout")))
+
+    def test_client_errors_drop_last_good_response(self):
+        cache = ResponseCache()
+        cache.get("url", lambda url: mock_response())
+        not_found = mock_response(ok=False, status_code=404)
+
+        self.assertIs(cache.get("url", lambda url: not_found), not_found)
+
+        with self.assertRaises(Exception):
+            cache.get("url", MagicMock(side_effect=Exception("timeout")))
+
+    @patch("canonicalwebteam.blog.cache.threading.Thread")
+    def test_stale_while_revalidate(self, thread):
+        cache = ResponseCache(fresh_for=0, stale_while_revalidate=True)
+        stale_response = mock_response()
+        cache.get("url", lambda url: stale_response)
+
+        fetch = MagicMock()
+
+        self.assertEqual(cache.get("url", fetch).content, b'{"id": 1}')
+        fetch.assert_not_called()
+        thread.return_value.start.assert_called_once_with()
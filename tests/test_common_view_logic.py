@@ -1,25 +1,43 @@
+import asyncio
 import unittest
 
 from unittest.mock import patch
 from canonicalwebteam.blog.common_view_logic import (
+    feed_cache,
     get_index_context,
     get_article_context,
+    get_feed_chunks,
+    get_index_context_async,
+    get_article_context_async,
 )
-from canonicalwebteam.blog import wordpress_api as api
 
 
 class TestCommonViewLogic(unittest.TestCase):
-    @patch("canonicalwebteam.blog.wordpress_api.get_group_by_id")
-    @patch("canonicalwebteam.blog.wordpress_api.get_category_by_id")
-    @patch("canonicalwebteam.blog.wordpress_api.get_user")
-    @patch("canonicalwebteam.blog.wordpress_api.get_media")
+    @patch("canonicalwebteam.blog.wordpress_api.get_groups_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_categories_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_users_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_media_by_ids")
     def test_building_index_context(
-        self, get_media, get_user, get_category_by_id, get_group_by_id
+        self,
+        get_media_by_ids,
+        get_users_by_ids,
+        get_categories_by_ids,
+        get_groups_by_ids,
     ):
-        get_media.return_value = "test_image"
-        get_user.return_value = "test_author"
-        get_category_by_id.return_value = "test_category"
-        get_group_by_id.return_value = "test_group"
+        get_media_by_ids.return_value = {
+            "test": "test_image",
+            "test2": "test_image",
+        }
+        get_users_by_ids.return_value = {
+            "test": "test_author",
+            "test2": "test_author",
+        }
+        get_categories_by_ids.return_value = {
+            1: "test_category",
+            2: "test_category",
+            3: "test_category",
+        }
+        get_groups_by_ids.return_value = {1: "test_group"}
         articles = [
             {
                 "featured_media": "test",
@@ -67,6 +85,104 @@ class TestCommonViewLogic(unittest.TestCase):
         }
         self.assertEqual(context, expected_context)
 
+    @patch("canonicalwebteam.blog.wordpress_api.get_groups_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_categories_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_users_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_media_by_ids")
+    def test_building_index_context_concurrently(
+        self,
+        get_media_by_ids,
+        get_users_by_ids,
+        get_categories_by_ids,
+        get_groups_by_ids,
+    ):
+        get_media_by_ids.side_effect = lambda ids: {
+            id: "image_" + id for id in ids
+        }
+        get_users_by_ids.side_effect = lambda ids: {
+            id: "author_" + id for id in ids
+        }
+        get_categories_by_ids.side_effect = Exception("API down")
+        get_groups_by_ids.return_value = {1: "test_group"}
+        articles = [
+            {
+                "featured_media": "1",
+                "author": "1",
+                "categories": [1, 2],
+                "group": [1],
+                "tags": ["test"],
+            },
+            {
+                "featured_media": "2",
+                "author": "2",
+                "categories": [2, 3],
+                "group": [1],
+                "tags": ["test2"],
+            },
+        ]
+        context = get_index_context(1, articles, 2, max_workers=4)
+
+        self.assertEqual(
+            [article["image"] for article in context["articles"]],
+            ["image_1", "image_2"],
+        )
+        self.assertEqual(
+            [article["author"] for article in context["articles"]],
+            ["author_1", "author_2"],
+        )
+        self.assertEqual(context["groups"], {1: "test_group"})
+        self.assertEqual(
+            context["used_categories"], {1: None, 2: None, 3: None}
+        )
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_groups_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_categories_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_users_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_media_by_ids")
+    def test_building_index_context_from_embedded_articles(
+        self,
+        get_media_by_ids,
+        get_users_by_ids,
+        get_categories_by_ids,
+        get_groups_by_ids,
+    ):
+        get_media_by_ids.return_value = {}
+        get_users_by_ids.return_value = {}
+        get_categories_by_ids.return_value = {1: "test_category"}
+        get_groups_by_ids.return_value = {1: "test_group"}
+        articles = [
+            {
+                "featured_media": 5,
+                "author": 6,
+                "categories": [1],
+                "group": [1],
+                "tags": ["test"],
+                "_embedded": {
+                    "author": [{"id": 6, "name": "test_author"}],
+                    "wp:featuredmedia": [
+                        {"code": "rest_forbidden", "data": {"status": 401}}
+                    ],
+                },
+            }
+        ]
+        context = get_index_context(1, articles, 1)
+
+        get_media_by_ids.assert_called_once_with([])
+        get_users_by_ids.assert_called_once_with([])
+        self.assertEqual(
+            context["articles"],
+            [
+                {
+                    "featured_media": 5,
+                    "author": {"id": 6, "name": "test_author"},
+                    "categories": [1],
+                    "group": 1,
+                    "image": None,
+                    "tags": ["test"],
+                }
+            ],
+        )
+
     def test_building_index_context_without_api(self):
         articles = [
             {
@@ -113,12 +229,10 @@ class TestCommonViewLogic(unittest.TestCase):
 
     @patch("canonicalwebteam.blog.wordpress_api.get_tags_by_ids")
     @patch("canonicalwebteam.blog.wordpress_api.get_articles")
-    @patch("canonicalwebteam.blog.wordpress_api.get_user")
-    @patch("canonicalwebteam.blog.wordpress_api.get_media")
+    @patch("canonicalwebteam.blog.wordpress_api.get_users_by_ids")
     def test_building_article_context(
-        self, get_media, get_user, get_articles, get_tags_by_id
+        self, get_users_by_ids, get_articles, get_tags_by_id
     ):
-        get_media.return_value = "test_image"
         get_articles.return_value = (
             [
                 {
@@ -132,7 +246,7 @@ class TestCommonViewLogic(unittest.TestCase):
             ],
             2,
         )
-        get_user.return_value = "test_author"
+        get_users_by_ids.return_value = {"test": "test_author"}
         get_tags_by_id.return_value = [
             {"id": 1, "name": "test_tag_1"},
             {"id": 2, "name": "test_tag_2"},
@@ -207,3 +321,128 @@ class TestCommonViewLogic(unittest.TestCase):
 
         self.maxDiff = None
         self.assertEqual(context, expected_context)
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_feed_stream")
+    def test_feed_chunks_are_cached_per_host(self, get_feed_stream):
+        feed_cache.clear()
+        get_feed_stream.return_value = iter(
+            ["<title>Ubuntu Blog</title>", "https://admin.insights.ubuntu.com"]
+        )
+
+        feed = "".join(get_feed_chunks("test", "https://test", "Test Blog"))
+
+        self.assertEqual(feed, "<title>Test Blog</title>https://test")
+        self.assertEqual(
+            get_feed_chunks("test", "https://test", "Test Blog"), [feed]
+        )
+        get_feed_stream.assert_called_once_with("test")
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    @patch("canonicalwebteam.blog.wordpress_api.get_tags_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_users_by_ids")
+    def test_related_index_becoming_ready_during_lookups(
+        self, get_users_by_ids, get_tags_by_ids, get_articles
+    ):
+        get_users_by_ids.return_value = {}
+        get_articles.return_value = ([{"id": 3, "group": []}], 1)
+        articles = [{"id": 1, "author": 1, "tags": [2], "group": []}]
+
+        with patch(
+            "canonicalwebteam.blog.common_view_logic.related_index"
+        ) as related_index:
+            related_index.ready = False
+
+            def get_tags(*args, **kwargs):
+                related_index.ready = True
+                return []
+
+            get_tags_by_ids.side_effect = get_tags
+            context = get_article_context(articles, max_workers=4)
+
+        related_index.related.assert_not_called()
+        self.assertEqual(
+            [article["id"] for article in context["related_articles"]], [3]
+        )
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    @patch("canonicalwebteam.blog.wordpress_api.get_tags_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_users_by_ids")
+    def test_building_article_context_from_related_index(
+        self, get_users_by_ids, get_tags_by_ids, get_articles
+    ):
+        get_users_by_ids.return_value = {}
+        get_tags_by_ids.return_value = [{"id": 2, "name": "sc:series-test"}]
+        articles = [{"id": 1, "author": 1, "tags": [2], "group": []}]
+
+        with patch(
+            "canonicalwebteam.blog.common_view_logic.related_index"
+        ) as related_index:
+            related_index.related.return_value = [
+                {"id": 3, "tags": [2], "group": []}
+            ]
+            context = get_article_context(articles)
+
+        related_index.related.assert_called_once_with(
+            articles[0], limit=3, series_tag_ids=[2]
+        )
+        get_articles.assert_not_called()
+        self.assertEqual(
+            context["related_articles"],
+            [
+                {
+                    "id": 3,
+                    "tags": [2],
+                    "group": [],
+                    "image": None,
+                    "author": None,
+                }
+            ],
+        )
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_groups_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_categories_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_users_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_media_by_ids")
+    def test_building_index_context_async(
+        self,
+        get_media_by_ids,
+        get_users_by_ids,
+        get_categories_by_ids,
+        get_groups_by_ids,
+    ):
+        get_media_by_ids.return_value = {"test": "test_image"}
+        get_users_by_ids.return_value = {"test": "test_author"}
+        get_categories_by_ids.side_effect = Exception("API down")
+        get_groups_by_ids.return_value = {1: "test_group"}
+        articles = [
+            {
+                "featured_media": "test",
+                "author": "test",
+                "categories": [1],
+                "group": [1],
+                "tags": ["test"],
+            }
+        ]
+
+        context = asyncio.run(get_index_context_async(1, articles, 2))
+
+        self.assertEqual(context, get_index_context(1, articles, 2))
+        self.assertEqual(context["articles"][0]["image"], "test_image")
+        self.assertEqual(context["used_categories"], {1: None})
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_tags_by_ids")
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    @patch("canonicalwebteam.blog.wordpress_api.get_users_by_ids")
+    def test_building_article_context_async(
+        self, get_users_by_ids, get_articles, get_tags_by_ids
+    ):
+        get_users_by_ids.return_value = {"test": "test_author"}
+        get_articles.return_value = ([{"id": 2, "group": []}], 1)
+        get_tags_by_ids.return_value = [{"id": 1, "name": "test_tag"}]
+        articles = [{"id": 1, "author": "test", "group": [], "tags": [1]}]
+
+        context = asyncio.run(get_article_context_async(articles))
+
+        self.assertEqual(context, get_article_context(articles))
+        self.assertEqual(context["article"]["author"], "test_author")
+        self.assertEqual(context["related_articles"][0]["id"], 2)
@@ -0,0 +1,98 @@
+import unittest
+
+import django
+
+from django.conf import settings
+from unittest.mock import patch
+
+if not settings.configured:
+    settings.configure(
+        SECRET_KEY="test",
+        ALLOWED_HOSTS=["*"],
+        TEMPLATES=[
+            {
+                "BACKEND": "django.template.backends.django.DjangoTemplates",
+                "OPTIONS": {
+                    "loaders": [
+                        (
+                            "django.template.loaders.locmem.Loader",
+                            {
+                                "blog/index.html": (
+                                    "{{ title }} {{ current_page }}"
+                                ),
+                            },
+                        )
+                    ]
+                },
+            }
+        ],
+        BLOG_CONFIG={
+            "TAGS_ID": [1],
+            "EXCLUDED_TAGS": [],
+            "BLOG_TITLE": "Test Blog",
+            "TAG_NAME": "test",
+            "PAGE_CACHE_TTL": 60,
+        },
+    )
+    django.setup()
+
+from django.test import RequestFactory  # noqa: E402
+from canonicalwebteam.blog.django import views  # noqa: E402
+
+
+@unittest.skipIf(views.page_cache is None, "Django configured elsewhere")
+class TestDjangoViews(unittest.TestCase):
+    def setUp(self):
+        self.requests = RequestFactory()
+        views.page_cache.clear()
+
+    @patch("canonicalwebteam.blog.django.views.get_index_context")
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_index_is_cached(self, get_articles, get_index_context):
+        get_articles.return_value = ([], 1)
+        get_index_context.return_value = {"current_page": 1}
+
+        response = views.index(self.requests.get("/", {"page": "1"}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"Test Blog 1")
+
+        # The same page, however its number is written
+        response = views.index(self.requests.get("/", {"page": "01"}))
+
+        self.assertEqual(response.content, b"Test Blog 1")
+        get_articles.assert_called_once()
+        self.assertEqual(get_articles.call_args[1]["page"], 1)
+
+        response = views.index(
+            self.requests.get("/", HTTP_IF_NONE_MATCH=response["ETag"])
+        )
+
+        self.assertEqual(response.status_code, 304)
+        get_articles.assert_called_once()
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_index_rejects_invalid_pages(self, get_articles):
+        for page in ["abc", "0", "-1", "1.5"]:
+            response = views.index(self.requests.get("/", {"page": page}))
+
+            self.assertEqual(response.status_code, 404)
+
+        get_articles.assert_not_called()
+        self.assertEqual(views.page_cache.stats()["size"], 0)
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_index_pages_past_the_end_are_not_cached(self, get_articles):
+        get_articles.return_value = ([], 2)
+
+        for _ in range(2):
+            response = views.index(self.requests.get("/", {"page": "99999"}))
+
+            self.assertEqual(response.status_code, 404)
+
+        self.assertEqual(get_articles.call_count, 2)
+        self.assertEqual(views.page_cache.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+from unittest.mock import patch
+from canonicalwebteam.blog import export
+
+
+def render(template_name, context):
+    if template_name == "blog/index.html":
+        return "page {}".format(context["current_page"])
+
+    return context["article"]["slug"]
+
+
+@patch("canonicalwebteam.blog.export.get_feed_chunks")
+@patch(
+    "canonicalwebteam.blog.export.get_article_context",
+    side_effect=lambda articles, **kwargs: {"article": articles[0]},
+)
+@patch(
+    "canonicalwebteam.blog.export.get_index_context",
+    side_effect=lambda page, *args: {"current_page": page},
+)
+@patch("canonicalwebteam.blog.wordpress_api.get_article")
+@patch("canonicalwebteam.blog.wordpress_api.get_articles")
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output_dir = self.directory.name
+        self.articles = [
+            {
+                "id": 1,
+                "slug": "one",
+                "date_gmt": "2019-01-02T10:00:00",
+                "modified_gmt": "2019-01-02T10:00:00",
+            },
+            {
+                "id": 2,
+                "slug": "two",
+                "date_gmt": "2019-01-03T10:00:00",
+                "modified_gmt": "2019-01-03T10:00:00",
+            },
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _read(self, *parts):
+        with open(os.path.join(self.output_dir, *parts)) as exported_file:
+            return exported_file.read()
+
+    def test_export(self, get_articles, get_article, *args):
+        get_feed_chunks = args[-1]
+        get_articles.return_value = (self.articles, 1)
+        get_article.side_effect = lambda slug, **kwargs: [{"slug": slug}]
+        get_feed_chunks.return_value = ["<rss>", "</rss>"]
+
+        metrics = export.export(
+            self.output_dir, [1], render, base_url="/blog", tag_name="blog"
+        )
+
+        self.assertEqual(metrics["articles"], 2)
+        self.assertEqual(metrics["pages"], 1)
+        self.assertEqual(self._read("index.html"), "page 1")
+        self.assertEqual(self._read("one", "index.html"), "one")
+        self.assertIn(
+            'url=/blog/two"',
+            self._read("2019", "01", "03", "two", "index.html"),
+        )
+        self.assertIn("/blog/one", self._read("2019", "one", "index.html"))
+        self.assertEqual(self._read("feed.xml"), "<rss></rss>")
+
+    def test_incremental_export(self, get_articles, get_article, *args):
+        get_articles.return_value = (self.articles, 1)
+        get_article.side_effect = lambda slug, **kwargs: [{"slug": slug}]
+        export.export(self.output_dir, [1], render)
+
+        get_article.reset_mock()
+        changed_article = dict(
+            self.articles[0], modified_gmt="2019-02-01T10:00:00"
+        )
+        get_articles.return_value = ([changed_article], 1)
+
+        metrics = export.export(self.output_dir, [1], render)
+
+        get_article.assert_called_once()
+        self.assertEqual(metrics["articles"], 1)
+        self.assertEqual(metrics["removed"], 1)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.output_dir, "two", "index.html"))
+        )
+
+        get_article.reset_mock()
+        metrics = export.export(self.output_dir, [1], render)
+
+        get_article.assert_not_called()
+        self.assertEqual(metrics["unchanged"], 1)
+        self.assertEqual(metrics["pages"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
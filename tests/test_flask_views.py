@@ -0,0 +1,119 @@
+import gzip
+import unittest
+
+import flask
+import jinja2
+
+from unittest.mock import patch
+from werkzeug.routing import BaseConverter
+from canonicalwebteam.blog.flask.views import build_blueprint
+
+
+class RegexConverter(BaseConverter):
+    def __init__(self, url_map, *items):
+        super(RegexConverter, self).__init__(url_map)
+        self.regex = items[0]
+
+
+class TestFlaskViews(unittest.TestCase):
+    def setUp(self):
+        app = flask.Flask(__name__)
+        app.url_map.converters["regex"] = RegexConverter
+        app.jinja_loader = jinja2.DictLoader(
+            {
+                "blog/index.html": (
+                    "Test Blog {{ current_page }}{{ padding or '' }}"
+                )
+            }
+        )
+        self.blog = build_blueprint(
+            "Test Blog", [1], "test", page_cache_ttl=60, compress_pages=True
+        )
+        app.register_blueprint(self.blog)
+
+        self.client = app.test_client()
+
+    @patch("canonicalwebteam.blog.flask.views.get_index_context")
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_index_is_cached(self, get_articles, get_index_context):
+        get_articles.return_value = ([], 1)
+        get_index_context.return_value = {"current_page": 1}
+
+        response = self.client.get("/?page=1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"Test Blog 1")
+
+        # The same page, however its number is written
+        response = self.client.get("/?page=01")
+
+        self.assertEqual(response.data, b"Test Blog 1")
+        get_articles.assert_called_once()
+        self.assertEqual(get_articles.call_args[1]["page"], 1)
+
+        response = self.client.get(
+            "/", headers={"If-None-Match": response.headers["ETag"]}
+        )
+
+        self.assertEqual(response.status_code, 304)
+        get_articles.assert_called_once()
+
+    @patch("canonicalwebteam.blog.flask.views.get_index_context")
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_index_is_compressed(self, get_articles, get_index_context):
+        get_articles.return_value = ([], 1)
+        get_index_context.return_value = {
+            "current_page": 1,
+            "padding": " " * 2000,
+        }
+
+        plain = self.client.get("/")
+        compressed = self.client.get("/", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertEqual(compressed.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertLess(len(compressed.data), len(plain.data))
+        self.assertNotEqual(plain.headers["ETag"], compressed.headers["ETag"])
+
+        # Each encoding is validated against its own ETag
+        response = self.client.get(
+            "/",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": compressed.headers["ETag"],
+            },
+        )
+
+        self.assertEqual(response.status_code, 304)
+        get_articles.assert_called_once()
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_index_rejects_invalid_pages(self, get_articles):
+        for page in ["abc", "0", "-3", "1.5"]:
+            response = self.client.get("/", query_string={"page": page})
+
+            self.assertEqual(response.status_code, 404)
+
+        get_articles.assert_not_called()
+        self.assertEqual(self.blog.page_cache.stats()["size"], 0)
+
+    @patch("canonicalwebteam.blog.flask.views.get_index_context")
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_index_pages_past_the_end_are_not_cached(
+        self, get_articles, get_index_context
+    ):
+        get_articles.return_value = ([], 2)
+
+        for _ in range(2):
+            response = self.client.get("/?page=99999")
+
+            self.assertEqual(response.status_code, 404)
+
+        self.assertEqual(get_articles.call_count, 2)
+        get_index_context.assert_not_called()
+        self.assertEqual(self.blog.page_cache.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from unittest.mock import MagicMock, patch
+from canonicalwebteam.blog import invalidation
+from canonicalwebteam.blog import logic
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.cache import MISSING
+from canonicalwebteam.blog.common_view_logic import feed_cache
+from canonicalwebteam.blog.page_cache import PageCache
+from canonicalwebteam.blog.slug_index import slug_index
+
+
+class TestInvalidation(unittest.TestCase):
+    def setUp(self):
+        api.response_cache.clear()
+        api.circuit_breaker.record_success()
+        feed_cache.clear()
+        logic.transformed_article_cache.clear()
+        slug_index.clear()
+
+        self.page_cache = PageCache()
+        invalidation.register_page_cache(self.page_cache)
+
+    def tearDown(self):
+        invalidation.page_caches.remove(self.page_cache)
+        slug_index.clear()
+
+    def _cache_response(self, url):
+        response = MagicMock(ok=True)
+        api.response_cache.get(url, lambda url: response)
+
+    @patch("canonicalwebteam.blog.wordpress_api.fetch_post")
+    def test_invalidate_post(self, fetch_post):
+        fetch_post.return_value = {"id": 1, "slug": "new-slug"}
+        slug_index.update([{"id": 1, "slug": "old-slug"}])
+        self._cache_response(api.build_url("/posts", page=1, tags=[1]))
+        self._cache_response(api.build_url("/posts/1"))
+        self._cache_response(api.build_url("/users/1"))
+        logic.transformed_article_cache.set("articles", (1, "date"), {})
+        logic.transformed_article_cache.set("articles", (2, "date"), {})
+        feed_cache.set("feeds", "https://example.com", "<rss>")
+        api.object_cache.set("post_ids", "query", ((1, 2), 2))
+
+        for key in [("index", 1), ("article", "old-slug"), ("article", "b")]:
+            self.page_cache.set(key, "page")
+
+        purged = invalidation.invalidate_post(post_id=1, slug="new-slug")
+
+        self.assertEqual(
+            purged, {"responses": 2, "articles": 1, "pages": 2, "feeds": 1}
+        )
+        self.assertIs(api.object_cache.get("post_ids", "query"), MISSING)
+        self.assertIsNotNone(self.page_cache.get(("article", "b")))
+        self.assertIsNone(self.page_cache.get(("article", "old-slug")))
+        self.assertTrue(slug_index.exists("new-slug"))
+        self.assertIsNone(slug_index.exists("old-slug"))
+
+    def test_invalidate_deleted_post(self):
+        slug_index.update([{"id": 1, "slug": "deleted"}])
+
+        invalidation.invalidate_post(post_id=1, slug="deleted", deleted=True)
+
+        self.assertFalse(slug_index.exists("deleted"))
+
+    @patch("canonicalwebteam.blog.wordpress_api.UncachedSession")
+    def test_api_error_leaves_indexes(self, session):
+        session.return_value.get.return_value = MagicMock(
+            ok=False, status_code=500
+        )
+        slug_index.update([{"id": 1, "slug": "live"}])
+
+        invalidation.invalidate_post(post_id=1, slug="live")
+
+        self.assertTrue(slug_index.exists("live"))
+
+        session.return_value.get.return_value = MagicMock(
+            ok=False, status_code=404
+        )
+        invalidation.invalidate_post(post_id=1, slug="live")
+
+        self.assertFalse(slug_index.exists("live"))
+
+    @patch("canonicalwebteam.blog.invalidation.invalidate_post")
+    def test_handle_webhook(self, invalidate_post):
+        invalidate_post.return_value = {}
+        body = json.dumps({"id": 5, "slug": "a-post"}).encode("utf-8")
+        timestamp = int(time.time())
+        signature = invalidation.sign("secret", body, timestamp)
+
+        def handle(secret, body, signature, timestamp=timestamp):
+            return invalidation.handle_webhook(
+                secret, body, signature, timestamp, feed_tags=["blog"]
+            )[0]
+
+        self.assertEqual(handle("secret", body, "sha256=bad"), 403)
+        self.assertEqual(handle("", body, signature), 403)
+        self.assertEqual(handle("secret", body, signature, None), 403)
+        self.assertEqual(
+            handle("secret", b"[]", invalidation.sign("secret", b"[]", 1), 1),
+            403,
+        )
+        self.assertEqual(
+            handle(
+                "secret", b"[]", invalidation.sign("secret", b"[]", timestamp)
+            ),
+            400,
+        )
+        self.assertEqual(handle("secret", body, signature), 200)
+        invalidate_post.assert_called_once_with(
+            post_id=5, slug="a-post", deleted=False, feed_tags=["blog"]
+        )
+
+        # A replayed request is refused
+        self.assertEqual(handle("secret", body, signature), 403)
+
+    def test_signatures_shared_between_workers(self):
+        body = b'{"id": 5}'
+        timestamp = int(time.time())
+        signatures = [
+            invalidation.sign("secret", body, timestamp + offset)
+            for offset in range(2)
+        ]
+
+        def verify(signature, offset):
+            return invalidation.verify_signature(
+                "secret", body, signature, timestamp + offset
+            )
+
+        with tempfile.TemporaryDirectory() as directory:
+            invalidation.use_log(os.path.join(directory, "log"))
+            self.addCleanup(invalidation.use_log, None)
+            self.addCleanup(invalidation._signatures.clear)
+
+            self.assertTrue(verify(signatures[0], 0))
+
+            # Another worker, which hasn't seen the log yet
+            invalidation._signatures.clear()
+            invalidation._log_position = 0
+
+            with patch("os.getpid", return_value=-1):
+                self.assertFalse(verify(signatures[0], 0))
+
+            # Another worker logging a signature first
+            with patch("os.getpid", return_value=-1):
+                invalidation._append({"signature": signatures[1]})
+
+            self.assertFalse(verify(signatures[1], 1))
+
+    def test_log_shared_between_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            invalidation.use_log(os.path.join(directory, "log"))
+            slug_index.update([{"id": 1, "slug": "deleted"}])
+
+            try:
+                invalidation.invalidate_post(
+                    post_id=1, slug="deleted", deleted=True
+                )
+
+                # Written by this process, so already applied
+                self.assertEqual(invalidation.apply_logged(), 0)
+
+                # Another worker, which hasn't applied it yet
+                slug_index.update([{"id": 1, "slug": "deleted"}])
+                invalidation._log_position = 0
+
+                with patch("os.getpid", return_value=-1):
+                    self.assertEqual(invalidation.apply_logged(), 1)
+
+                self.assertFalse(slug_index.exists("deleted"))
+            finally:
+                invalidation.use_log(None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import unittest
+
+from unittest.mock import patch
+from canonicalwebteam.blog import logic
+
+IMAGE_URL = "https://res.cloudinary.com/canonical/image/fetch/q_auto,f_auto"
+
+
+class TestLogic(unittest.TestCase):
+    def test_replace_images_with_cloudinary(self):
+        content = logic.replace_images_with_cloudinary(
+            '<p><img class="test" src="https://test/image.png" /></p>'
+        )
+
+        self.assertEqual(
+            content,
+            '<p><img class="test" decoding="async"'
+            f' src="{IMAGE_URL},w_650/https://test/image.png"'
+            f' srcset="{IMAGE_URL},w_350/https://test/image.png 350w,'
+            f" {IMAGE_URL},w_650/https://test/image.png 650w,"
+            f" {IMAGE_URL},w_1300/https://test/image.png 1300w,"
+            f' {IMAGE_URL},w_1950/https://test/image.png 1950w"'
+            ' sizes="(max-width: 400px) 350w, 650px" /></p>',
+        )
+
+    def test_replace_images_with_picture(self):
+        content = logic.replace_images_with_cloudinary(
+            '<img src="https://test/image.png" loading="eager">',
+            breakpoints=(300, 600),
+            lazy_load=True,
+            picture=True,
+        )
+
+        self.assertTrue(
+            content.startswith(
+                '<picture><source media="(max-width: 300px)"'
+                f' srcset="{IMAGE_URL},w_300/https://test/image.png">'
+                "<img decoding="
+            )
+        )
+        self.assertTrue(content.endswith("</picture>"))
+        self.assertNotIn('loading="lazy"', content)
+
+    @patch("canonicalwebteam.blog.logic.replace_images_with_cloudinary")
+    def test_optimised_content_per_revision(self, replace_images):
+        replace_images.return_value = "optimised"
+        logic.transformed_article_cache.clear()
+        logic.optimised_content_cache.clear()
+        article = {
+            "id": 1,
+            "modified_gmt": "2019-01-01T00:00:00",
+            "content": {"rendered": "content"},
+        }
+
+        # The same revision, fetched with other fields
+        for fetched_article in [article, dict(article, slug="slug")]:
+            transformed_article = logic.transform_article(
+                fetched_article, optimise_images=True
+            )
+            self.assertEqual(transformed_article.content.rendered, "optimised")
+
+        self.assertEqual(replace_images.call_count, 1)
+
+        article["modified_gmt"] = "2019-01-02T00:00:00"
+        logic.transform_article(article, optimise_images=True).content.rendered
+
+        self.assertEqual(replace_images.call_count, 2)
+
+    def test_transform_article_returns_new_article(self):
+        article = {
+            "id": 1,
+            "modified_gmt": "2019-01-01T00:00:00",
+            "date_gmt": "2019-01-01T10:00:00",
+            "excerpt": {"rendered": "<p>Test &amp; excerpt</p> [&hellip;]"},
+            "group": [3],
+            "sticky": True,
+            "_links": {},
+        }
+
+        transformed_article = logic.transform_article(
+            article, featured_image="image", author="author"
+        )
+
+        self.assertEqual(transformed_article["date"], "1 January 2019")
+        self.assertEqual(
+            transformed_article["excerpt"]["raw"], "Test & excerpt  […]"
+        )
+        self.assertEqual(transformed_article["group"], 3)
+        self.assertEqual(transformed_article["image"], "image")
+        self.assertEqual(transformed_article["author"], "author")
+        self.assertEqual(transformed_article["sticky"], True)
+        self.assertNotIn("_links", transformed_article)
+        self.assertEqual(article["group"], [3])
+        self.assertNotIn("raw", article["excerpt"])
+
+    def test_transform_article_per_fields(self):
+        article = {"id": 3, "modified_gmt": "2019-01-01T00:00:00"}
+
+        index_article = logic.transform_article(article)
+        full_article = logic.transform_article(
+            dict(article, content={"rendered": "content"})
+        )
+
+        self.assertNotIn("content", index_article)
+        self.assertIn("content", full_article)
+
+    @patch("canonicalwebteam.blog.logic.strip_excerpt")
+    def test_transform_articles_per_revision(self, strip_excerpt):
+        strip_excerpt.return_value = "excerpt"
+        articles = [
+            {
+                "id": 2,
+                "modified_gmt": "2019-01-01T00:00:00",
+                "excerpt": {"rendered": "excerpt"},
+            }
+        ]
+
+        transformed_articles = logic.transform_articles(articles)
+
+        self.assertEqual(strip_excerpt.call_count, 0)
+        self.assertEqual(
+            transformed_articles[0]["excerpt"]["raw"], "excerpt […]"
+        )
+
+        transformed_articles = logic.transform_articles(
+            articles, featured_images=["image"], authors=["author"]
+        )
+
+        self.assertEqual(transformed_articles[0].excerpt.raw, "excerpt […]")
+        self.assertEqual(strip_excerpt.call_count, 1)
+        self.assertEqual(transformed_articles[0]["image"], "image")
+        self.assertEqual(transformed_articles[0]["author"], "author")
+
+    def test_rewrite_feed_across_chunks(self):
+        feed = (
+            "<title>Ubuntu Blog</title>"
+            "<link>https://admin.insights.ubuntu.com/2019/01/02/test</link>"
+            "<link>https://admin.insights.ubuntu.com/feed</link>"
+        )
+        expected_feed = (
+            "<title>Test Blog</title>"
+            "<link>https://test/blog/test</link>"
+            "<link>https://test/blog/feed</link>"
+        )
+
+        for chunk_size in [1, 5, 13, 40, len(feed)]:
+            chunks = [
+                feed[start : start + chunk_size]  # noqa: E203
+                for start in range(0, len(feed), chunk_size)
+            ]
+
+            self.assertEqual(
+                "".join(
+                    logic.rewrite_feed(
+                        chunks, "https://test/blog", "Test Blog"
+                    )
+                ),
+                expected_feed,
+            )
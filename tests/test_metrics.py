@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import unittest
+
+from unittest.mock import MagicMock, patch
+from canonicalwebteam.blog import async_wordpress_api as async_api
+from canonicalwebteam.blog import metrics
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.cache import ObjectCache
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        for metric in metrics.METRICS:
+            metric.clear()
+
+        api.circuit_breaker.record_success()
+
+    def tearDown(self):
+        metrics.end_request()
+
+    def test_histogram_export(self):
+        histogram = metrics.Histogram("latency", "Latency", buckets=(1, 5))
+        histogram.observe(0.5, endpoint="/posts")
+        histogram.observe(3, endpoint="/posts")
+
+        lines = histogram.export()
+
+        self.assertIn('latency_bucket{endpoint="/posts",le="1"} 1', lines)
+        self.assertIn('latency_bucket{endpoint="/posts",le="5"} 2', lines)
+        self.assertIn('latency_bucket{endpoint="/posts",le="+Inf"} 2', lines)
+        self.assertIn('latency_count{endpoint="/posts"} 2', lines)
+        self.assertIn('latency_sum{endpoint="/posts"} 3.5', lines)
+
+    def test_export_includes_cache_stats(self):
+        cache = ObjectCache()
+        cache.set("users", 1, "user")
+        cache.get("users", 1)
+        cache.get("users", 2)
+        metrics.register_cache("test", cache)
+
+        exported = metrics.export()
+
+        self.assertIn(
+            'blog_cache_lookups_total{cache="test",result="hit"} 1', exported
+        )
+        self.assertIn('blog_cache_size{cache="test"} 1', exported)
+
+        del metrics.caches["test"]
+
+    def test_server_timing(self):
+        metrics.start_request()
+
+        with metrics.timed("fetch"):
+            pass
+
+        metrics.record_api_call("/posts", 0.25)
+        metrics.record_api_call("/media", 0.25)
+
+        server_timing = metrics.end_request()
+
+        self.assertIn('api;desc="2 calls";dur=500.0', server_timing)
+        self.assertIn("fetch;dur=", server_timing)
+        self.assertIn("total;dur=", server_timing)
+        self.assertIsNone(metrics.end_request())
+
+    def test_in_request_records_other_threads(self):
+        timings = metrics.start_request()
+        thread = threading.Thread(
+            target=metrics.in_request(metrics.record_api_call),
+            args=("/posts", 0.1),
+        )
+        thread.start()
+        thread.join()
+
+        self.assertEqual(timings.api_calls, 1)
+
+    @patch("canonicalwebteam.blog.wordpress_api.get_tags_by_ids")
+    def test_async_api_records_in_each_request(self, get_tags_by_ids):
+        def get_tags(ids):
+            for _ in ids:
+                metrics.record_api_call("/tags", 0.1)
+
+            return []
+
+        get_tags_by_ids.side_effect = get_tags
+
+        async def handle(ids):
+            timings = metrics.start_request()
+            await async_api.get_tags_by_ids(ids)
+            await asyncio.sleep(0)
+
+            return timings.api_calls
+
+        async def handle_all():
+            return await asyncio.gather(handle([1]), handle([1, 2, 3]))
+
+        self.assertEqual(asyncio.run(handle_all()), [1, 3])
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_api_requests_are_recorded(self, api_session):
+        response = MagicMock(status_code=200, ok=True, from_cache=False)
+        response.headers = {"Content-Length": "120"}
+        api_session.get.return_value = response
+
+        api._request(api.API_URL + "/media/5?_fields=id")
+
+        self.assertEqual(
+            metrics.API_CALLS.get(endpoint="/media/{id}", status=200), 1
+        )
+        self.assertEqual(metrics.API_BYTES.get(endpoint="/media/{id}"), 120)
+        self.assertEqual(metrics.HTTP_CACHE.get(result="miss"), 1)
+        self.assertEqual(metrics.API_SECONDS.count(endpoint="/media/{id}"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
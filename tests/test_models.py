@@ -0,0 +1,114 @@
+import copy
+import pickle
+import unittest
+
+from unittest.mock import MagicMock
+from canonicalwebteam.blog.models import (
+    Article,
+    Author,
+    Content,
+    Excerpt,
+    Media,
+    Term,
+)
+
+
+class TestModels(unittest.TestCase):
+    def test_read_like_a_dict(self):
+        author = Author.from_api({"id": 1, "name": "Author", "_links": {}})
+
+        self.assertEqual(author["name"], "Author")
+        self.assertEqual(author.name, "Author")
+        self.assertEqual(author, {"id": 1, "name": "Author"})
+        self.assertNotIn("_links", author)
+        self.assertNotIn("slug", author)
+        self.assertIsNone(author.get("slug"))
+
+        with self.assertRaises(KeyError):
+            author["slug"]
+
+    def test_immutable(self):
+        article = Article(id=1)
+
+        with self.assertRaises(AttributeError):
+            article.id = 2
+
+        with self.assertRaises(AttributeError):
+            article.title = "title"
+
+    def test_lazy_date(self):
+        article = Article(id=1, date_gmt="2019-01-02T10:00:00")
+
+        self.assertEqual(dict(article)["date"], "2 January 2019")
+        self.assertNotIn("date", Article(id=1))
+
+    def test_replace_shares_lazy_fields(self):
+        shorten = MagicMock(return_value="short")
+        optimise = MagicMock(return_value="optimised")
+        article = Article(
+            id=1,
+            excerpt=Excerpt("<p>excerpt</p>", shorten=shorten),
+            content=Content("content", optimise=optimise),
+        )
+
+        copies = [article.replace(author=name) for name in ["a", "b"]]
+
+        self.assertEqual(
+            [article.excerpt.raw for article in copies], ["short", "short"]
+        )
+        self.assertEqual(copies[1]["content"]["rendered"], "optimised")
+        self.assertEqual(copies[0].content.rendered, "optimised")
+        self.assertEqual(copies[1].author, "b")
+        self.assertNotIn("author", article)
+        shorten.assert_called_once_with("<p>excerpt</p>")
+        optimise.assert_called_once_with("content")
+
+    def test_copy_and_pickle(self):
+        article = Article(
+            id=1,
+            date_gmt="2019-01-02T10:00:00",
+            content=Content("content"),
+            _extra={"sticky": True},
+        )
+        article.date
+
+        for copied in [
+            copy.copy(article),
+            copy.deepcopy(article),
+            pickle.loads(pickle.dumps(article)),
+        ]:
+            self.assertEqual(copied, article)
+            self.assertEqual(copied.content.rendered, "content")
+            self.assertEqual(copied._date, "2 January 2019")
+
+    def test_keeps_extra_fields(self):
+        article = Article(id=1, _extra={"sticky": True, "type": "post"})
+
+        self.assertEqual(article["sticky"], True)
+        self.assertEqual(article.type, "post")
+        self.assertEqual(
+            dict(article), {"id": 1, "sticky": True, "type": "post"}
+        )
+        self.assertNotIn("format", article)
+
+        with self.assertRaises(AttributeError):
+            article.format
+
+    def test_from_api_keeps_extra_fields(self):
+        author = Author.from_api(
+            {"id": 1, "url": "https://example.com", "_links": {}}
+        )
+        media = Media.from_api({"id": 2, "title": {"rendered": "Image"}})
+        term = Term.from_api({"id": 3, "count": 5, "taxonomy": "category"})
+
+        self.assertEqual(author.url, "https://example.com")
+        self.assertNotIn("_links", author)
+        self.assertEqual(media["title"], {"rendered": "Image"})
+        self.assertEqual(
+            dict(term), {"id": 3, "count": 5, "taxonomy": "category"}
+        )
+        self.assertEqual(pickle.loads(pickle.dumps(term)), term)
+
+
+if __name__ == "__main__":
+    unittest.main()
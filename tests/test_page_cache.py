@@ -0,0 +1,69 @@
+import gzip
+import unittest
+
+from canonicalwebteam.blog.page_cache import CachedPage, PageCache
+
+
+class TestPageCache(unittest.TestCase):
+    def test_caches_pages(self):
+        cache = PageCache(ttl=60)
+        page = cache.set(("article", "test"), "<p>test</p>")
+
+        self.assertIs(cache.get(("article", "test")), page)
+        self.assertIsNone(cache.get(("article", "other")))
+        self.assertEqual(page.body, b"<p>test</p>")
+        self.assertEqual(
+            page.headers(60)["Cache-Control"], "public, max-age=60"
+        )
+
+    def test_conditional_requests(self):
+        page = CachedPage("<p>test</p>", last_modified=1000000000)
+
+        self.assertTrue(page.is_not_modified(if_none_match=page.etag))
+        self.assertTrue(page.is_not_modified(if_none_match="*"))
+        self.assertFalse(page.is_not_modified(if_none_match='"other"'))
+        self.assertTrue(
+            page.is_not_modified(
+                if_modified_since="Sun, 09 Sep 2001 01:46:40 GMT"
+            )
+        )
+        self.assertFalse(
+            page.is_not_modified(
+                if_modified_since="Sun, 09 Sep 2001 01:46:39 GMT"
+            )
+        )
+        self.assertFalse(page.is_not_modified(if_modified_since="invalid"))
+        self.assertFalse(page.is_not_modified())
+
+    def test_compressed_variants(self):
+        cache = PageCache(ttl=60, compress=True)
+        page = cache.set(("feed", "host"), "<rss>" * 1000, "text/xml")
+
+        self.assertEqual(page.content_type, "text/xml")
+        self.assertEqual(page.negotiate("gzip;q=0.5, identity"), "gzip")
+        self.assertIsNone(page.negotiate("gzip;q=0"))
+        self.assertIsNone(page.negotiate(None))
+        self.assertEqual(page.negotiate("*"), page.negotiate("br, gzip"))
+        self.assertEqual(
+            gzip.decompress(page.get_body("gzip")), b"<rss>" * 1000
+        )
+
+        headers = page.headers(60, encoding="gzip")
+
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertNotEqual(headers["ETag"], page.etag)
+        self.assertTrue(page.is_not_modified(headers["ETag"], encoding="gzip"))
+        self.assertFalse(page.is_not_modified(headers["ETag"]))
+        self.assertTrue(page.is_not_modified("W/" + page.etag))
+
+    def test_small_pages_arent_compressed(self):
+        page = CachedPage("<p>test</p>", encodings=["gzip"])
+
+        self.assertEqual(page.variants, {})
+        self.assertIsNone(page.negotiate("gzip"))
+        self.assertNotIn("Vary", page.headers(60))
+
+
+if __name__ == "__main__":
+    unittest.main()
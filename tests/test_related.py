@@ -0,0 +1,53 @@
+import unittest
+
+from canonicalwebteam.blog.related import RelatedIndex
+
+
+class TestRelatedIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = RelatedIndex()
+        self.index.update(
+            [
+                {"id": 1, "date_gmt": "2019-01-01T00:00:00", "tags": [1, 2]},
+                {"id": 2, "date_gmt": "2019-01-02T00:00:00", "tags": [1, 3]},
+                {"id": 3, "date_gmt": "2019-01-03T00:00:00", "tags": [1, 2]},
+                {"id": 4, "date_gmt": "2019-01-04T00:00:00", "tags": [1, 4]},
+                {"id": 5, "date_gmt": "2018-01-01T00:00:00", "tags": [1, 3]},
+            ]
+        )
+
+    def test_ranks_by_shared_terms(self):
+        related = self.index.related({"id": 1, "tags": [1, 2, 3]})
+
+        self.assertEqual([post["id"] for post in related], [3, 2, 5])
+
+    def test_series_tags_weigh_more(self):
+        related = self.index.related(
+            {"id": 1, "tags": [1, 2, 3]}, limit=2, series_tag_ids=[3]
+        )
+
+        self.assertEqual([post["id"] for post in related], [2, 5])
+
+    def test_needs_a_shared_tag(self):
+        self.index.update(
+            [
+                {"id": 6, "tags": [5], "categories": [7]},
+                {"id": 7, "tags": [6], "categories": [7]},
+                {"id": 8, "tags": [6], "categories": [8]},
+            ]
+        )
+
+        related = self.index.related({"id": 9, "tags": [6], "categories": [7]})
+
+        self.assertEqual([post["id"] for post in related], [7, 8])
+
+    def test_update_replaces_posts(self):
+        self.index.update(
+            [{"id": 3, "date_gmt": "2019-01-03T00:00:00", "tags": [4]}]
+        )
+        self.index.remove(2)
+
+        related = self.index.related({"id": 1, "tags": [2, 3]})
+
+        self.assertEqual([post["id"] for post in related], [5])
+        self.assertEqual(len(self.index), 4)
@@ -0,0 +1,75 @@
+import unittest
+
+import requests
+
+from unittest.mock import MagicMock, patch
+from canonicalwebteam.blog.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    request_with_retries,
+)
+
+
+def mock_response(status_code):
+    response = MagicMock()
+    response.ok = status_code < 400
+    response.status_code = status_code
+    return response
+
+
+@patch("canonicalwebteam.blog.resilience.time.sleep")
+class TestRequestWithRetries(unittest.TestCase):
+    def test_retries_gateway_errors_and_timeouts(self, sleep):
+        response = mock_response(200)
+        request = MagicMock(
+            side_effect=[
+                mock_response(503),
+                requests.exceptions.Timeout(),
+                response,
+            ]
+        )
+
+        self.assertIs(
+            request_with_retries(request, "url", retries=2), response
+        )
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_gives_up_after_retries(self, sleep):
+        request = MagicMock(side_effect=requests.exceptions.ConnectionError())
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            request_with_retries(request, "url", retries=1)
+
+        self.assertEqual(request.call_count, 2)
+
+    def test_does_not_retry_client_errors(self, sleep):
+        request = MagicMock(return_value=mock_response(404))
+
+        self.assertEqual(request_with_retries(request, "url").status_code, 404)
+        self.assertEqual(request.call_count, 1)
+
+    @patch("canonicalwebteam.blog.resilience.time.monotonic")
+    def test_circuit_breaker_fails_fast(self, monotonic, sleep):
+        monotonic.return_value = 0
+        circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        request = MagicMock(return_value=mock_response(502))
+
+        request_with_retries(
+            request, "url", circuit_breaker=circuit_breaker, retries=1
+        )
+
+        self.assertTrue(circuit_breaker.is_open)
+
+        with self.assertRaises(CircuitOpenError):
+            request_with_retries(
+                request, "url", circuit_breaker=circuit_breaker
+            )
+
+        self.assertEqual(request.call_count, 2)
+
+        monotonic.return_value = 31
+        request.return_value = mock_response(200)
+        request_with_retries(request, "url", circuit_breaker=circuit_breaker)
+
+        self.assertFalse(circuit_breaker.is_open)
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+import unittest
+
+from canonicalwebteam.blog.shared_cache import SharedCache
+
+
+class TestSharedCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = SharedCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get("key"))
+
+        self.cache.set("key", b"value")
+
+        self.assertEqual(self.cache.get("key"), b"value")
+
+        self.cache.delete("key")
+
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_shared_between_instances(self):
+        self.cache.set("key", b"value")
+
+        self.assertEqual(SharedCache(self.directory.name).get("key"), b"value")
+
+    def test_expiry(self):
+        self.cache.set("key", b"value", expires=-1)
+
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_compression(self):
+        value = b"a" * 10000
+        self.cache.set("key", value)
+
+        self.assertEqual(self.cache.get("key"), value)
+        self.assertLess(self.cache.size(), 1000)
+
+    def test_evicts_least_recently_used(self):
+        cache = SharedCache(self.directory.name, max_size=300, check_every=1)
+        cache.set("old", b"a" * 100)
+        cache.set("used", b"b" * 100)
+
+        past = time.time() - 60
+        os.utime(cache._path("old"), (past, past))
+        os.utime(cache._path("used"), (past + 1, past + 1))
+        cache.get("used")
+        cache.set("new", b"c" * 100)
+
+        self.assertIsNone(cache.get("old"))
+        self.assertEqual(cache.get("used"), b"b" * 100)
+        self.assertEqual(cache.get("new"), b"c" * 100)
+
+    def test_records_use_at_most_every_touch_interval(self):
+        self.cache.set("key", b"value")
+        path = self.cache._path("key")
+        recent = time.time() - 10
+        os.utime(path, (recent, recent))
+
+        self.cache.get("key")
+
+        self.assertAlmostEqual(os.path.getmtime(path), recent, delta=1)
+
+        past = time.time() - 120
+        os.utime(path, (past, past))
+
+        self.cache.get("key")
+
+        self.assertGreater(os.path.getmtime(path), recent)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from unittest.mock import MagicMock
+from canonicalwebteam.blog.slug_index import SlugIndex
+
+
+def mock_response(posts):
+    response = MagicMock(ok=True)
+    response.json.return_value = posts
+    response.headers = {"X-WP-Total": str(len(posts))}
+
+    return response
+
+
+class TestSlugIndex(unittest.TestCase):
+    def test_exists(self):
+        index = SlugIndex()
+        index.update([{"id": 1, "slug": "one", "tags": [1, 2]}])
+        index.mark_missing("bad")
+
+        self.assertTrue(index.exists("one"))
+        self.assertTrue(index.exists("one", tags=[2]))
+        self.assertFalse(index.exists("one", tags=[3]))
+        self.assertFalse(index.exists("bad"))
+        self.assertIsNone(index.exists("unknown"))
+
+        index.update([{"id": 2, "slug": "bad", "tags": [1]}])
+
+        self.assertTrue(index.exists("bad"))
+
+    def test_changed_slug(self):
+        index = SlugIndex()
+        index.update([{"id": 1, "slug": "old"}])
+        index.update([{"id": 1, "slug": "new"}])
+
+        self.assertIsNone(index.exists("old"))
+        self.assertTrue(index.exists("new"))
+        self.assertEqual(len(index), 1)
+
+    def test_refresh(self):
+        index = SlugIndex()
+        session = MagicMock()
+        session.get.side_effect = [
+            mock_response(
+                [
+                    {"id": 1, "slug": "one", "modified": "2019-01-01T00:00"},
+                    {"id": 2, "slug": "two", "modified": "2019-02-01T00:00"},
+                ]
+            ),
+            mock_response([]),
+        ]
+
+        self.assertEqual(
+            index.refresh(api_url="https://api", session=session), 2
+        )
+        self.assertTrue(index.ready)
+        self.assertTrue(index.exists("two"))
+
+        # It may have been published since, without a new "modified" date
+        self.assertIsNone(index.exists("unknown"))
+
+        index.refresh(api_url="https://api", session=session)
+
+        self.assertIn(
+            "modified_after=2019-02-01T00:00", session.get.call_args[0][0]
+        )
+        self.assertIn("_fields=id,slug", session.get.call_args[0][0])
+
+    def test_full_refresh_removes_deleted_posts(self):
+        index = SlugIndex()
+        index.update([{"id": 1, "slug": "deleted"}])
+        session = MagicMock()
+        session.get.return_value = mock_response([{"id": 2, "slug": "two"}])
+
+        index.refresh(full=True, api_url="https://api", session=session)
+
+        self.assertIsNone(index.exists("deleted"))
+        self.assertIsNone(index.slug_for(1))
+        self.assertTrue(index.exists("two"))
+
+    def test_mark_missing_removes_post(self):
+        index = SlugIndex()
+        index.update([{"id": 1, "slug": "one"}])
+        index.mark_missing("one")
+
+        self.assertFalse(index.exists("one"))
+        self.assertIsNone(index.slug_for(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+
+from unittest.mock import MagicMock, patch
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.related import related_index
+from canonicalwebteam.blog.snapshot import SnapshotStore, Syncer, sync
+
+POSTS = [
+    {
+        "id": 1,
+        "slug": "one",
+        "date_gmt": "2019-01-01T00:00:00",
+        "modified": "2019-01-01T00:00:00",
+        "tags": [10],
+        "categories": [20],
+    },
+    {
+        "id": 2,
+        "slug": "two",
+        "date_gmt": "2019-01-02T00:00:00",
+        "modified": "2019-01-03T00:00:00",
+        "tags": [10, 11],
+        "categories": [],
+    },
+    {
+        "id": 3,
+        "slug": "three",
+        "date_gmt": "2019-01-03T00:00:00",
+        "modified": "2019-01-03T00:00:00",
+        "tags": [12],
+        "categories": [20],
+    },
+]
+
+
+def mock_response(json, total):
+    response = MagicMock()
+    response.ok = True
+    response.json.return_value = json
+    response.headers = {"X-WP-Total": str(total)}
+    return response
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.store = SnapshotStore()
+        self.store.put("posts", POSTS)
+
+    def tearDown(self):
+        related_index.clear()
+
+    def test_get_posts(self):
+        posts, total_pages = self.store.get_posts(tags=[10, 12], per_page=2)
+
+        self.assertEqual([post["id"] for post in posts], [3, 2])
+        self.assertEqual(total_pages, 2)
+
+        posts, total_pages = self.store.get_posts(
+            category=20, exclude=3, fields=["slug"]
+        )
+
+        self.assertEqual(posts, [{"slug": "one"}])
+
+        posts, total_pages = self.store.get_posts(slug="two", tags_exclude=11)
+
+        self.assertEqual(posts, [])
+
+    def test_put_replaces_terms(self):
+        self.store.put("posts", [dict(POSTS[0], tags=[12])])
+
+        posts, total_pages = self.store.get_posts(tags=12)
+
+        self.assertEqual([post["id"] for post in posts], [3, 1])
+
+    def test_get_many(self):
+        self.assertEqual(
+            self.store.get_many("posts", [2, 4], fields=["id"]), {2: {"id": 2}}
+        )
+        self.assertIsNone(self.store.get("users", 1))
+
+    def test_sync_fetches_changes(self):
+        session = MagicMock()
+        session.get.side_effect = [
+            mock_response(POSTS[:2], 101),
+            mock_response(POSTS[2:], 101),
+        ]
+
+        self.assertEqual(
+            sync(self.store, "https://api", session, entities=["posts"]),
+            {"posts": 3},
+        )
+        self.assertEqual(
+            self.store.get_state("posts")[1], "2019-01-03T00:00:00"
+        )
+        self.assertTrue(related_index.ready)
+        self.assertEqual(len(related_index), 3)
+
+        session.get.side_effect = [mock_response([], 0)]
+        sync(self.store, "https://api", session, entities=["posts"])
+
+        self.assertIn(
+            "&modified_after=2019-01-03T00:00:00",
+            session.get.call_args[0][0],
+        )
+
+    def test_full_sync_removes_deleted_posts(self):
+        session = MagicMock()
+        session.get.side_effect = [mock_response(POSTS, 3)]
+        sync(self.store, "https://api", session, entities=["posts"])
+        related_index.update([{"id": 4, "tags": [10]}])
+
+        session.get.side_effect = [mock_response(POSTS[1:], 2)]
+        sync(self.store, "https://api", session, entities=["posts"], full=True)
+
+        self.assertNotIn("modified_after", session.get.call_args[0][0])
+        self.assertEqual(
+            self.store.get_many("posts", [1, 2, 3]).keys(), {2, 3}
+        )
+        self.assertEqual(self.store.get_posts(category=20)[0], [POSTS[2]])
+        self.assertIsNotNone(self.store.get_full_sync_time("posts"))
+        self.assertEqual(len(related_index), 2)
+
+    def test_syncer_runs_full_sync_when_due(self):
+        syncer = Syncer(self.store, full_interval=60)
+
+        self.assertTrue(syncer._full_sync_due())
+
+        self.store.replace("posts", POSTS)
+        self.store.replace("media", [])
+
+        self.assertFalse(syncer._full_sync_due())
+
+        syncer.full_interval = 0
+
+        self.assertTrue(syncer._full_sync_due())
+
+    def test_related_index_filled_from_snapshot(self):
+        self.store.set_state("posts")
+
+        try:
+            api.use_snapshot(self.store)
+
+            self.assertTrue(related_index.ready)
+            self.assertEqual(len(related_index), 3)
+            self.assertFalse(related_index.load(self.store))
+
+            # Synced by another process
+            self.store.put("posts", [dict(POSTS[0], id=4)])
+            self.store.set_state("posts")
+
+            self.assertTrue(related_index.load(self.store))
+            self.assertEqual(len(related_index), 4)
+        finally:
+            api.use_snapshot(None)
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_api_reads_from_snapshot(self, api_session):
+        self.store.put("users", [{"id": 5, "name": "test"}])
+        self.store.set_state("posts")
+        self.store.set_state("users")
+        api.object_cache.clear()
+        api.use_snapshot(self.store)
+
+        try:
+            articles, total_pages = api.get_articles(tags=[12])
+            users = api.get_users_by_ids([5])
+        finally:
+            api.use_snapshot(None)
+
+        self.assertEqual([article["id"] for article in articles], [3])
+        self.assertEqual(users, {5: {"id": 5, "name": "test"}})
+        api_session.get.assert_not_called()
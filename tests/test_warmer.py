@@ -0,0 +1,53 @@
+import unittest
+
+from unittest.mock import patch
+from canonicalwebteam.blog import warmer
+
+
+class TestWarmer(unittest.TestCase):
+    @patch("canonicalwebteam.blog.warmer.get_article_context")
+    @patch("canonicalwebteam.blog.warmer.get_index_context")
+    @patch("canonicalwebteam.blog.wordpress_api.get_article")
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_warm(
+        self, get_articles, get_article, get_index_context, get_article_context
+    ):
+        get_articles.return_value = ([{"slug": "one"}, {"slug": "two"}], 2)
+
+        def get_article_response(slug, **kwargs):
+            if slug == "two":
+                raise Exception("API error")
+
+            return [{"slug": slug}]
+
+        get_article.side_effect = get_article_response
+
+        metrics = warmer.warm([1], pages=5, max_workers=2)
+
+        self.assertEqual(get_articles.call_count, 2)
+        self.assertEqual(get_index_context.call_count, 2)
+        self.assertEqual(get_article.call_count, 4)
+        self.assertEqual(metrics["pages"], 2)
+        self.assertEqual(get_article_context.call_count, 2)
+        self.assertEqual(metrics["articles"], 2)
+        self.assertEqual(metrics["errors"], 2)
+        self.assertEqual(warmer.last_metrics, metrics)
+
+    @patch("canonicalwebteam.blog.warmer.get_article_context")
+    @patch("canonicalwebteam.blog.warmer.get_index_context")
+    @patch("canonicalwebteam.blog.wordpress_api.get_article")
+    @patch("canonicalwebteam.blog.wordpress_api.get_articles")
+    def test_warm_through_views(
+        self, get_articles, get_article, get_index_context, get_article_context
+    ):
+        get_articles.return_value = ([{"slug": "one"}], 1)
+        paths = []
+
+        metrics = warmer.warm([1], pages=2, get_page=paths.append)
+
+        self.assertEqual(paths[0], "/?page=1")
+        self.assertEqual(paths[1:], ["/one"])
+        self.assertEqual(metrics["articles"], 1)
+        get_article.assert_not_called()
+        get_index_context.assert_not_called()
+        get_article_context.assert_not_called()
@@ -0,0 +1,274 @@
+import tempfile
+import threading
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from unittest.mock import MagicMock, patch
+from canonicalwebteam.blog import wordpress_api as api
+from canonicalwebteam.blog.resilience import CircuitBreaker, CircuitOpenError
+
+
+def mock_response(json):
+    response = MagicMock()
+    response.ok = True
+    response.json.return_value = json
+    return response
+
+
+def mock_posts_response(ids, total=None):
+    response = mock_response([{"id": id} for id in ids])
+    response.headers = {"X-WP-Total": str(total or len(ids))}
+
+    return response
+
+
+class CachedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", "max-age=60")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"[]")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestWordpressApi(unittest.TestCase):
+    def setUp(self):
+        api.object_cache.clear()
+        api.response_cache.clear()
+        api.circuit_breaker.record_success()
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_by_ids_pages_through_ids(self, api_session):
+        api_session.get.side_effect = lambda url: mock_response(
+            [
+                {"id": int(id)}
+                for id in url.split("include=")[1].split("&")[0].split(",")
+            ]
+        )
+
+        media = api.get_media_by_ids(list(range(1, 151)) + [1])
+
+        self.assertEqual(api_session.get.call_count, 2)
+        self.assertEqual(sorted(media.keys()), list(range(1, 151)))
+        self.assertEqual(media[150], {"id": 150})
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_by_ids_fetches_failed_chunk_one_by_one(self, api_session):
+        def get(url):
+            if "include=" in url:
+                return MagicMock(ok=False, status_code=500)
+
+            id = int(url.split("/users/")[1])
+
+            if id == 2:
+                raise Exception("timeout")
+
+            return mock_response({"id": id})
+
+        api_session.get.side_effect = get
+
+        users = api.get_users_by_ids([1, 2, 3])
+
+        self.assertEqual(users, {1: {"id": 1}, 3: {"id": 3}})
+
+    def test_open_circuit_still_serves_cached_responses(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), CachedHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = "http://127.0.0.1:{}/".format(server.server_address[1])
+        circuit_breaker = CircuitBreaker(failure_threshold=1)
+
+        with tempfile.TemporaryDirectory() as directory, patch.dict(
+            api.SESSION_OPTIONS, cache_directory=directory
+        ), patch.object(api, "circuit_breaker", circuit_breaker):
+            session = api._build_session()
+
+            try:
+                session.get(url + "cached")
+                circuit_breaker.record_failure()
+
+                self.assertTrue(session.get(url + "cached").from_cache)
+
+                with self.assertRaises(CircuitOpenError):
+                    session.get(url + "uncached")
+            finally:
+                session.close()
+                server.shutdown()
+                server.server_close()
+
+    def test_build_url_is_canonical(self):
+        self.assertEqual(
+            api.build_url("/posts", tags=[2, 1, 2], page=1, exclude=None),
+            api.build_url("/posts", page="1", tags="1,2"),
+        )
+        self.assertEqual(
+            api.build_url(
+                "/posts", tags=[2, 1], _fields=["slug", "id"], search="a b"
+            ),
+            api.API_URL + "/posts?_fields=id,slug&search=a+b&tags=1,2",
+        )
+        self.assertEqual(
+            api.build_url("/tags", include=[]), api.API_URL + "/tags"
+        )
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_article_url(self, api_session):
+        api_session.get.return_value = mock_response([])
+
+        api.get_article("a-post", tags=[3, 1], excluded_tags=[2])
+
+        api_session.get.assert_called_once_with(
+            api.API_URL + "/posts?slug=a-post&tags=1,3&tags_exclude=2"
+        )
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_articles_with_fields(self, api_session):
+        api_session.get.side_effect = [mock_posts_response([1])]
+
+        articles, total_pages = api.get_articles(
+            tags=None, fields=["id", "slug"], embed=True
+        )
+
+        # The first page is fetched directly, in one request
+        api_session.get.assert_called_once()
+        url = api_session.get.call_args[0][0]
+        self.assertIn("?_embed=author,wp:featuredmedia&", url)
+        self.assertIn("&_fields=_embedded,_links,id,slug&", url)
+        self.assertEqual((articles, total_pages), ([{"id": 1}], 1))
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_articles_slices_cached_post_ids(self, api_session):
+        ids = list(range(250, 0, -1))
+
+        def get(url):
+            if "_fields=id&" in url:
+                page = int(url.split("page=")[1].split("&")[0])
+                start = (page - 1) * 100
+
+                return mock_posts_response(ids[start:][:100], total=250)
+
+            include = url.split("include=")[1].split("&")[0].split(",")
+
+            return mock_response([{"id": int(id)} for id in include])
+
+        api_session.get.side_effect = get
+
+        articles, total_pages = api.get_articles(tags=[1], page=2)
+
+        self.assertEqual([article["id"] for article in articles], ids[12:24])
+        self.assertEqual(total_pages, 21)
+        self.assertEqual(api_session.get.call_count, 2)
+
+        articles, total_pages = api.get_articles(tags=[1], page=21)
+
+        self.assertEqual([article["id"] for article in articles], ids[240:])
+        self.assertEqual(api_session.get.call_count, 5)
+
+        api.get_articles(tags=[1], page=3)
+        articles, total_pages = api.get_articles(tags=[1], page=22)
+
+        self.assertEqual(articles, [])
+        self.assertEqual(total_pages, 21)
+        self.assertEqual(api_session.get.call_count, 6)
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_post_ids_refetches_when_total_changes(self, api_session):
+        api_session.get.side_effect = [
+            mock_posts_response(range(200, 100, -1), total=200),
+            # A post was published since the first block was cached
+            mock_posts_response(range(100, 0, -1), total=201),
+            mock_posts_response(range(201, 101, -1), total=201),
+            mock_posts_response(range(101, 1, -1), total=201),
+        ]
+
+        api.get_post_ids(tags=[1], count=100)
+        ids, total = api.get_post_ids(tags=[1], count=200)
+
+        self.assertEqual((ids, total), (list(range(201, 1, -1)), 201))
+        self.assertEqual(
+            api_session.get.call_args[1]["headers"],
+            {"Cache-Control": "no-cache"},
+        )
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_feed_stream(self, api_session):
+        response = MagicMock(ok=True, encoding=None)
+        response.iter_content.return_value = iter(["<rss>", "</rss>"])
+        api_session.get.return_value = response
+
+        self.assertEqual(
+            list(api.get_feed_stream("blog")), ["<rss>", "</rss>"]
+        )
+        response.close.assert_called_once_with()
+        self.assertEqual(response.encoding, "utf-8")
+
+        good_response = MagicMock(
+            ok=True,
+            status_code=200,
+            headers={},
+            content=b"<rss></rss>",
+            encoding="utf-8",
+            text="<rss></rss>",
+        )
+        api_session.get.return_value = good_response
+        api.get_feed("blog")
+
+        # The last good response, kept by get_feed, when the API fails
+        failed_response = MagicMock(ok=False, status_code=500)
+        api_session.get.return_value = failed_response
+
+        self.assertEqual(list(api.get_feed_stream("blog")), ["<rss></rss>"])
+        failed_response.close.assert_called()
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_refetches_responses_cached_before_a_purge(self, api_session):
+        cached_response = mock_response([])
+        cached_response.from_cache = True
+        cached_response.headers = {"Date": "Sun, 09 Sep 2001 01:46:40 GMT"}
+        api_session.get.side_effect = [cached_response, mock_response([])]
+        api.purge_responses(lambda url: "/posts" in url)
+
+        api.get_article("a-post")
+
+        self.assertEqual(api_session.get.call_count, 2)
+        self.assertEqual(
+            api_session.get.call_args[1]["headers"],
+            {"Cache-Control": "no-cache"},
+        )
+
+        api_session.get.side_effect = [cached_response]
+        api.get_tag_by_name("a-tag")
+
+        self.assertEqual(api_session.get.call_count, 3)
+        api._purged_at.clear()
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_media_with_fields(self, api_session):
+        api_session.get.return_value = mock_response({})
+
+        api.get_media(1, fields=["source_url"])
+
+        api_session.get.assert_called_once_with(
+            api.API_URL + "/media/1?_fields=source_url"
+        )
+
+    @patch("canonicalwebteam.blog.wordpress_api.api_session")
+    def test_get_by_ids_uses_object_cache(self, api_session):
+        api_session.get.return_value = mock_response([{"id": 1}, {"id": 2}])
+        api.get_users_by_ids([1, 2])
+
+        api_session.get.return_value = mock_response([{"id": 3}])
+        users = api.get_users_by_ids([1, 2, 3])
+
+        self.assertEqual(users, {1: {"id": 1}, 2: {"id": 2}, 3: {"id": 3}})
+        self.assertTrue(
+            api_session.get.call_args[0][0].endswith(
+                "/users?include=3&per_page=100"
+            )
+        )
+        self.assertEqual(api.get_user(2), {"id": 2})
+        self.assertEqual(api_session.get.call_count, 2)